@@ -1,32 +1,165 @@
 # integra yolo para deteccion y trackers para seguimiento continuo
 # la vista de camara se mantiene fluida; yolo y tracking corren en paralelo
+# arranque por etapas: el modelo carga y se calienta en el hilo del detector mientras se busca la camara
 
+import argparse
+import functools
 import sys
 import time
 
+# referencia de los hitos de arranque (primer frame, modelo listo, primera deteccion); antes de opencv/pil
+_boot_ts = time.monotonic()
+
 from monitor.ui.startup_screen import (
     show_waiting_for_camera,
     show_error_retry,
     show_camera_preview,
-    draw_detection_overlay,
-    draw_tracking_overlay,
+    close_windows,
 )
-from monitor.devices.camera import find_camera_index, open_camera
-from monitor.models.detector_yolo import yolo_detector
-from monitor.tracking.trackers import multi_target_tracking
+from monitor.core.frame_pipeline import frame_pipeline
+from monitor.core.frame_processor import build_detector, frame_processor
+from monitor.devices.camera import capture_profiles, find_camera_index, open_camera
+from monitor.devices.capture import camera_capture
+from monitor.devices.discovery import find_camera, reopen_camera, save_last_device
+from monitor.models.backends import backends
+from monitor.utils import metrics
+
+
+def _parse_args(argv=None):
+    ap = argparse.ArgumentParser(prog="monitor", description="monitor de actividad de wire bonder")
+    ap.add_argument("--backend", choices=sorted(backends), default="ultralytics", help="backend de inferencia yolo")
+    ap.add_argument("--model", default="", help="ruta del modelo (por defecto depende del backend)")
+    ap.add_argument("--imgsz", type=int, default=416, help="tamano de entrada si el modelo lo permite")
+    ap.add_argument("--threads", type=int, default=0, help="hilos de inferencia (0 = automatico)")
+    ap.add_argument("--profile", choices=sorted(capture_profiles), default="low_latency", help="perfil de captura")
+    ap.add_argument("--retrieve-every", type=int, default=1, help="decodifica uno de cada n frames capturados")
+    ap.add_argument("--display-fps", type=float, default=0.0, help="fps de dibujo en pantalla, independiente del analisis (0 = cada frame)")
+    ap.add_argument("--analysis-width", type=int, default=640, help="ancho del frame de analisis (0 = nativo)")
+    ap.add_argument(
+        "--roi-full-every",
+        type=float,
+        default=0.0,
+        help="deteccion por recortes alrededor de los tracks con barrido completo cada n segundos (0 = siempre frame completo)",
+    )
+    ap.add_argument("--det-budget", type=float, default=0.5, help="fraccion de un nucleo que puede usar el detector (0 = sin limite)")
+    ap.add_argument("--det-max-interval", type=float, default=1.0, help="segundos maximos entre detecciones con tracks estables")
+    ap.add_argument(
+        "--idle-after",
+        type=float,
+        default=10.0,
+        help="segundos sin movimiento en tip/reel para entrar en reposo sin deteccion ni tracking (0 = nunca)",
+    )
+    ap.add_argument("--roi-imgsz", type=int, default=256, help="tamano de entrada de los recortes si el modelo lo permite")
+    ap.add_argument(
+        "--mode",
+        choices=("preview", "pipeline", "headless", "replay"),
+        default="preview",
+        help=(
+            "preview: un solo proceso; pipeline: captura/deteccion/tracking/render en procesos separados; "
+            "headless: servicio sin ventana que emite json lines; replay: benchmark offline sobre un video o carpeta"
+        ),
+    )
+    ap.add_argument("--telemetry", default="", help="carpeta para la telemetria binaria por frame (vacio = apagada)")
+    ap.add_argument("--clips", default="", help="carpeta de clips por evento con pre-roll (vacio = apagado)")
+    ap.add_argument("--clip-pre", type=float, default=5.0, help="segundos de video antes del evento")
+    ap.add_argument("--clip-post", type=float, default=5.0, help="segundos de video despues del evento")
+    ap.add_argument("--clip-fps", type=float, default=10.0, help="fps de los clips (y del anillo de pre-roll)")
+    ap.add_argument("--clip-max-mb", type=float, default=64.0, help="memoria maxima del anillo de pre-roll")
+    ap.add_argument(
+        "--camera",
+        action="append",
+        default=[],
+        help="headless: camara (ruta, by-id o indice, opcional 'id=ruta'); repetida = varias camaras con un servidor de deteccion",
+    )
+    ap.add_argument("--server-batch", type=int, default=0, help="headless con varias camaras: lote maximo (0 = una por camara)")
+    ap.add_argument("--server-wait", type=float, default=0.02, help="headless con varias camaras: espera maxima (s) para llenar un lote")
+    ap.add_argument("--events", default="-", help="headless: '-' (stdout), archivo .jsonl o unix:/ruta.sock")
+    ap.add_argument("--state-every", type=int, default=1, help="headless: emite el estado cada n frames (0 = nunca)")
+    ap.add_argument("--preview-port", type=int, default=0, help="headless: puerto http de la vista previa mjpeg (0 = apagada)")
+    ap.add_argument("--stats-every", type=float, default=10.0, help="headless: segundos entre eventos capture_stats (0 = nunca)")
+    ap.add_argument("--preview-fps", type=float, default=1.0, help="headless: fps de la vista previa")
+    ap.add_argument("--metrics-port", type=int, default=0, help="puerto local del endpoint prometheus /metrics (0 = apagado)")
+    ap.add_argument("--metrics-log", type=float, default=0.0, help="segundos entre lineas de resumen de metricas en stderr (0 = nunca)")
+    ap.add_argument("--source", default="", help="replay: video o carpeta de imagenes")
+    ap.add_argument("--realtime", action="store_true", help="replay: respeta los fps de la fuente en vez de ir lo mas rapido posible")
+    ap.add_argument("--replay-fps", type=float, default=30.0, help="replay: fps si la fuente no los reporta (carpetas)")
+    ap.add_argument("--max-frames", type=int, default=0, help="replay: limite de frames (0 = toda la fuente)")
+    ap.add_argument("--bench-out", default="", help="replay: archivo json para el reporte (ademas de stdout)")
+    return ap.parse_args(argv)
+
+
+def _main_pipeline(args):
+    from monitor.core.pipeline_mp import run_pipeline
 
+    while 1:
+        show_waiting_for_camera()
+        cam_index = find_camera_index(max_index=5)
+        if cam_index >= 0:
+            break
+        action = show_error_retry(
+            error_text="no se detecto camara usb",
+            instructions="pulsa r para reintentar o q para salir",
+        )
+        if action != "retry":
+            sys.exit(1)
+
+    det_kwargs = {
+        "name": args.backend,
+        "model_path": args.model,
+        "imgsz": args.imgsz,
+        "conf_thr": 0.25,
+        "threads": args.threads,
+    }
+    # la ventana de espera es de este proceso; la de render la abre su propio proceso
+    close_windows()
+    return run_pipeline(cam_index, det_kwargs, profile=args.profile)
 
-def main():
-    model_path = "y8n_640_ep80/weights/best.pt"
 
-    detector = yolo_detector(model_path=model_path, conf_thr=0.25, imgsz=416, debug=False)
-    mtt = multi_target_tracking()
+def _wait_reconnect(capture, dev):
+    while 1:
+        k = show_waiting_for_camera(
+            title="reconectando camara...",
+            subtitle=f"{dev.name or dev.path}; q para salir",
+            wait_ms=250,
+        )
+        if k in (ord("q"), 27):
+            return "quit"
+        if capture.wait_connected(0.0):
+            return "ok"
+        if capture.failed.is_set():
+            return "failed"
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+
+    if args.mode == "pipeline":
+        return _main_pipeline(args)
+    # antes de crear detector y trackers: deciden al construirse si se instrumentan
+    if args.metrics_port or args.metrics_log > 0:
+        metrics.enable(port=args.metrics_port, log_every=args.metrics_log)
+    args.boot_ts = _boot_ts
+    if args.mode == "headless":
+        from monitor.service import run_headless
+
+        return run_headless(args)
+    if args.mode == "replay":
+        from monitor.replay import run_replay
+
+        return run_replay(args)
+
+    # el detector se construye sin modelo; start() lo carga en segundo plano y la camara no espera
+    detector = build_detector(args)
+    proc = frame_processor(args, detector, boot_ts=_boot_ts)
+    detector.start()
+    frame_seq = [0]  # id monotono de frame, no se reinicia al reconectar
+    pipeline = frame_pipeline(analysis_width=args.analysis_width)
 
     while 1:
         show_waiting_for_camera()
 
-        cam_index = find_camera_index(max_index=5)
-        if cam_index < 0:
+        dev = find_camera(max_index=5)
+        if dev is None:
             action = show_error_retry(
                 error_text="no se detecto camara usb",
                 instructions="pulsa r para reintentar o q para salir",
@@ -35,44 +168,72 @@ def main():
                 continue
             sys.exit(1)
 
-        cap = open_camera(cam_index)
+        cap = open_camera(dev.path, profile=args.profile)
         if cap is None:
             action = show_error_retry(
-                error_text=f"no se pudo abrir la camara en el indice {cam_index}",
+                error_text=f"no se pudo abrir la camara {dev.path}",
                 instructions="pulsa r para probar de nuevo o q para salir",
             )
             if action == "retry":
                 continue
             sys.exit(2)
+        save_last_device(dev)
 
+        # si la camara se cae, el hilo de captura la reabre por su ruta estable (by-id)
+        reopen = functools.partial(reopen_camera, dev.stable_path, profile=args.profile, identity=dev)
+        capture = camera_capture(cap, retrieve_every=args.retrieve_every, reopen=reopen).start()
         detector.start()
 
-        def overlay_fn(frame):
-            t = time.time()
-            if int(t * 30) % 3 == 0:
-                detector.submit(frame)
-
-            det_state = detector.get_state()
-            if det_state.get("tip") or det_state.get("reel"):
-                mtt.update_from_detections(frame, det_state)
-
-            trk_state = mtt.step(frame)
-
-            draw_detection_overlay(frame, det_state, conf_min=0.25)
-            draw_tracking_overlay(frame, trk_state)
-
-        next_action = show_camera_preview(
-            cap,
-            overlay_text="detector y tracking activos... (q para salir)",
-            overlay_fn=overlay_fn,
-        )
+        def analyze_fn(analysis):
+            # detector y trackers sobre el frame de analisis, en cada frame capturado
+            # ts de captura del hilo de camara; el planificador decide cuando detectar segun la salud de los tracks
+            t = capture.last_ts or time.time()
+            frame_seq[0] += 1
+            proc.process(analysis, frame_seq[0], t)
+            for ev in proc.boot_events:
+                extra = "".join(f" {k}={ev[k]}" for k in ("load_s", "warmup_s") if k in ev)
+                print(f"[arranque] {ev['stage']} en {ev['t']:.2f}s{extra}")
+            tr = proc.transition
+            if tr is not None:
+                print(f"[actividad] {tr['prev']} -> {tr['state']} ({tr['prev_duration']:.1f}s) {tr['features']}")
+            for ev in proc.clip_events:
+                print(f"[clips] {ev['path']} ({', '.join(ev['reasons'])}, {ev['frames']} frames)")
+
+        def overlay_fn(display, analysis):
+            # solo dibujo, al ritmo de --display-fps
+            proc.draw(display, pipeline)
+
+        while 1:
+            next_action = show_camera_preview(
+                capture,
+                # fps de captura redondeados: el sprite del badge solo se regenera cuando cambian
+                overlay_text=lambda: (
+                    f"detector y tracking activos, {capture.fps:.0f} fps (q para salir)"
+                    if detector.ready
+                    else "cargando modelo... (q para salir)"
+                ),
+                overlay_fn=overlay_fn,
+                pipeline=pipeline,
+                analyze_fn=analyze_fn,
+                display_fps=args.display_fps,
+            )
+            if next_action != "back" or not capture.reconnecting:
+                break
+            # corte usb: detector y trackers siguen calientes mientras se reconecta
+            if _wait_reconnect(capture, dev) != "ok":
+                next_action = "quit" if not capture.failed.is_set() else "back"
+                break
 
-        detector.stop()
+        capture.release()
 
         if next_action == "back":
             continue
         break
 
+    detector.stop()
+    proc.close()
+    metrics.close()
+
 
 if __name__ == "__main__":
     main()
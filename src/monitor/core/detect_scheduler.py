@@ -0,0 +1,96 @@
+# planificacion de deteccion guiada por tracks
+# detect_scheduler: cuando detectar, segun la incertidumbre de los trackers, la latencia del modelo y un presupuesto de cpu
+# roi_planner: recortes cuadrados alrededor de las cajas predichas; barrido de frame completo
+# cada full_every segundos, al perder un track o cuando no hay nada que seguir
+
+import numpy as np
+
+
+class detect_scheduler:
+    # intervalo entre detecciones (segundos de captura):
+    # - incertidumbre 1 (perdido, recien adquirido, kalman solo predice) -> min_interval
+    # - incertidumbre 0 (tracks estables) -> max_interval
+    # cpu_budget limita la fraccion de un nucleo que usa el hilo del detector: intervalo >= latencia / budget
+    def __init__(self, min_interval: float = 1 / 15.0, max_interval: float = 1.0, cpu_budget: float = 0.5):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.cpu_budget = cpu_budget
+        self.interval = min_interval
+        self.last = None
+        self.triggers = 0
+
+    def should_detect(self, ts: float, uncertainty: float, latency: float = 0.0, busy: bool = False) -> bool:
+        u = min(1.0, max(0.0, uncertainty))
+        interval = self.min_interval + (self.max_interval - self.min_interval) * (1.0 - u)
+        if self.cpu_budget > 0 and latency > 0:
+            interval = max(interval, latency / self.cpu_budget)
+        self.interval = interval
+        # con un frame aun pendiente en el detector otro submit solo lo reemplazaria
+        if busy:
+            return False
+        if self.last is not None and 0.0 <= ts - self.last < interval:
+            return False
+        self.last = ts
+        self.triggers += 1
+        return True
+
+    def track_max_age(self, latency: float = 0.0) -> float:
+        # segundos que debe aguantar un track sin deteccion cuando todo esta estable (intervalo maximo):
+        # dos intervalos (sobrevive a una deteccion perdida) + lo que tarda en llegar el resultado
+        interval = self.max_interval
+        if self.cpu_budget > 0 and latency > 0:
+            interval = max(interval, latency / self.cpu_budget)
+        return 2.0 * interval + latency
+
+
+class roi_planner:
+    # pad: margen relativo al lado mayor de la caja; los lados se redondean a multiplos de quant
+    # para que el letterbox del detector reutilice geometria (recorte cuadrado = sin padding)
+    def __init__(self, full_every: float = 1.0, pad: float = 0.75, min_size: int = 96, max_rois: int = 4, quant: int = 32):
+        self.full_every = full_every
+        self.pad = pad
+        self.min_size = min_size
+        self.max_rois = max_rois
+        self.quant = quant
+        self.last_full = None
+        self.full_sweeps = 0
+        self.roi_sweeps = 0
+
+    def _square(self, b, w: int, h: int):
+        x1, y1, x2, y2 = b
+        side = max(x2 - x1, y2 - y1) * (1.0 + 2.0 * self.pad)
+        side = max(self.min_size, int(np.ceil(side / self.quant)) * self.quant)
+        side = min(side, w, h)
+        cx, cy = (x1 + x2) * 0.5, (y1 + y2) * 0.5
+        # se desplaza para quedar dentro del frame en vez de recortarse
+        rx = int(min(max(0, cx - side * 0.5), w - side))
+        ry = int(min(max(0, cy - side * 0.5), h - side))
+        return (rx, ry, rx + side, ry + side)
+
+    @staticmethod
+    def _covers(a, b) -> bool:
+        return a[0] <= b[0] and a[1] <= b[1] and a[2] >= b[2] and a[3] >= b[3]
+
+    def plan(self, frame_shape, boxes, ts: float, lost: bool = False):
+        # regresa None para barrido completo o una lista de rois (x1, y1, x2, y2) en pixeles del frame
+        h, w = frame_shape[:2]
+        due = self.last_full is None or ts - self.last_full >= self.full_every
+        if lost or due or not boxes:
+            self.last_full = ts
+            self.full_sweeps += 1
+            return None
+
+        rois = []
+        for b in boxes:
+            r = self._square(b, w, h)
+            # una caja ya contenida en un roi existente no genera otro recorte
+            if any(self._covers(o, (b[0], b[1], b[2], b[3])) for o in rois):
+                continue
+            rois.append(r)
+        if len(rois) > self.max_rois or sum((r[2] - r[0]) * (r[3] - r[1]) for r in rois) >= w * h * 0.5:
+            # recortar ya no ahorra: frame completo
+            self.last_full = ts
+            self.full_sweeps += 1
+            return None
+        self.roi_sweeps += 1
+        return rois
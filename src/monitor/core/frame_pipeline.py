@@ -0,0 +1,89 @@
+# separa el frame de analisis del frame de pantalla
+# - analisis: frame de camara intacto, reducido a analysis_width si hace falta (nunca se dibuja encima)
+# - pantalla: letterbox 960x540 donde van el badge y los overlays
+# detector y trackers trabajan en coordenadas de analisis; map_state las lleva a pantalla
+
+import cv2
+import numpy as np
+
+
+class frame_pipeline:
+    def __init__(self, analysis_width: int = 640, display_w: int = 960, display_h: int = 540, pad_color=(245, 246, 248)):
+        # analysis_width <= 0 usa la resolucion nativa
+        self.analysis_width = analysis_width
+        self.display_w = display_w
+        self.display_h = display_h
+        self.pad_color = pad_color
+        self._key = None
+        self._analysis = None
+        self._display = None
+
+    def _setup(self, w: int, h: int):
+        self._key = (w, h)
+        if self.analysis_width > 0 and w > self.analysis_width:
+            self.sa = self.analysis_width / w
+            self.aw, self.ah = self.analysis_width, int(round(h * self.sa))
+            self._analysis = np.empty((self.ah, self.aw, 3), dtype=np.uint8)
+        else:
+            self.sa = 1.0
+            self.aw, self.ah = w, h
+            self._analysis = None
+
+        self.sd = min(self.display_w / w, self.display_h / h)
+        self.dw, self.dh = int(w * self.sd), int(h * self.sd)
+        self.dx0 = (self.display_w - self.dw) // 2
+        self.dy0 = (self.display_h - self.dh) // 2
+        self._display = np.empty((self.display_h, self.display_w, 3), dtype=np.uint8)
+        self._display[:] = self.pad_color
+        # analisis -> pantalla
+        self.k = self.sd / self.sa
+
+    def analysis(self, raw: np.ndarray) -> np.ndarray:
+        h, w = raw.shape[:2]
+        if self._key != (w, h):
+            self._setup(w, h)
+        if self._analysis is None:
+            return raw
+        return cv2.resize(raw, (self.aw, self.ah), dst=self._analysis, interpolation=cv2.INTER_AREA)
+
+    def display(self, raw: np.ndarray) -> np.ndarray:
+        # el buffer se reutiliza: el padding se pinta una vez y la region util se sobreescribe cada frame
+        h, w = raw.shape[:2]
+        if self._key != (w, h):
+            self._setup(w, h)
+        region = self._display[self.dy0 : self.dy0 + self.dh, self.dx0 : self.dx0 + self.dw]
+        out = cv2.resize(raw, (self.dw, self.dh), dst=region, interpolation=cv2.INTER_AREA)
+        if out is not region:
+            region[...] = out
+        return self._display
+
+    def prepare(self, raw: np.ndarray):
+        return self.analysis(raw), self.display(raw)
+
+    def to_display(self, bbox):
+        if not bbox:
+            return bbox
+        x1, y1, x2, y2 = bbox
+        k, x0, y0 = self.k, self.dx0, self.dy0
+        return (int(x1 * k + x0), int(y1 * k + y0), int(x2 * k + x0), int(y2 * k + y0))
+
+    def to_analysis(self, bbox):
+        if not bbox:
+            return bbox
+        x1, y1, x2, y2 = bbox
+        k, x0, y0 = self.k, self.dx0, self.dy0
+        return (int((x1 - x0) / k), int((y1 - y0) / k), int((x2 - x0) / k), int((y2 - y0) / k))
+
+    def map_items(self, items):
+        # lista de dicts con bbox (p.ej. tracks con id) a coordenadas de pantalla
+        return [dict(item, bbox=self.to_display(item["bbox"])) for item in items]
+
+    def map_state(self, state: dict) -> dict:
+        # copia de un estado de detector/tracker con las cajas en coordenadas de pantalla
+        out = {}
+        for name, item in state.items():
+            if isinstance(item, dict) and "bbox" in item:
+                out[name] = dict(item, bbox=self.to_display(item["bbox"]))
+            else:
+                out[name] = item
+        return out
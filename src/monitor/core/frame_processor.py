@@ -0,0 +1,187 @@
+# logica por frame de analisis compartida por preview, headless y replay
+# reposo -> planificador de deteccion -> fusion de detecciones -> trackers -> actividad -> telemetria -> clips
+# last_timings guarda la duracion (s) de cada etapa del ultimo frame; medir cuesta unos perf_counter por frame
+# con utils.metrics encendido las etapas tambien van a histogramas frame_stage_seconds
+# arranque: el detector carga en segundo plano; hasta que esta listo no se le envian frames
+# y los hitos (primer frame, modelo listo, primera deteccion) quedan en boot / boot_events
+# clips (--clips): active->idle, fault o tip perdido disparan un clip con pre-roll; los terminados en clip_events
+
+import time
+
+from ..io.clip_recorder import clip_recorder
+from ..io.telemetry import telemetry_writer
+from ..models.detector_yolo import yolo_detector
+from ..tracking.activity import activity_engine
+from ..tracking.motion_gate import motion_gate
+from ..tracking.trackers import multi_target_tracking
+from ..utils import metrics
+from .detect_scheduler import detect_scheduler, roi_planner
+
+stage_names = ("gate", "detect", "fusion", "track", "activity", "telemetry", "record")
+
+
+def build_detector(args, background: bool = True):
+    return yolo_detector(
+        model_path=args.model,
+        conf_thr=0.25,
+        imgsz=args.imgsz,
+        debug=False,
+        backend=args.backend,
+        threads=args.threads,
+        roi_imgsz=args.roi_imgsz,
+        background=background,
+    )
+
+
+class frame_processor:
+    # metric_labels: labels extra de todas sus metricas y las de sus trackers; con varias camaras
+    # en un proceso ({"camera": id}) cada hilo escribe sus propios histogramas
+    def __init__(self, args, detector, boot_ts: float | None = None, metric_labels: dict | None = None):
+        self.detector = detector
+        self.scheduler = detect_scheduler(max_interval=args.det_max_interval, cpu_budget=args.det_budget)
+        # los tracks de instancia viven lo que tarda en llegar la deteccion al intervalo maximo, con margen
+        self.mtt = multi_target_tracking(instance_max_age=self.scheduler.track_max_age(), metric_labels=metric_labels)
+        self.planner = roi_planner(full_every=args.roi_full_every) if args.roi_full_every > 0 else None
+        self.gate = motion_gate(idle_after=args.idle_after) if args.idle_after > 0 else None
+        self.engine = activity_engine()
+        self.telemetry = telemetry_writer(args.telemetry) if args.telemetry else None
+        self.recorder = None
+        if args.clips:
+            self.recorder = clip_recorder(
+                args.clips, fps=args.clip_fps, pre_roll=args.clip_pre, post_roll=args.clip_post, max_mb=args.clip_max_mb
+            )
+
+        # ultimo estado; en reposo se congela y se sigue dibujando/reportando
+        self.det_state = {}
+        self.trk_state = {}
+        self.idle = False
+        self.transition = None
+        self.clip_events = []
+        self._tip_ok = False
+        self.submitted = 0
+        self.last_timings = dict.fromkeys(stage_names, 0.0)
+
+        # hitos de arranque en segundos desde boot_ts (time.monotonic del inicio del proceso)
+        self.boot_ts = time.monotonic() if boot_ts is None else boot_ts
+        self.boot = {}
+        self.boot_events = []
+
+        # sin efecto con las metricas apagadas
+        self._stage_hist = None
+        labels = metric_labels or {}
+        if metrics.enabled():
+            desc = "etapas del procesamiento por frame de analisis"
+            self._stage_hist = [(k, metrics.histogram_for("frame_stage_seconds", desc, {**labels, "stage": k})) for k in stage_names]
+        metrics.instrument(self, "process", "frame_process_seconds", "procesamiento completo de un frame de analisis", labels)
+        metrics.instrument(self, "draw", "overlay_draw_seconds", "dibujo de overlays en el frame de pantalla", labels)
+        metrics.gauge_for("detector_submitted_total", lambda: self.submitted, "frames enviados al detector", labels, kind="counter")
+        metrics.gauge_for("scene_idle", lambda: int(self.idle), "1 si la compuerta de movimiento esta en reposo", labels)
+
+    def process(self, frame, frame_id: int, ts: float) -> bool:
+        # regresa False si la compuerta de movimiento dejo el frame en reposo
+        mtt, tm = self.mtt, self.last_timings
+        if len(self.boot) < 3 or self.boot_events:
+            self._boot_milestones()
+        t0 = time.perf_counter()
+        ctx = mtt.context(frame, frame_id=frame_id, ts=ts)
+        active = self.gate is None or self.gate.update(ctx, mtt.roi_boxes())
+        self.idle = not active
+        t1 = time.perf_counter()
+        tm["gate"] = t1 - t0
+
+        if active:
+            det = self.detector
+            # con la latencia medida el piso del presupuesto puede alargar el intervalo
+            mtt.instances.max_age = self.scheduler.track_max_age(det.latency)
+            if det.ready and self.scheduler.should_detect(ts, mtt.uncertainty(), det.latency, det.busy):
+                rois = self.planner.plan(frame.shape, mtt.roi_boxes(), ts, lost=mtt.take_lost()) if self.planner else None
+                det.submit(frame, frame_id=frame_id, ts=ts, rois=rois)
+                self.submitted += 1
+            t2 = time.perf_counter()
+            tm["detect"] = t2 - t1
+
+            self.det_state = det.get_state()
+            if self.det_state.get("tip") or self.det_state.get("reel"):
+                mtt.update_from_detections(frame, self.det_state, now=ts, ctx=ctx)
+            t3 = time.perf_counter()
+            tm["fusion"] = t3 - t2
+
+            self.trk_state = mtt.step(frame, ctx)
+            t1 = time.perf_counter()
+            tm["track"] = t1 - t3
+        else:
+            tm["detect"] = tm["fusion"] = tm["track"] = 0.0
+
+        # transiciones ACTIVE/IDLE/FAULT; en reposo el estado congelado cuenta como sin movimiento
+        self.transition = self.engine.update(ts, self.trk_state, ctx)
+        t2 = time.perf_counter()
+        tm["activity"] = t2 - t1
+
+        if self.telemetry is not None:
+            self.telemetry.append(frame_id, ts, self.det_state, self.trk_state, self.engine.state, self.idle)
+        t1 = time.perf_counter()
+        tm["telemetry"] = t1 - t2
+
+        if self.recorder is not None:
+            self._record(frame, ts)
+            tm["record"] = time.perf_counter() - t1
+
+        if self._stage_hist is not None:
+            # en reposo detect/fusion/track quedan en 0 y no se registran
+            for k, h in self._stage_hist:
+                if tm[k]:
+                    h.observe(tm[k])
+        return active
+
+    def _record(self, frame, ts: float):
+        # el frame entra antes del trigger para que el pre-roll incluya el momento del evento
+        rec = self.recorder
+        rec.push(frame, ts, self.det_state, self.trk_state, self.engine.state)
+        tr = self.transition
+        if tr is not None and tr["state"] == "FAULT":
+            rec.trigger("fault", ts)
+        elif tr is not None and tr["prev"] == "ACTIVE" and tr["state"] == "IDLE":
+            rec.trigger("active_to_idle", ts)
+        tip = self.trk_state.get("tip")
+        tip_ok = bool(tip and tip.get("ok"))
+        if self._tip_ok and not tip_ok:
+            rec.trigger("tip_lost", ts)
+        self._tip_ok = tip_ok
+        self.clip_events = rec.poll()
+
+    def _boot_milestones(self):
+        self.boot_events = []
+        det = self.detector
+        if "first_frame" not in self.boot:
+            self._milestone("first_frame")
+        if "model_ready" not in self.boot and det.ready:
+            self._milestone(
+                "model_ready",
+                load_s=round(getattr(det, "load_time", 0.0), 3),
+                warmup_s=round(getattr(det, "warmup_time", 0.0), 3),
+            )
+        if "first_detection" not in self.boot and det.inferences > 0:
+            self._milestone("first_detection")
+
+    def _milestone(self, name: str, **extra):
+        t = round(time.monotonic() - self.boot_ts, 3)
+        self.boot[name] = t
+        self.boot_events.append({"type": "event", "event": "boot", "stage": name, "t": t, **extra})
+
+    def draw(self, display, pipeline):
+        # overlays en el frame de pantalla (coordenadas via pipeline.map_*)
+        # import diferido: headless no necesita la ui (pil)
+        from ..ui.startup_screen import draw_detection_overlay, draw_instance_overlay, draw_status_badge, draw_tracking_overlay
+
+        draw_detection_overlay(display, pipeline.map_state(self.det_state), conf_min=0.25)
+        draw_tracking_overlay(display, pipeline.map_state(self.trk_state))
+        if not self.idle:
+            draw_instance_overlay(display, pipeline.map_items(self.mtt.tracks()))
+        badge = f"{self.engine.state} (reposo)" if self.idle else self.engine.state
+        draw_status_badge(display, badge, bottom=True)
+
+    def close(self):
+        if self.telemetry is not None:
+            self.telemetry.close()
+        if self.recorder is not None:
+            self.recorder.close()
@@ -0,0 +1,63 @@
+# buzon de un solo lugar donde el frame mas nuevo siempre gana
+# triple buffer preasignado: uno pendiente, uno en uso por el consumidor y uno libre
+# el productor nunca espera; si habia un frame pendiente se sobreescribe y cuenta como descartado
+# pensado para un solo productor y un solo consumidor
+
+import threading
+
+import numpy as np
+
+
+class frame_mailbox:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._bufs = [None, None, None]
+        self._pending = -1  # slot con frame sin leer
+        self._busy = -1  # slot que tiene el consumidor
+        self._pending_meta = None
+        self.submitted = 0
+        self.dropped = 0
+
+    def put(self, frame: np.ndarray, frame_id: int, ts: float):
+        i, buf = self.reserve(frame.shape, frame.dtype)
+        np.copyto(buf, frame)
+        self.publish(i, frame_id, ts)
+
+    def reserve(self, shape, dtype=np.uint8):
+        # slot libre para escribir en sitio (p.ej. cap.retrieve(buf)); luego publish()
+        with self._cond:
+            i = next(k for k in range(3) if k != self._busy and k != self._pending)
+            buf = self._bufs[i]
+            if buf is None or buf.shape != tuple(shape) or buf.dtype != dtype:
+                buf = self._bufs[i] = np.empty(shape, dtype=dtype)
+            return i, buf
+
+    def publish(self, i: int, frame_id: int, ts: float):
+        with self._cond:
+            if self._pending >= 0:
+                self.dropped += 1
+            self._pending = i
+            self._pending_meta = (frame_id, ts)
+            self.submitted += 1
+            self._cond.notify()
+
+    def get(self, timeout: float = 0.1):
+        # regresa (frame, frame_id, ts) o None; el frame es valido hasta el siguiente get
+        with self._cond:
+            if self._pending < 0:
+                self._cond.wait(timeout)
+                if self._pending < 0:
+                    return None
+            i = self._pending
+            self._busy = i
+            self._pending = -1
+            frame_id, ts = self._pending_meta
+            return self._bufs[i], frame_id, ts
+
+    def pending(self) -> int:
+        return 1 if self._pending >= 0 else 0
+
+    def clear(self):
+        with self._cond:
+            self._pending = -1
+            self._busy = -1
@@ -0,0 +1,284 @@
+# pipeline multiproceso: captura, deteccion, tracking y render en procesos separados
+# los frames viven en un shm_frame_ring; por las colas solo viajan (slot, frame_id, ts)
+# y resultados pequenos (dicts de cajas). colas acotadas que descartan el elemento mas viejo
+# cada etapa publica sus fps en un arreglo compartido para ver cual es el cuello de botella
+
+import multiprocessing as mp
+import queue
+import sys
+import time
+
+import numpy as np
+
+from .shm_ring import shm_frame_ring
+
+stage_names = ("capture", "detect", "track", "render")
+
+
+def _put_latest(q, item):
+    # si la cola esta llena se tira lo mas viejo; el productor nunca se bloquea
+    while 1:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+
+
+class _fps_meter:
+    def __init__(self, stats, idx: int):
+        self.stats = stats
+        self.idx = idx
+        self.n = 0
+        self.t0 = time.time()
+
+    def tick(self):
+        self.n += 1
+        now = time.time()
+        dt = now - self.t0
+        if dt >= 1.0:
+            self.stats[self.idx] = self.n / dt
+            self.n = 0
+            self.t0 = now
+
+
+def _capture_stage(spec, cam_index, profile, det_q, trk_q, stop, stats):
+    import cv2
+
+    from ..devices.camera import open_camera
+
+    ring = shm_frame_ring.attach(spec)
+    meter = _fps_meter(stats, 0)
+    h, w = ring.shape[:2]
+    cap = open_camera(cam_index, profile=profile)
+    frame_id = 0
+    try:
+        if cap is None:
+            return
+        while not stop.is_set():
+            slot = ring.next_slot()
+            dst = ring.frames[slot]
+            # lectura directa sobre el slot del anillo si la resolucion coincide
+            ok, img = cap.read(dst)
+            if not ok:
+                break
+            if not np.shares_memory(img, dst):
+                if img.shape[:2] != (h, w):
+                    cv2.resize(img, (w, h), dst=dst, interpolation=cv2.INTER_AREA)
+                else:
+                    np.copyto(dst, img)
+            frame_id += 1
+            ts = time.time()
+            ring.commit(slot, frame_id, ts)
+            msg = (slot, frame_id, ts)
+            _put_latest(det_q, msg)
+            _put_latest(trk_q, msg)
+            meter.tick()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # sin camara el resto del pipeline no tiene nada que hacer
+        stop.set()
+        if cap is not None:
+            cap.release()
+        ring.close()
+
+
+def _detect_stage(spec, det_kwargs, det_q, res_q, stop, stats):
+    from ..models.backends import create_backend
+    from ..models.detector_yolo import build_target_state, resolve_target_ids, target_lut, yolo_detector
+    from ..models.preprocess import letterbox_preprocessor
+
+    ring = shm_frame_ring.attach(spec)
+    meter = _fps_meter(stats, 1)
+    try:
+        backend = create_backend(**det_kwargs)
+        pre = letterbox_preprocessor(backend.imgsz, layout=backend.layout)
+        id_to_name = {int(k): str(v).lower() for k, v in backend.names.items()}
+        lut = target_lut(id_to_name, resolve_target_ids(id_to_name, yolo_detector._target_names))
+        while not stop.is_set():
+            try:
+                slot, frame_id, ts = det_q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            frame = ring.view(slot, frame_id)
+            if frame is None:
+                continue
+            t0 = time.time()
+            tensor, meta = pre.process(frame)
+            if not ring.valid(slot, frame_id):
+                # el slot se reutilizo durante el letterbox; el tensor puede estar mezclado
+                continue
+            out = backend.infer(tensor)
+            st = build_target_state(out, meta, frame_id, ts, lut, time.time() - t0)
+            _put_latest(res_q, st)
+            meter.tick()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.close()
+
+
+def _track_stage(spec, res_q, trk_q, ren_q, stop, stats):
+    from ..models.detector_yolo import detection_state
+    from ..tracking.trackers import multi_target_tracking
+
+    ring = shm_frame_ring.attach(spec)
+    meter = _fps_meter(stats, 2)
+    mtt = multi_target_tracking()
+    det_state = detection_state()
+    # csrt/lk y kalman guardan estado entre frames: trabajan sobre una copia propia, no sobre el slot compartido
+    frame = np.empty(ring.shape, dtype=np.uint8)
+    try:
+        while not stop.is_set():
+            try:
+                slot, frame_id, ts = trk_q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            view = ring.view(slot, frame_id)
+            if view is None:
+                continue
+            np.copyto(frame, view)
+            if not ring.valid(slot, frame_id):
+                # el slot se reutilizo durante la copia; se descarta antes de tocar trackers y kalman
+                continue
+
+            ctx = mtt.context(frame, frame_id=frame_id, ts=ts)
+            # toma el resultado de deteccion mas reciente disponible
+            while 1:
+                try:
+                    det_state = res_q.get_nowait()
+                except queue.Empty:
+                    break
+            if det_state.get("tip") or det_state.get("reel"):
+                mtt.update_from_detections(frame, det_state, now=ts, ctx=ctx)
+            trk_state = mtt.step(frame, ctx)
+
+            if ring.valid(slot, frame_id):
+                _put_latest(ren_q, (slot, frame_id, ts, det_state, trk_state, mtt.tracks()))
+            meter.tick()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.close()
+
+
+def _render_stage(spec, ren_q, stop, stats, overlay_text):
+    import cv2
+
+    from ..ui.startup_screen import (
+        draw_detection_overlay,
+        draw_instance_overlay,
+        draw_status_badge,
+        draw_tracking_overlay,
+        window_name,
+    )
+
+    from .frame_pipeline import frame_pipeline
+
+    ring = shm_frame_ring.attach(spec)
+    meter = _fps_meter(stats, 3)
+    # las etapas analizan el frame de captura nativo; solo se mapea a pantalla
+    pipeline = frame_pipeline(analysis_width=0)
+    try:
+        while not stop.is_set():
+            try:
+                slot, frame_id, ts, det_state, trk_state, tracks = ren_q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            frame = ring.view(slot, frame_id)
+            if frame is None:
+                continue
+            disp = pipeline.display(frame)
+            if not ring.valid(slot, frame_id):
+                continue
+
+            draw_status_badge(disp, overlay_text)
+            draw_detection_overlay(disp, pipeline.map_state(det_state), conf_min=0.25)
+            draw_tracking_overlay(disp, pipeline.map_state(trk_state))
+            draw_instance_overlay(disp, pipeline.map_items(tracks))
+            fps_txt = "  ".join(f"{n} {stats[i]:.0f}" for i, n in enumerate(stage_names))
+            cv2.putText(disp, fps_txt, (16, 530), cv2.FONT_HERSHEY_DUPLEX, 0.5, (60, 65, 70), 1, 16)
+
+            cv2.imshow(window_name, disp)
+            meter.tick()
+            k = cv2.waitKey(1) & 0xff
+            if k in (ord("q"), 27):
+                stop.set()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        ring.close()
+        cv2.destroyAllWindows()
+
+
+_det_q_size = 1
+_trk_q_size = 2
+_ren_q_size = 2
+
+
+def min_slots() -> int:
+    # slots que pueden estar en vuelo a la vez: el que escribe la captura, uno por mensaje en cada cola
+    # y uno por etapa que lee del anillo (deteccion, tracking, render); con menos, un lector pierde su frame
+    return 1 + _det_q_size + _trk_q_size + _ren_q_size + 3
+
+
+def run_pipeline(cam_index: int, det_kwargs: dict, profile: str = "low_latency", slots: int = 0, stats_every: float = 5.0):
+    # arranca las cuatro etapas y espera a que alguna pida parar (q en la ventana o fallo de camara)
+    # slots: tamano del anillo; nunca menos que min_slots()
+    from ..devices.camera import capture_profiles
+
+    ctx = mp.get_context("spawn")
+    prof = capture_profiles[profile]
+    ring = shm_frame_ring((prof.get("height", 480), prof.get("width", 640), 3), slots=max(slots, min_slots()))
+    stop = ctx.Event()
+    stats = ctx.Array("d", len(stage_names), lock=False)
+    det_q = ctx.Queue(maxsize=_det_q_size)
+    trk_q = ctx.Queue(maxsize=_trk_q_size)
+    res_q = ctx.Queue(maxsize=2)
+    ren_q = ctx.Queue(maxsize=_ren_q_size)
+
+    spec = ring.spec()
+    procs = [
+        ctx.Process(target=_capture_stage, name="capture", args=(spec, cam_index, profile, det_q, trk_q, stop, stats), daemon=True),
+        ctx.Process(target=_detect_stage, name="detect", args=(spec, det_kwargs, det_q, res_q, stop, stats), daemon=True),
+        ctx.Process(target=_track_stage, name="track", args=(spec, res_q, trk_q, ren_q, stop, stats), daemon=True),
+        ctx.Process(
+            target=_render_stage,
+            name="render",
+            args=(spec, ren_q, stop, stats, "pipeline multiproceso (q para salir)"),
+            daemon=True,
+        ),
+    ]
+    for p in procs:
+        p.start()
+
+    last = time.time()
+    try:
+        while not stop.is_set():
+            if not all(p.is_alive() for p in procs):
+                break
+            time.sleep(0.2)
+            if stats_every > 0 and time.time() - last >= stats_every:
+                last = time.time()
+                line = " ".join(f"{n}={stats[i]:.1f}" for i, n in enumerate(stage_names))
+                print(f"[pipeline] fps {line}", file=sys.stderr, flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        for p in procs:
+            p.join(timeout=2.0)
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+                p.join(timeout=1.0)
+        for q in (det_q, trk_q, res_q, ren_q):
+            q.cancel_join_thread()
+            q.close()
+        ring.close()
+    return 0
@@ -0,0 +1,77 @@
+# anillo de frames en multiprocessing.shared_memory
+# los procesos se pasan solo el indice de slot y el frame_id; los pixeles nunca se serializan
+# el escritor sobreescribe el slot mas viejo (drop-oldest); el lector valida con el frame_id
+# que el slot no haya sido reutilizado mientras lo usaba
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class shm_frame_ring:
+    def __init__(self, shape, slots: int = 8, name: str | None = None, create: bool = True):
+        self.shape = tuple(int(v) for v in shape)
+        self.slots = int(slots)
+        hdr_bytes = self.slots * 2 * 8
+        frame_bytes = int(np.prod(self.shape))
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=hdr_bytes + self.slots * frame_bytes)
+        # solo el proceso que crea el anillo lo libera (unlink); los hijos comparten su resource_tracker
+        self.owner = create
+        # cabecera por slot: [frame_id, ts]; frame_id = -1 mientras se escribe
+        self.header = np.ndarray((self.slots, 2), dtype=np.float64, buffer=self.shm.buf)
+        self.frames = np.ndarray((self.slots,) + self.shape, dtype=np.uint8, buffer=self.shm.buf, offset=hdr_bytes)
+        if create:
+            self.header[:, 0] = -1.0
+        self._seq = 0
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def spec(self):
+        # argumentos para attach() desde otro proceso
+        return (self.name, self.shape, self.slots)
+
+    @classmethod
+    def attach(cls, spec):
+        name, shape, slots = spec
+        return cls(shape, slots=slots, name=name, create=False)
+
+    def next_slot(self) -> int:
+        # slot que se escribira a continuacion; permite capturar directo sobre el (cap.read(dst))
+        slot = self._seq % self.slots
+        self.header[slot, 0] = -1.0
+        return slot
+
+    def commit(self, slot: int, frame_id: int, ts: float):
+        self.header[slot, 1] = ts
+        self.header[slot, 0] = float(frame_id)
+        self._seq += 1
+
+    def write(self, frame: np.ndarray, frame_id: int, ts: float) -> int:
+        slot = self.next_slot()
+        np.copyto(self.frames[slot], frame)
+        self.commit(slot, frame_id, ts)
+        return slot
+
+    def valid(self, slot: int, frame_id: int) -> bool:
+        return self.header[slot, 0] == float(frame_id)
+
+    def view(self, slot: int, frame_id: int):
+        # vista sin copia; None si el slot ya fue reutilizado
+        if not self.valid(slot, frame_id):
+            return None
+        return self.frames[slot]
+
+    def close(self):
+        self.header = None
+        self.frames = None
+        try:
+            self.shm.close()
+        except Exception:
+            pass
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
@@ -5,27 +5,63 @@ import cv2
 
 
 def find_camera_index(max_index: int = 5) -> int:
-    # recorre indices 0..max_index y valida lectura
-    for i in range(max_index + 1):
-        cap = cv2.VideoCapture(i)
-        if cap.isOpened():
-            ok, _ = cap.read()
-            cap.release()
-            if ok:
-                return i
-    return -1
-
-
-def open_camera(index: int):
-    # abre camara y configura resolucion y fps basicos
-    cap = cv2.VideoCapture(index)
+    # enumera /dev/video* y prueba en paralelo (ver discovery); -1 si no hay camara
+    from .discovery import find_camera
+
+    dev = find_camera(max_index=max_index)
+    return dev.index if dev is not None else -1
+
+
+# perfiles de captura; exposure/auto_exposure siguen la convencion v4l2 de opencv
+# (auto_exposure: 1 = manual, 3 = automatica)
+capture_profiles = {
+    "default": {"width": 640, "height": 480, "fps": 30},
+    "low_latency": {"width": 640, "height": 480, "fps": 30, "fourcc": "MJPG", "buffersize": 1},
+    "mjpeg_720p": {"width": 1280, "height": 720, "fps": 30, "fourcc": "MJPG", "buffersize": 1},
+    "fixed_exposure": {
+        "width": 640,
+        "height": 480,
+        "fps": 30,
+        "fourcc": "MJPG",
+        "buffersize": 1,
+        "auto_exposure": 1,
+        "exposure": 150,
+    },
+}
+
+
+def apply_profile(cap, profile: dict):
+    # el fourcc va antes que la resolucion: algunos drivers solo dan 30 fps en mjpeg
+    if profile.get("fourcc"):
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*profile["fourcc"]))
+    if "width" in profile:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, profile["width"])
+    if "height" in profile:
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, profile["height"])
+    if "fps" in profile:
+        cap.set(cv2.CAP_PROP_FPS, profile["fps"])
+    if "buffersize" in profile:
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, profile["buffersize"])
+    if "auto_exposure" in profile:
+        cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, profile["auto_exposure"])
+    if "exposure" in profile:
+        cap.set(cv2.CAP_PROP_EXPOSURE, profile["exposure"])
+
+
+def open_camera(index: int | str, profile: str | dict = "default"):
+    # abre camara (indice o ruta /dev/...) y aplica el perfil de captura
+    if isinstance(index, str) and index.isdigit():
+        index = int(index)
+    if isinstance(index, str):
+        cap = cv2.VideoCapture(index, cv2.CAP_V4L2)
+    else:
+        cap = cv2.VideoCapture(index)
     if not cap.isOpened():
         return None
 
-    # 3 = width, 4 = height, 5 = fps
-    cap.set(3, 640)
-    cap.set(4, 480)
-    cap.set(5, 30)
+    if isinstance(profile, str):
+        profile = capture_profiles[profile]
+    apply_profile(cap, profile)
 
     ok, _ = cap.read()
     if not ok:
@@ -0,0 +1,196 @@
+# captura en hilo propio: el VideoCapture se drena continuamente con grab()
+# y solo se decodifica (retrieve) uno de cada retrieve_every frames
+# el consumidor siempre recibe el frame mas nuevo; los que no alcanzo a leer cuentan como descartados
+# read() respeta la interfaz de cv2.VideoCapture para usarlo directo en show_camera_preview
+# con reopen, un corte de la camara (grab o retrieve fallido) no termina el hilo: se reabre en segundo plano
+# stats() (fps, grabs, descartes, reconexiones) tambien sale como gauges capture_* con utils.metrics encendido
+
+import functools
+import threading
+import time
+
+import numpy as np
+
+from ..core.mailbox import frame_mailbox
+from ..utils import metrics
+
+
+class camera_capture:
+    def __init__(self, cap, retrieve_every: int = 1, reopen=None, name: str = ""):
+        self.cap = cap
+        self.retrieve_every = max(1, retrieve_every)
+        # reopen() -> VideoCapture o None; se llama en bucle tras un fallo de lectura
+        self.reopen = reopen
+        self.connected = threading.Event()
+        self.reconnects = 0
+        self._mailbox = frame_mailbox()
+        self._stop = threading.Event()
+        self._thr: threading.Thread | None = None
+        self.failed = threading.Event()
+
+        # estadisticas
+        self.grabbed = 0
+        self.retrieved = 0
+        self.skipped = 0
+        self.delivered = 0
+        self.fps = 0.0
+        self._fps_n = 0
+        self._fps_t0 = time.time()
+
+        # meta del ultimo frame entregado por read()
+        self.last_frame_id = 0
+        self.last_ts = 0.0
+
+        # name distingue camaras en /metrics (headless con varias camaras)
+        labels = {"camera": name} if name else None
+        metrics.gauge_for("capture_fps", lambda: self.fps, "fps decodificados por el hilo de captura", labels)
+        for key, desc in (
+            ("grabbed", "frames leidos del driver"),
+            ("skipped", "grabs sin decodificar por --retrieve-every"),
+            ("dropped", "frames que el consumidor no alcanzo a leer + grabs sin decodificar"),
+            ("reconnects", "reaperturas de la camara tras un corte"),
+        ):
+            metrics.gauge_for(f"capture_{key}_total", functools.partial(getattr, self, key), desc, labels, kind="counter")
+
+    def start(self):
+        if self._thr and self._thr.is_alive():
+            return self
+        self._stop.clear()
+        self.failed.clear()
+        self.connected.set()
+        self._thr = threading.Thread(target=self._worker, daemon=True)
+        self._thr.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thr:
+            self._thr.join(timeout=2.0)
+
+    def release(self):
+        self.stop()
+        if self.cap is not None:
+            self.cap.release()
+
+    def wait_connected(self, timeout: float) -> bool:
+        return self.connected.wait(timeout)
+
+    @property
+    def reconnecting(self) -> bool:
+        return not self.connected.is_set() and not self.failed.is_set()
+
+    def isOpened(self):
+        return self.cap is not None and self.cap.isOpened() and not self.failed.is_set()
+
+    @property
+    def dropped(self) -> int:
+        # frames decodificados que nadie leyo + grabs sin decodificar
+        return self._mailbox.dropped + self.skipped
+
+    def stats(self):
+        return {
+            "fps": round(self.fps, 2),
+            "grabbed": self.grabbed,
+            "retrieved": self.retrieved,
+            "delivered": self.delivered,
+            "skipped": self.skipped,
+            "dropped": self.dropped,
+            "reconnects": self.reconnects,
+        }
+
+    def read_meta(self, timeout: float = 1.0):
+        # (ok, frame, frame_id, ts); el frame es valido hasta la siguiente lectura
+        deadline = time.time() + timeout
+        while 1:
+            job = self._mailbox.get(timeout=min(0.1, max(0.0, deadline - time.time())))
+            if job is not None:
+                frame, frame_id, ts = job
+                self.delivered += 1
+                self.last_frame_id = frame_id
+                self.last_ts = ts
+                return True, frame, frame_id, ts
+            if self.failed.is_set() or time.time() >= deadline:
+                return False, None, 0, 0.0
+
+    def read(self, timeout: float = 1.0):
+        ok, frame, _, _ = self.read_meta(timeout)
+        return ok, frame
+
+    def _reconnect(self) -> bool:
+        # reintenta con espera creciente hasta reabrir o hasta stop(); el frame_id sigue corriendo
+        self.connected.clear()
+        try:
+            self.cap.release()
+        except Exception:
+            pass
+        wait = 0.25
+        while not self._stop.is_set():
+            try:
+                cap = self.reopen()
+            except Exception:
+                cap = None
+            if cap is not None:
+                self.cap = cap
+                self.reconnects += 1
+                self.connected.set()
+                return True
+            self._stop.wait(wait)
+            wait = min(2.0, wait * 2)
+        return False
+
+    def _recover(self) -> bool:
+        # grab o retrieve fallido: se reabre si hay reopen; False = la captura termino
+        if self.reopen is None or not self._reconnect():
+            self.failed.set()
+            return False
+        return True
+
+    def _worker(self):
+        frame_id = 0
+        shape = None
+        while not self._stop.is_set():
+            if not self.cap.grab():
+                if not self._recover():
+                    return
+                shape = None
+                continue
+            ts = time.time()
+            self.grabbed += 1
+            if (self.grabbed - 1) % self.retrieve_every:
+                self.skipped += 1
+                continue
+
+            # decodifica directo sobre un buffer libre del buzon
+            if shape is None:
+                ok, img = self.cap.retrieve()
+                if not ok:
+                    if not self._recover():
+                        return
+                    continue
+                shape = img.shape
+                i, buf = self._mailbox.reserve(shape, img.dtype)
+                np.copyto(buf, img)
+            else:
+                i, buf = self._mailbox.reserve(shape)
+                ok, img = self.cap.retrieve(buf)
+                if not ok:
+                    if not self._recover():
+                        return
+                    shape = None
+                    continue
+                if img is not buf and not np.shares_memory(img, buf):
+                    # la resolucion cambio (p.ej. renegociacion del driver)
+                    shape = img.shape
+                    i, buf = self._mailbox.reserve(shape, img.dtype)
+                    np.copyto(buf, img)
+
+            frame_id += 1
+            self.retrieved += 1
+            self._mailbox.publish(i, frame_id, ts)
+
+            self._fps_n += 1
+            dt = ts - self._fps_t0
+            if dt >= 1.0:
+                self.fps = self._fps_n / dt
+                self._fps_n = 0
+                self._fps_t0 = ts
@@ -0,0 +1,217 @@
+# descubrimiento rapido de camaras usb en linux
+# 1) enumera /dev/video* y filtra por capacidades v4l2 (los nodos de metadata de uvc se descartan)
+# 2) prueba los candidatos en paralelo con timeout (grab sin decodificar)
+# 3) prefiere el ultimo dispositivo bueno por ruta estable /dev/v4l/by-id
+# fuera de linux cae al recorrido clasico de indices
+# reconexion: solo la misma camara (by-id, o numero de serie / puerto usb + nombre); nunca otra que este conectada
+
+import fcntl
+import glob
+import os
+import re
+import struct
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+import cv2
+
+_last_device_file = os.path.join(os.path.expanduser("~"), ".cache", "monitor", "last_camera")
+
+# VIDIOC_QUERYCAP = _IOR('V', 0, struct v4l2_capability) con sizeof = 104
+_vidioc_querycap = (2 << 30) | (104 << 16) | (ord("V") << 8) | 0
+_cap_video_capture = 0x00000001
+_cap_video_capture_mplane = 0x00001000
+_cap_device_caps = 0x80000000
+
+
+@dataclass
+class camera_device:
+    path: str  # /dev/videoN
+    index: int
+    name: str = ""
+    by_id: str = ""  # /dev/v4l/by-id/... si existe
+    bus_info: str = ""  # puerto segun v4l2 (p.ej. usb-0000:00:14.0-2)
+    serial: str = ""  # numero de serie usb si el dispositivo lo reporta
+
+    @property
+    def stable_path(self) -> str:
+        return self.by_id or self.path
+
+
+def _query_caps(path: str):
+    # regresa (capacidades del nodo, bus_info) o (None, ""); device_caps si el driver las reporta
+    try:
+        fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+    except OSError:
+        return None, ""
+    try:
+        buf = bytearray(104)
+        fcntl.ioctl(fd, _vidioc_querycap, buf)
+        caps, device_caps = struct.unpack_from("<II", buf, 84)
+        bus_info = bytes(buf[48:80]).split(b"\0", 1)[0].decode(errors="replace")
+        return (device_caps if caps & _cap_device_caps else caps), bus_info
+    except OSError:
+        return None, ""
+    finally:
+        os.close(fd)
+
+
+def _by_id_links():
+    links = {}
+    for link in glob.glob("/dev/v4l/by-id/*"):
+        try:
+            links[os.path.realpath(link)] = link
+        except OSError:
+            pass
+    return links
+
+
+def _sysfs_name(index: int) -> str:
+    try:
+        with open(f"/sys/class/video4linux/video{index}/name", "r") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def _sysfs_serial(index: int) -> str:
+    # device es la interfaz usb; el serial vive en el dispositivo padre
+    try:
+        with open(f"/sys/class/video4linux/video{index}/device/../serial", "r") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def list_video_devices():
+    # nodos de captura ordenados por indice
+    links = _by_id_links()
+    out = []
+    for path in glob.glob("/dev/video*"):
+        m = re.match(r"^/dev/video(\d+)$", path)
+        if not m:
+            continue
+        caps, bus_info = _query_caps(path)
+        if caps is not None and not caps & (_cap_video_capture | _cap_video_capture_mplane):
+            continue
+        idx = int(m.group(1))
+        out.append(
+            camera_device(
+                path=path,
+                index=idx,
+                name=_sysfs_name(idx),
+                by_id=links.get(path, ""),
+                bus_info=bus_info,
+                serial=_sysfs_serial(idx),
+            )
+        )
+    out.sort(key=lambda d: d.index)
+    return out
+
+
+def same_device(a: camera_device, b: camera_device) -> bool:
+    # misma camara fisica: por numero de serie si ambos lo tienen, si no por puerto usb; el nombre debe coincidir
+    if a.name != b.name:
+        return False
+    if a.serial and b.serial:
+        return a.serial == b.serial
+    return bool(a.bus_info) and a.bus_info == b.bus_info
+
+
+def load_last_device() -> str:
+    try:
+        with open(_last_device_file, "r") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def save_last_device(dev: camera_device):
+    try:
+        os.makedirs(os.path.dirname(_last_device_file), exist_ok=True)
+        with open(_last_device_file, "w") as f:
+            f.write(dev.stable_path)
+    except OSError:
+        pass
+
+
+def _probe(path_or_index, results: dict, key):
+    ok = False
+    try:
+        if isinstance(path_or_index, str):
+            cap = cv2.VideoCapture(path_or_index, cv2.CAP_V4L2)
+        else:
+            cap = cv2.VideoCapture(path_or_index)
+        if cap.isOpened():
+            ok = bool(cap.grab())
+        cap.release()
+    except Exception:
+        ok = False
+    results[key] = ok
+
+
+def _order(devices, prefer: str):
+    if not prefer:
+        return devices
+    real = os.path.realpath(prefer) if os.path.exists(prefer) else ""
+    first = [d for d in devices if prefer in (d.by_id, d.path) or (real and d.path == real)]
+    return first + [d for d in devices if d not in first]
+
+
+def find_camera(prefer: str = "", timeout: float = 2.0, max_index: int = 5):
+    # regresa el camera_device funcional de mayor prioridad o None; solo /dev/video0..max_index
+    if not sys.platform.startswith("linux"):
+        # sin v4l (otro sistema operativo): recorrido clasico por indices
+        for i in range(max_index + 1):
+            res = {}
+            _probe(i, res, i)
+            if res.get(i):
+                return camera_device(path=str(i), index=i)
+        return None
+
+    devices = _order([d for d in list_video_devices() if d.index <= max_index], prefer or load_last_device())
+    if not devices:
+        return None
+
+    # un hilo daemon por candidato: un driver colgado no bloquea ni la busqueda ni la salida
+    results: dict = {}
+    for d in devices:
+        threading.Thread(target=_probe, args=(d.path, results, d.path), daemon=True).start()
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        for d in devices:
+            r = results.get(d.path)
+            if r is None:
+                break  # el de mayor prioridad sigue pendiente
+            if r:
+                return d
+        if all(d.path in results for d in devices):
+            return None
+        time.sleep(0.02)
+    for d in devices:
+        if results.get(d.path):
+            return d
+    return None
+
+
+def reopen_camera(prefer: str, profile="default", identity: camera_device | None = None):
+    # tras un corte usb el by-id puede apuntar a otro /dev/videoN; se intenta primero directo
+    # sin by-id (camara sin serial, enlace aun no creado) solo vale un nodo con la misma identidad;
+    # None mientras no vuelva: reabrir otra camara conectada seria monitorear la linea equivocada
+    from .camera import open_camera
+
+    if prefer and os.path.exists(prefer):
+        cap = open_camera(os.path.realpath(prefer), profile=profile)
+        if cap is not None:
+            return cap
+    if identity is None or not sys.platform.startswith("linux"):
+        return None
+    for dev in list_video_devices():
+        if same_device(dev, identity):
+            cap = open_camera(dev.path, profile=profile)
+            if cap is not None:
+                return cap
+    return None
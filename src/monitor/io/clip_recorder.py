@@ -0,0 +1,290 @@
+# grabador de clips por evento: sin grabacion continua a la sd
+# - anillo preasignado (n, h, w, 3) con los ultimos frames de analisis a clip_fps; cada frame se redimensiona
+#   directo a su slot, sin listas ni copias extra
+# - trigger(reason, ts): el clip toma pre_roll segundos del anillo + post_roll segundos siguientes;
+#   un trigger durante un clip lo extiende (hasta max_clip)
+# - un hilo codifica con cv2.VideoWriter y dibuja las anotaciones (cajas, actividad, hora) al codificar;
+#   si el anillo es mas angosto que el frame de analisis las cajas se escalan por scale al dibujar
+# - el bucle nunca espera: si el codificador va atrasado, los frames que pisarian slots pendientes se descartan
+#   memoria acotada por max_mb; cada clip deja un .json al lado con motivos, rango de ts y descartes
+#
+#   rec = clip_recorder("data/clips", pre_roll=5.0, post_roll=5.0)
+#   rec.push(frame, ts, det_state, trk_state, "ACTIVE")   # cada frame
+#   rec.trigger("tip_lost", ts)
+#   for clip in rec.poll(): ...                           # clips terminados
+
+import collections
+import json
+import os
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class _clip:
+    def __init__(self, start: int, ts: float, end_ts: float, max_ts: float, reason: str):
+        self.start = start  # seq del primer frame (incluido)
+        self.end = None  # seq final (excluido); None mientras dura el post-roll
+        self.ts = ts
+        self.end_ts = end_ts
+        self.max_ts = max_ts
+        self.reasons = [reason]
+        self.dropped = 0
+
+
+class clip_recorder:
+    def __init__(
+        self,
+        directory: str,
+        fps: float = 10.0,
+        pre_roll: float = 5.0,
+        post_roll: float = 5.0,
+        width: int = 640,
+        max_mb: float = 64.0,
+        max_clip: float = 60.0,
+        min_gap: float = 10.0,
+        fourcc: str = "mp4v",
+    ):
+        self.directory = directory
+        self.fps = fps
+        self.pre_roll = pre_roll
+        self.post_roll = post_roll
+        self.width = width
+        self.max_mb = max_mb
+        self.max_clip = max_clip
+        self.min_gap = min_gap
+        self.fourcc = fourcc
+        os.makedirs(directory, exist_ok=True)
+
+        # el anillo se reserva con el primer frame (tamano de analisis)
+        self._ring = None
+        self._meta = None
+        self.scale = 1.0  # anillo / frame de analisis
+        self._cap = 0
+        self._pre_n = 0
+        self._seq = 0  # frames escritos; el frame seq vive en el slot seq % cap
+        self._next_ts = None
+        # seq mas viejo que el codificador todavia necesita; el bucle no escribe encima (None = nada pendiente)
+        self._pin = None
+
+        self._clips = collections.deque()
+        self._active = None
+        self._last_end_ts = None
+        self._cond = threading.Condition()
+        self._done: queue.Queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thr = threading.Thread(target=self._worker, daemon=True)
+        self._thr.start()
+
+        self.pushed = 0
+        self.skipped = 0
+        self.suppressed = 0
+        self.clips = 0
+
+    def _alloc(self, frame):
+        h, w = frame.shape[:2]
+        if self.width and w > self.width:
+            self.scale = self.width / w
+            h, w = int(round(h * self.scale)), self.width
+        per_frame = h * w * 3
+        want = int(np.ceil((self.pre_roll + self.post_roll) * self.fps)) + 1
+        self._cap = max(2, min(want, int(self.max_mb * (1 << 20)) // per_frame))
+        self._pre_n = min(int(np.ceil(self.pre_roll * self.fps)), self._cap - 1)
+        self._ring = np.zeros((self._cap, h, w, 3), dtype=np.uint8)
+        self._meta = [None] * self._cap
+
+    def push(self, frame, ts: float, det_state=None, trk_state=None, activity: str = ""):
+        # llamado en cada frame; solo guarda a self.fps segun ts
+        if self._next_ts is not None and ts < self._next_ts:
+            self._close_active(ts)
+            return
+        # cadencia fija en ts; tras un hueco (reconexion, camara lenta) se reinicia desde este frame
+        step = 1.0 / self.fps
+        behind = self._next_ts is None or ts - self._next_ts > step
+        self._next_ts = ts + step if behind else self._next_ts + step
+        if self._ring is None:
+            self._alloc(frame)
+
+        seq = self._seq
+        pin = self._pin
+        if pin is not None and seq - self._cap >= pin:
+            # el codificador todavia no lee ese slot: se descarta este frame en vez de esperar
+            self.skipped += 1
+            if self._active is not None:
+                self._active.dropped += 1
+            self._close_active(ts)
+            return
+
+        slot = seq % self._cap
+        dst = self._ring[slot]
+        if frame.shape == dst.shape:
+            np.copyto(dst, frame)
+        else:
+            cv2.resize(frame, (dst.shape[1], dst.shape[0]), dst=dst, interpolation=cv2.INTER_AREA)
+        # det_state es una instantanea inmutable y trk_state un dict nuevo por frame: se guardan sin copiar
+        self._meta[slot] = (ts, det_state, trk_state, activity)
+        self._seq = seq + 1
+        self.pushed += 1
+        self._close_active(ts)
+        if self._clips:
+            with self._cond:
+                self._cond.notify()
+
+    def _close_active(self, ts: float):
+        a = self._active
+        if a is not None and ts >= a.end_ts:
+            with self._cond:
+                a.end = self._seq
+                self._active = None
+                self._last_end_ts = ts
+                self._cond.notify()
+
+    def trigger(self, reason: str, ts: float) -> bool:
+        # regresa True si abrio o extendio un clip
+        if self._ring is None:
+            return False
+        a = self._active
+        if a is not None:
+            a.end_ts = min(a.max_ts, max(a.end_ts, ts + self.post_roll))
+            if reason not in a.reasons:
+                a.reasons.append(reason)
+            return True
+        if self._last_end_ts is not None and ts - self._last_end_ts < self.min_gap:
+            self.suppressed += 1
+            return False
+        start = max(0, self._seq - self._pre_n, self._seq - self._cap + 1)
+        clip = _clip(start, ts, ts + self.post_roll, ts + self.max_clip, reason)
+        with self._cond:
+            self._clips.append(clip)
+            self._pin = start if self._pin is None else min(self._pin, start)
+            self._cond.notify()
+        self._active = clip
+        self.clips += 1
+        return True
+
+    def poll(self):
+        # clips terminados desde la ultima llamada: [{path, reasons, ts, end_ts, frames, dropped}]
+        out = []
+        while 1:
+            try:
+                out.append(self._done.get_nowait())
+            except queue.Empty:
+                return out
+
+    @property
+    def recording(self) -> bool:
+        return self._active is not None
+
+    def _update_pin(self, seq: int):
+        # llamado con el lock: lo mas viejo entre la posicion actual y los clips en cola
+        starts = [c.start for c in list(self._clips)[1:]]
+        self._pin = min([seq] + starts)
+
+    def _worker(self):
+        while 1:
+            with self._cond:
+                while not self._clips and not self._stop.is_set():
+                    self._cond.wait(0.5)
+                if not self._clips:
+                    return
+                clip = self._clips[0]
+            try:
+                self._encode(clip)
+            except Exception as e:
+                print("[clips] error al codificar:", e)
+            with self._cond:
+                self._clips.popleft()
+                self._pin = None
+                if self._clips:
+                    self._update_pin(self._clips[0].start)
+
+    def _scaled(self, state):
+        # copia del estado con las cajas en pixeles del anillo
+        if not state or self.scale == 1.0:
+            return state
+        k = self.scale
+        out = {}
+        for name, item in state.items():
+            if isinstance(item, dict) and item.get("bbox"):
+                out[name] = dict(item, bbox=tuple(int(round(v * k)) for v in item["bbox"]))
+            else:
+                out[name] = item
+        return out
+
+    def _annotate(self, img, meta):
+        # import diferido: pil solo hace falta si se graban clips
+        from ..ui.startup_screen import draw_detection_overlay, draw_status_badge, draw_tracking_overlay
+
+        ts, det_state, trk_state, activity = meta
+        det_state, trk_state = self._scaled(det_state), self._scaled(trk_state)
+        if det_state:
+            draw_detection_overlay(img, det_state, conf_min=0.25)
+        if trk_state:
+            draw_tracking_overlay(img, trk_state)
+        if activity:
+            draw_status_badge(img, activity, bottom=True)
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)) + f".{int((ts % 1) * 10)}"
+        cv2.putText(img, stamp, (img.shape[1] - 260, img.shape[0] - 16), cv2.FONT_HERSHEY_DUPLEX, 0.55, (255, 255, 255), 1, 16)
+
+    def _encode(self, clip: _clip):
+        name = "clip_" + time.strftime("%Y%m%d_%H%M%S", time.localtime(clip.ts)) + f"_{clip.reasons[0]}"
+        path = os.path.join(self.directory, name + ".mp4")
+        h, w = self._ring.shape[1:3]
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, (w, h))
+        if not writer.isOpened():
+            # sin codec mp4 en esta build de opencv
+            path = os.path.join(self.directory, name + ".avi")
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), self.fps, (w, h))
+        buf = np.empty((h, w, 3), dtype=np.uint8)
+        seq, frames, first_ts, last_ts = clip.start, 0, None, None
+        try:
+            while 1:
+                with self._cond:
+                    while seq >= self._seq and (clip.end is None or seq < clip.end):
+                        if self._stop.is_set() and clip.end is None:
+                            clip.end = self._seq
+                            break
+                        self._cond.wait(0.5)
+                    if clip.end is not None and seq >= clip.end:
+                        break
+                slot = seq % self._cap
+                np.copyto(buf, self._ring[slot])
+                meta = self._meta[slot]
+                seq += 1
+                with self._cond:
+                    self._update_pin(seq)
+                self._annotate(buf, meta)
+                writer.write(buf)
+                frames += 1
+                first_ts = meta[0] if first_ts is None else first_ts
+                last_ts = meta[0]
+        finally:
+            writer.release()
+
+        record = {
+            "type": "event",
+            "event": "clip_saved",
+            "path": path,
+            "reasons": clip.reasons,
+            "ts": first_ts,
+            "end_ts": last_ts,
+            "trigger_ts": clip.ts,
+            "frames": frames,
+            "dropped": clip.dropped,
+        }
+        with open(os.path.splitext(path)[0] + ".json", "w") as f:
+            json.dump(record, f)
+        self._done.put(record)
+
+    def close(self, timeout: float = 10.0):
+        # termina el clip en curso con lo que haya y espera a que se codifique
+        with self._cond:
+            if self._active is not None:
+                self._active.end = self._seq
+                self._active = None
+            self._stop.set()
+            self._cond.notify_all()
+        self._thr.join(timeout=timeout)
@@ -0,0 +1,92 @@
+# salidas de estado y eventos en json lines para el modo headless
+# stdout/archivo o un socket unix local que reparte cada linea a los clientes conectados
+
+import json
+import os
+import socket
+import sys
+import threading
+
+
+def _default(o):
+    # tuplas de numpy y similares
+    if hasattr(o, "tolist"):
+        return o.tolist()
+    return str(o)
+
+
+class jsonl_sink:
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        # varias camaras emiten desde sus hilos: una linea completa por escritura
+        self._lock = threading.Lock()
+
+    def emit(self, record: dict):
+        line = json.dumps(record, separators=(",", ":"), default=_default) + "\n"
+        with self._lock:
+            self.stream.write(line)
+            self.stream.flush()
+
+    def close(self):
+        if self.stream not in (sys.stdout, sys.stderr):
+            self.stream.close()
+
+
+class unix_socket_sink:
+    # socket unix de tipo stream; un cliente lento o caido se desconecta en vez de frenar el bucle
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.exists(path):
+            os.unlink(path)
+        self._srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._srv.bind(path)
+        self._srv.listen(4)
+        self._clients: list[socket.socket] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thr = threading.Thread(target=self._accept, daemon=True)
+        self._thr.start()
+
+    def _accept(self):
+        self._srv.settimeout(0.5)
+        while not self._stop.is_set():
+            try:
+                c, _ = self._srv.accept()
+            except (socket.timeout, OSError):
+                continue
+            c.setblocking(False)
+            with self._lock:
+                self._clients.append(c)
+
+    def emit(self, record: dict):
+        data = (json.dumps(record, separators=(",", ":"), default=_default) + "\n").encode()
+        with self._lock:
+            alive = []
+            for c in self._clients:
+                try:
+                    c.sendall(data)
+                    alive.append(c)
+                except (BlockingIOError, OSError):
+                    c.close()
+            self._clients = alive
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            for c in self._clients:
+                c.close()
+            self._clients = []
+        self._srv.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+def open_sink(target: str):
+    # "-" = stdout, "unix:/ruta.sock" = socket local, otra cosa = archivo jsonl (append)
+    if not target or target == "-":
+        return jsonl_sink()
+    if target.startswith("unix:"):
+        return unix_socket_sink(target[len("unix:") :])
+    return jsonl_sink(open(target, "a", buffering=1))
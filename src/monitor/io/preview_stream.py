@@ -0,0 +1,78 @@
+# vista previa mjpeg por http a baja tasa para el modo headless
+# solo se codifica un jpeg cuando hay clientes conectados y vencio el intervalo
+# ver en un navegador: http://<pi>:<puerto>/
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+_boundary = b"frame"
+
+
+class mjpeg_preview:
+    def __init__(self, port: int = 8080, fps: float = 1.0, width: int = 640, host: str = "0.0.0.0"):
+        self.interval = 1.0 / max(0.1, fps)
+        self.width = width
+        self._jpeg = b""
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._last = 0.0
+        self.clients = 0
+
+        preview = self
+
+        class _handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=" + _boundary.decode())
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                with preview._cond:
+                    preview.clients += 1
+                seen = -1
+                try:
+                    while 1:
+                        with preview._cond:
+                            preview._cond.wait_for(lambda: preview._seq != seen, timeout=5.0)
+                            seen, jpeg = preview._seq, preview._jpeg
+                        if not jpeg:
+                            continue
+                        self.wfile.write(b"--" + _boundary + b"\r\nContent-Type: image/jpeg\r\n")
+                        self.wfile.write(f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                        self.wfile.write(jpeg + b"\r\n")
+                except (BrokenPipeError, ConnectionResetError, OSError):
+                    pass
+                finally:
+                    with preview._cond:
+                        preview.clients -= 1
+
+        self._srv = ThreadingHTTPServer((host, port), _handler)
+        self._srv.daemon_threads = True
+        self._thr = threading.Thread(target=self._srv.serve_forever, daemon=True)
+        self._thr.start()
+
+    def wants_frame(self) -> bool:
+        # barato: se consulta cada frame y casi siempre regresa False
+        return self.clients > 0 and time.time() - self._last >= self.interval
+
+    def publish(self, frame_bgr):
+        self._last = time.time()
+        h, w = frame_bgr.shape[:2]
+        if w > self.width:
+            frame_bgr = cv2.resize(frame_bgr, (self.width, int(h * self.width / w)), interpolation=cv2.INTER_AREA)
+        ok, buf = cv2.imencode(".jpg", frame_bgr, [cv2.IMWRITE_JPEG_QUALITY, 70])
+        if not ok:
+            return
+        with self._cond:
+            self._jpeg = buf.tobytes()
+            self._seq += 1
+            self._cond.notify_all()
+
+    def close(self):
+        self._srv.shutdown()
+        self._srv.server_close()
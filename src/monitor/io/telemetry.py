@@ -0,0 +1,192 @@
+# telemetria binaria por frame: registros de ancho fijo, solo append, rotacion por tamano/tiempo
+# cada archivo: cabecera de 64 bytes + registros record_dtype (little endian, sin padding)
+# escritura: el bucle llena un lote preasignado y un hilo lo vuelca; nunca bloquea el bucle
+# lectura: numpy.memmap directo sobre los registros, sin parseo
+#
+#   logs = open_logs("data/telemetry")            # un memmap por archivo, en orden
+#   day = load_range("data/telemetry", t0, t1)   # un solo arreglo estructurado filtrado por ts
+
+import glob
+import os
+import queue
+import struct
+import threading
+import time
+
+import numpy as np
+
+_magic = b"MONTLM1\0"
+_header = struct.Struct("<8sII48x")  # magic, version, tamano de registro
+header_size = _header.size
+format_version = 2
+
+targets = ("tip", "reel")
+activity_codes = {"IDLE": 0, "ACTIVE": 1, "FAULT": 2}
+
+# cajas en <i4: kalman sigue extrapolando un objetivo perdido y sus coordenadas salen del frame (y de <i2)
+# la ausencia de caja va en su propio flag; una coordenada negativa es valida
+_fields = [("frame_id", "<u4"), ("ts", "<f8")]
+for _k in targets:
+    _fields += [
+        (f"{_k}_bbox", "<i4", (4,)),  # tracker, ceros si no hay caja
+        (f"{_k}_bbox_ok", "u1"),
+        (f"{_k}_ok", "u1"),
+        (f"{_k}_missed", "<u2"),
+        (f"{_k}_det_bbox", "<i4", (4,)),  # detector, ceros si no hay deteccion
+        (f"{_k}_det_ok", "u1"),
+        (f"{_k}_det_conf", "<f4"),
+    ]
+_fields += [("activity", "u1"), ("idle", "u1")]
+record_dtype = np.dtype(_fields)
+
+_i4_min, _i4_max = int(np.iinfo(np.int32).min), int(np.iinfo(np.int32).max)
+_no_box = (0, 0, 0, 0)
+
+
+def _box(b):
+    # recortada al rango de <i4 para que una extrapolacion desbocada no tumbe el append
+    return tuple(min(_i4_max, max(_i4_min, int(v))) for v in b)
+
+
+class telemetry_writer:
+    def __init__(
+        self,
+        directory: str,
+        prefix: str = "track",
+        max_bytes: int = 64 << 20,
+        max_age: float = 3600.0,
+        batch: int = 256,
+        flush_every: float = 2.0,
+        buffers: int = 4,
+    ):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.flush_every = flush_every
+        os.makedirs(directory, exist_ok=True)
+
+        # lotes preasignados que circulan entre el bucle y el hilo escritor
+        self._free: queue.Queue = queue.Queue()
+        for _ in range(buffers):
+            self._free.put(np.zeros(batch, dtype=record_dtype))
+        self._full: queue.Queue = queue.Queue()
+        self._buf = self._free.get()
+        self._n = 0
+        self._batch_t0 = None
+
+        self.records = 0
+        self.dropped = 0
+        self.files = 0
+        self._f = None
+        self._f_bytes = 0
+        self._f_t0 = 0.0
+        self._thr = threading.Thread(target=self._worker, daemon=True)
+        self._thr.start()
+
+    def append(self, frame_id: int, ts: float, det_state: dict, trk_state: dict, activity: str = "IDLE", idle: bool = False):
+        if self._buf is None:
+            # el escritor va atrasado y no hay lote libre: se descarta en vez de bloquear
+            try:
+                self._buf = self._free.get_nowait()
+            except queue.Empty:
+                self.dropped += 1
+                return
+        r = self._buf[self._n]
+        r["frame_id"] = frame_id
+        r["ts"] = ts
+        for k in targets:
+            t = trk_state.get(k) or {}
+            b = t.get("bbox")
+            r[f"{k}_bbox"] = _box(b) if b else _no_box
+            r[f"{k}_bbox_ok"] = 1 if b else 0
+            r[f"{k}_ok"] = 1 if t.get("ok") else 0
+            r[f"{k}_missed"] = min(65535, int(t.get("missed", 0)))
+            d = det_state.get(k)
+            r[f"{k}_det_bbox"] = _box(d["bbox"]) if d else _no_box
+            r[f"{k}_det_ok"] = 1 if d else 0
+            r[f"{k}_det_conf"] = d["conf"] if d else 0.0
+        r["activity"] = activity_codes.get(activity, 0)
+        r["idle"] = 1 if idle else 0
+        self._n += 1
+        self.records += 1
+
+        if self._batch_t0 is None:
+            self._batch_t0 = ts
+        if self._n == len(self._buf) or ts - self._batch_t0 >= self.flush_every:
+            self._handoff()
+
+    def _handoff(self):
+        if self._buf is None or self._n == 0:
+            return
+        self._full.put((self._buf, self._n))
+        self._buf, self._n, self._batch_t0 = None, 0, None
+        try:
+            self._buf = self._free.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _open(self):
+        name = f"{self.prefix}_{time.strftime('%Y%m%d_%H%M%S')}_{self.files:04d}.tlm"
+        f = open(os.path.join(self.directory, name), "wb")
+        f.write(_header.pack(_magic, format_version, record_dtype.itemsize))
+        self._f, self._f_bytes, self._f_t0 = f, header_size, time.time()
+        self.files += 1
+
+    def _worker(self):
+        while 1:
+            job = self._full.get()
+            if job is None:
+                break
+            buf, n = job
+            if self._f is None or self._f_bytes >= self.max_bytes or time.time() - self._f_t0 >= self.max_age:
+                if self._f is not None:
+                    self._f.close()
+                self._open()
+            self._f.write(buf[:n].tobytes())
+            self._f.flush()
+            self._f_bytes += n * record_dtype.itemsize
+            self._free.put(buf)
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def close(self):
+        self._handoff()
+        self._full.put(None)
+        self._thr.join(timeout=5.0)
+
+
+def read_telemetry(path: str) -> np.ndarray:
+    # memmap de solo lectura; un archivo truncado a media escritura pierde solo el ultimo registro
+    with open(path, "rb") as f:
+        magic, version, size = _header.unpack(f.read(header_size))
+    if magic != _magic or version != format_version or size != record_dtype.itemsize:
+        raise ValueError(f"formato de telemetria no reconocido: {path}")
+    n = (os.path.getsize(path) - header_size) // size
+    if n <= 0:
+        return np.zeros(0, dtype=record_dtype)
+    return np.memmap(path, dtype=record_dtype, mode="r", offset=header_size, shape=(n,))
+
+
+def open_logs(directory: str, prefix: str = "track"):
+    return [read_telemetry(p) for p in sorted(glob.glob(os.path.join(directory, f"{prefix}_*.tlm")))]
+
+
+def load_range(directory: str, t0: float = None, t1: float = None, prefix: str = "track") -> np.ndarray:
+    # une los archivos con registros en [t0, t1); los que caen fuera no se copian
+    parts = []
+    for m in open_logs(directory, prefix):
+        if len(m) == 0:
+            continue
+        if (t0 is not None and m["ts"][-1] < t0) or (t1 is not None and m["ts"][0] >= t1):
+            continue
+        mask = np.ones(len(m), dtype=bool)
+        if t0 is not None:
+            mask &= m["ts"] >= t0
+        if t1 is not None:
+            mask &= m["ts"] < t1
+        parts.append(m[mask])
+    if not parts:
+        return np.zeros(0, dtype=record_dtype)
+    return np.concatenate(parts)
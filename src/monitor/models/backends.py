@@ -0,0 +1,277 @@
+# backends de inferencia intercambiables para yolo_detector
+# todos reciben el tensor letterbox rgb float32 en [0, 1] de letterbox_preprocessor
+# (nchw salvo que el backend declare layout = "nhwc") y regresan
+# xyxy, cls, conf en coordenadas del letterbox
+# ultralytics queda como referencia; onnx y cv_dnn no cargan torch
+# un backend con infer_frame(frame_bgr) hace su propio preproceso y regresa cajas en pixeles del frame:
+# es el camino de referencia independiente del letterbox y la decodificacion de este paquete
+
+import os
+
+import numpy as np
+
+from .yolo_decode import decode_yolov8, load_imgsz, load_names, parse_names
+
+
+class _backend_base:
+    # lote maximo que el modelo corre en una sola llamada; 1 = se itera imagen por imagen
+    max_batch = 1
+
+    def infer_batch(self, batch: np.ndarray):
+        # batch (b, ...) con el layout del backend; regresa una lista de resultados de infer
+        return [self.infer(batch[i : i + 1]) for i in range(len(batch))]
+
+
+class ultralytics_backend(_backend_base):
+    # ruta original con ultralytics.YOLO (requiere torch)
+    name = "ultralytics"
+    layout = "nchw"
+    max_batch = 16
+
+    def __init__(self, model_path: str, imgsz: int = 416, conf_thr: float = 0.25, iou_thr: float = 0.45, threads: int = 0):
+        import torch
+        from ultralytics import YOLO
+
+        self._torch = torch
+        self.model_path = model_path
+        self.imgsz = imgsz
+        self.fixed_imgsz = False
+        self.conf_thr = conf_thr
+        self.iou_thr = iou_thr
+        self.model = YOLO(model_path)
+        self.names = self._load_class_map() or load_names(model_path)
+
+    def _load_class_map(self):
+        # intenta leer nombres de clases desde distintos lugares
+        names = {}
+        try:
+            if hasattr(self.model, "names") and isinstance(self.model.names, dict):
+                names = {int(k): str(v) for k, v in self.model.names.items()}
+        except Exception:
+            pass
+        if not names:
+            try:
+                inner = getattr(self.model, "model", None)
+                if inner is not None and hasattr(inner, "names"):
+                    d = inner.names
+                    names = {int(k): str(v) for k, v in d.items()}
+            except Exception:
+                pass
+        return names
+
+    def infer_frame(self, frame_bgr: np.ndarray):
+        # ruta original: ultralytics hace su letterbox y normalizacion sobre el frame bgr completo
+        results = self.model.predict(
+            source=frame_bgr,
+            imgsz=self.imgsz,
+            conf=self.conf_thr,
+            iou=self.iou_thr,
+            verbose=False,
+            device="cpu",
+        )
+        return self._to_numpy(results[0]) if results else None
+
+    def infer(self, tensor: np.ndarray):
+        out = self.infer_batch(tensor)
+        return out[0] if out else None
+
+    def infer_batch(self, batch: np.ndarray):
+        # recortes roi y lotes del servidor: ultralytics acepta tensores bchw float en [0, 1] sin volver a hacer letterbox
+        results = self.model.predict(
+            source=self._torch.from_numpy(batch),
+            imgsz=self.imgsz,
+            conf=self.conf_thr,
+            verbose=False,
+            device="cpu",
+        )
+        if not results:
+            return [None] * len(batch)
+        return [self._to_numpy(r) for r in results]
+
+    @staticmethod
+    def _to_numpy(r):
+        boxes = getattr(r, "boxes", None)
+        if boxes is None or boxes.xyxy is None or boxes.cls is None or boxes.conf is None:
+            return None
+        xyxy = boxes.xyxy.detach().cpu().numpy()
+        cls = boxes.cls.detach().cpu().numpy().astype(int)
+        conf = boxes.conf.detach().cpu().numpy().astype(float)
+        return xyxy, cls, conf
+
+
+class onnx_backend(_backend_base):
+    # onnx runtime en cpu; espera un export de ultralytics (format=onnx, nms=False)
+    name = "onnx"
+    layout = "nchw"
+
+    def __init__(self, model_path: str, imgsz: int = 416, conf_thr: float = 0.25, iou_thr: float = 0.45, threads: int = 0):
+        import onnxruntime as ort
+
+        self.model_path = model_path
+        self.conf_thr = conf_thr
+        self.iou_thr = iou_thr
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, sess_options=opts, providers=["CPUExecutionProvider"])
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+
+        # si el export tiene tamano fijo se respeta, si es dinamico se usa imgsz
+        shape = inp.shape
+        if len(shape) == 4 and isinstance(shape[2], int) and isinstance(shape[3], int):
+            self.imgsz = int(shape[2])
+            self.fixed_imgsz = True
+        else:
+            self.imgsz = imgsz
+            self.fixed_imgsz = False
+        # eje de lote dinamico: todo el lote en una sola llamada
+        if len(shape) == 4 and not isinstance(shape[0], int):
+            self.max_batch = 16
+
+        names = {}
+        try:
+            meta = self.session.get_modelmeta().custom_metadata_map
+            names = parse_names(meta.get("names", ""))
+        except Exception:
+            pass
+        self.names = names or load_names(model_path)
+
+    def infer(self, tensor: np.ndarray):
+        out = self.session.run(None, {self.input_name: tensor})[0]
+        return decode_yolov8(out, conf_thr=self.conf_thr, iou_thr=self.iou_thr)
+
+    def infer_batch(self, batch: np.ndarray):
+        if self.max_batch == 1:
+            return _backend_base.infer_batch(self, batch)
+        out = self.session.run(None, {self.input_name: batch})[0]
+        return [decode_yolov8(out[i], conf_thr=self.conf_thr, iou_thr=self.iou_thr) for i in range(len(out))]
+
+
+def _onnx_input_size(model_path: str):
+    # (h, w) de la entrada del grafo onnx; None si el paquete onnx no esta o el eje es dinamico
+    try:
+        import onnx
+
+        model = onnx.load(model_path, load_external_data=False)
+        dims = model.graph.input[0].type.tensor_type.shape.dim
+        h, w = dims[2].dim_value, dims[3].dim_value
+    except Exception:
+        return None
+    return (h, w) if h > 0 and w > 0 else None
+
+
+class cv_dnn_backend(_backend_base):
+    # modulo dnn de opencv leyendo el mismo export onnx; sin dependencias extra
+    name = "cv_dnn"
+    layout = "nchw"
+
+    def __init__(self, model_path: str, imgsz: int = 416, conf_thr: float = 0.25, iou_thr: float = 0.45, threads: int = 0):
+        import cv2
+
+        self._cv2 = cv2
+        self.model_path = model_path
+        # opencv no expone la forma de entrada: se lee del grafo (paquete onnx) o del metadata.yaml del export;
+        # los exports de ultralytics son estaticos salvo dynamic=True, asi que con metadata se toma como fijo
+        size = _onnx_input_size(model_path)
+        fixed = size[0] if size else load_imgsz(model_path)
+        self.imgsz = fixed or imgsz
+        self.fixed_imgsz = bool(fixed)
+        self.conf_thr = conf_thr
+        self.iou_thr = iou_thr
+        if threads > 0:
+            cv2.setNumThreads(threads)
+        self.net = cv2.dnn.readNetFromONNX(model_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.names = load_names(model_path)
+
+    def infer(self, tensor: np.ndarray):
+        # el tensor ya es un blob nchw normalizado, no hace falta blobFromImage
+        self.net.setInput(tensor)
+        out = self.net.forward()
+        return decode_yolov8(out, conf_thr=self.conf_thr, iou_thr=self.iou_thr)
+
+
+def _load_tflite_interpreter():
+    # tflite_runtime es lo ligero en la pi; tensorflow completo como respaldo
+    try:
+        from tflite_runtime.interpreter import Interpreter
+
+        return Interpreter
+    except ImportError:
+        import tensorflow as tf
+
+        return tf.lite.Interpreter
+
+
+class tflite_backend(_backend_base):
+    # tflite con xnnpack (delegado por defecto en cpu); soporta modelos int8 completos
+    # generados con monitor.models.tflite_export a partir de best_saved_model
+    name = "tflite"
+    layout = "nhwc"
+
+    def __init__(self, model_path: str, imgsz: int = 416, conf_thr: float = 0.25, iou_thr: float = 0.45, threads: int = 0):
+        interpreter_cls = _load_tflite_interpreter()
+
+        self.model_path = model_path
+        self.conf_thr = conf_thr
+        self.iou_thr = iou_thr
+        self.interpreter = interpreter_cls(model_path=model_path, num_threads=threads if threads > 0 else None)
+        self.interpreter.allocate_tensors()
+
+        inp = self.interpreter.get_input_details()[0]
+        out = self.interpreter.get_output_details()[0]
+        self._in_index = inp["index"]
+        self._in_dtype = inp["dtype"]
+        self._in_scale, self._in_zero = inp.get("quantization", (0.0, 0))
+        self._out_index = out["index"]
+        self._out_scale, self._out_zero = out.get("quantization", (0.0, 0))
+
+        # entrada nhwc de tamano fijo
+        self.imgsz = int(inp["shape"][1])
+        self.fixed_imgsz = True
+        self.quantized = self._in_dtype in (np.int8, np.uint8)
+        self.names = load_names(model_path)
+
+    def infer(self, tensor: np.ndarray):
+        x = tensor
+        if self.quantized:
+            x = np.round(x / self._in_scale + self._in_zero)
+            info = np.iinfo(self._in_dtype)
+            x = np.clip(x, info.min, info.max).astype(self._in_dtype)
+        self.interpreter.set_tensor(self._in_index, x)
+        self.interpreter.invoke()
+        y = self.interpreter.get_tensor(self._out_index)
+        if self._out_scale:
+            y = (y.astype(np.float32) - self._out_zero) * self._out_scale
+        # los exports tflite de ultralytics dan cajas normalizadas a [0, 1]
+        return decode_yolov8(y, conf_thr=self.conf_thr, iou_thr=self.iou_thr, imgsz=self.imgsz)
+
+
+backends = {
+    "ultralytics": ultralytics_backend,
+    "onnx": onnx_backend,
+    "cv_dnn": cv_dnn_backend,
+    "tflite": tflite_backend,
+}
+
+# modelo por defecto de cada backend dentro del repo
+default_model_paths = {
+    "ultralytics": "y8n_640_ep80/weights/best.pt",
+    "onnx": "y8n_640_ep80/weights/best.onnx",
+    "cv_dnn": "y8n_640_ep80/weights/best.onnx",
+    "tflite": "y8n_640_ep80/weights/best_int8.tflite",
+}
+
+
+def create_backend(name: str, model_path: str = "", **kwargs):
+    if name not in backends:
+        raise ValueError(f"backend desconocido: {name} (opciones: {', '.join(backends)})")
+    if not model_path:
+        model_path = default_model_paths[name]
+    if not os.path.exists(model_path) and name != "ultralytics":
+        raise FileNotFoundError(f"no existe el modelo para {name}: {model_path}")
+    return backends[name](model_path, **kwargs)
@@ -0,0 +1,234 @@
+# servidor de deteccion compartido por varias camaras con lotes dinamicos
+# un solo modelo en memoria; cada camara tiene su buzon (el frame mas nuevo gana)
+# el hilo del servidor junta frames de distintas camaras hasta max_batch o hasta
+# que vence max_wait desde el primero, corre un lote y reparte el estado por camara
+#
+#   server = detection_server(backend="onnx", max_batch=4, max_wait=0.02)
+#   cam0 = server.client("linea1")
+#   server.start()
+#   cam0.submit(frame, frame_id, ts); cam0.get_state()
+
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+from ..core.mailbox import frame_mailbox
+from ..utils import metrics
+from .backends import create_backend
+from .detector_yolo import build_target_state, detection_state, resolve_target_ids, target_lut, yolo_detector
+from .preprocess import letterbox_preprocessor
+
+
+class detection_client:
+    # misma interfaz que yolo_detector (submit/get_state/start/stop) para usarlo sin cambios en app
+    def __init__(self, server, cam_id: str):
+        self.server = server
+        self.cam_id = cam_id
+        self.imgsz = server.imgsz
+        self._mailbox = frame_mailbox()
+        self._pre = letterbox_preprocessor(server.imgsz, layout=server.backend.layout)
+        self._frame_seq = 0
+        self._state = detection_state()
+        self.processed = 0
+        self.latency = 0.0
+        self.load_error = None
+
+        # las mismas series que yolo_detector, una por camara; sin efecto con las metricas apagadas
+        labels = {"camera": cam_id}
+        desc = "frames reemplazados en el buzon antes de llegar al modelo"
+        metrics.gauge_for("detector_dropped_total", lambda: self.dropped, desc, labels, kind="counter")
+        metrics.gauge_for("detector_inferences_total", lambda: self.processed, "inferencias completadas", labels, kind="counter")
+        metrics.gauge_for("detector_latency_seconds", lambda: self.latency, "latencia de inferencia suavizada", labels)
+
+    def start(self):
+        self.server.start()
+
+    def stop(self):
+        # el servidor sigue vivo para las demas camaras
+        self._mailbox.clear()
+
+    def submit(self, frame_bgr: np.ndarray, frame_id: int | None = None, ts: float | None = None, rois=None) -> int:
+        # el servidor solo detecta frames completos (lotes de un solo tamano); recortes son un error de configuracion
+        if rois:
+            raise ValueError("detection_server no soporta deteccion por recortes (rois)")
+        if frame_id is None:
+            self._frame_seq += 1
+            frame_id = self._frame_seq
+        else:
+            self._frame_seq = max(self._frame_seq, frame_id)
+        if ts is None:
+            ts = time.time()
+        self._mailbox.put(frame_bgr, frame_id, ts)
+        self.server._wake.set()
+        return frame_id
+
+    @property
+    def dropped(self) -> int:
+        return self._mailbox.dropped
+
+    @property
+    def busy(self) -> bool:
+        return self._mailbox.pending() > 0
+
+    @property
+    def inferences(self) -> int:
+        return self.processed
+
+    @property
+    def ready(self) -> bool:
+        # el servidor carga el modelo al construirse
+        return True
+
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        return True
+
+    def get_state(self) -> detection_state:
+        return self._state
+
+
+class detection_server:
+    def __init__(
+        self,
+        model_path: str = "",
+        backend: str = "onnx",
+        conf_thr: float = 0.25,
+        iou_thr: float = 0.45,
+        imgsz: int = 416,
+        threads: int = 0,
+        max_batch: int = 4,
+        max_wait: float = 0.02,
+        debug: bool = False,
+    ):
+        self.backend = create_backend(backend, model_path, imgsz=imgsz, conf_thr=conf_thr, iou_thr=iou_thr, threads=threads)
+        self.imgsz = self.backend.imgsz
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self.debug = debug
+
+        self.id_to_name = {int(k): str(v).lower() for k, v in self.backend.names.items()}
+        self.target_ids = resolve_target_ids(self.id_to_name, yolo_detector._target_names)
+        self._lut = target_lut(self.id_to_name, self.target_ids)
+
+        # lote preasignado en el layout del backend; los clientes escriben su letterbox directo aqui
+        if self.backend.layout == "nchw":
+            shape = (self.max_batch, 3, self.imgsz, self.imgsz)
+        else:
+            shape = (self.max_batch, self.imgsz, self.imgsz, 3)
+        self._batch = np.zeros(shape, dtype=np.float32)
+
+        self._clients: dict[str, detection_client] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thr: threading.Thread | None = None
+
+        # estadisticas
+        self.batch_sizes: Counter = Counter()
+        self.batches = 0
+        self.infer_time = 0.0
+        self.wait_time = 0.0
+
+    def client(self, cam_id: str) -> detection_client:
+        with self._lock:
+            c = self._clients.get(cam_id)
+            if c is None:
+                c = self._clients[cam_id] = detection_client(self, cam_id)
+            return c
+
+    def start(self):
+        if self._thr and self._thr.is_alive():
+            return
+        self._stop.clear()
+        self._thr = threading.Thread(target=self._worker, daemon=True)
+        self._thr.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thr:
+            self._thr.join(timeout=2.0)
+
+    def stats(self):
+        # profundidad de cola y descartes por camara, distribucion de tamanos de lote
+        cams = {
+            cid: {
+                "pending": c._mailbox.pending(),
+                "submitted": c._mailbox.submitted,
+                "dropped": c._mailbox.dropped,
+                "processed": c.processed,
+            }
+            for cid, c in list(self._clients.items())
+        }
+        n = sum(self.batch_sizes.values())
+        mean = sum(k * v for k, v in self.batch_sizes.items()) / n if n else 0.0
+        return {
+            "cameras": cams,
+            "batches": self.batches,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "mean_batch": mean,
+            "mean_infer_ms": 1000.0 * self.infer_time / self.batches if self.batches else 0.0,
+            "mean_wait_ms": 1000.0 * self.wait_time / self.batches if self.batches else 0.0,
+        }
+
+    def _collect(self):
+        # junta a lo mas un frame por camara hasta llenar el lote o vencer el plazo
+        jobs = []
+        taken = set()
+        first = None
+        while not self._stop.is_set():
+            self._wake.clear()
+            for cid, c in list(self._clients.items()):
+                if cid in taken or len(jobs) >= self.max_batch:
+                    continue
+                job = c._mailbox.get(timeout=0.0)
+                if job is None:
+                    continue
+                raw, frame_id, ts = job
+                i = len(jobs)
+                _, meta = c._pre.process(raw, out=self._batch[i : i + 1])
+                jobs.append((c, meta, frame_id, ts))
+                taken.add(cid)
+                if first is None:
+                    first = time.time()
+
+            if len(jobs) >= self.max_batch or (jobs and len(taken) == len(self._clients)):
+                break
+            if first is None:
+                self._wake.wait(0.1)
+                continue
+            remaining = first + self.max_wait - time.time()
+            if remaining <= 0:
+                break
+            self._wake.wait(remaining)
+        if first is not None:
+            self.wait_time += time.time() - first
+        return jobs
+
+    def _worker(self):
+        while not self._stop.is_set():
+            jobs = self._collect()
+            if not jobs:
+                continue
+            n = len(jobs)
+            t0 = time.time()
+            try:
+                outs = self.backend.infer_batch(self._batch[:n])
+            except Exception as e:
+                if self.debug:
+                    print("[server] error en prediccion:", e)
+                outs = [None] * n
+            latency = time.time() - t0
+            self.infer_time += latency
+            self.batches += 1
+            self.batch_sizes[n] += 1
+
+            for (c, meta, frame_id, ts), out in zip(jobs, outs):
+                st = build_target_state(out, meta, frame_id, ts, self._lut, latency)
+                c.latency = latency if c.latency == 0.0 else 0.8 * c.latency + 0.2 * latency
+                c._state = st
+                c.processed += 1
+
+            if self.debug:
+                print(f"[server] lote={n} infer={latency * 1000:.1f}ms")
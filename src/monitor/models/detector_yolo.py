@@ -4,11 +4,156 @@
 
 import threading
 import time
-from queue import Queue, Empty
+from collections.abc import Mapping
 
-import cv2
 import numpy as np
-from ultralytics import YOLO
+
+from ..core.mailbox import frame_mailbox
+from ..utils import metrics
+from .backends import create_backend
+from .preprocess import letterbox_preprocessor, unletterbox
+from .yolo_decode import nms
+
+
+def resolve_target_ids(id_to_name: dict, target_names: dict):
+    resolved = {"reel": set(), "tip": set()}
+    for logic, real_names in target_names.items():
+        for cid, cname in id_to_name.items():
+            if cname.lower() in real_names:
+                resolved[logic].add(int(cid))
+    return resolved
+
+
+# resultado por deteccion como arreglo estructurado; label indexa target_labels (-1 = clase no objetivo)
+target_labels = ("tip", "reel")
+det_dtype = np.dtype(
+    [
+        ("bbox", "<i4", (4,)),
+        ("conf", "<f4"),
+        ("cls", "<i2"),
+        ("label", "i1"),
+        ("frame_id", "<i8"),
+        ("ts", "<f8"),
+        ("latency", "<f4"),
+    ]
+)
+
+
+def target_lut(id_to_name: dict, target_ids: dict) -> np.ndarray:
+    # id de clase del modelo -> indice en target_labels; reel gana si una clase cae en ambos
+    n = max(list(id_to_name) + [cid for ids in target_ids.values() for cid in ids] + [0]) + 1
+    lut = np.full(n, -1, dtype=np.int8)
+    for k in ("tip", "reel"):
+        for cid in target_ids.get(k, ()):
+            lut[cid] = target_labels.index(k)
+    return lut
+
+
+def build_detections(out, meta: dict, frame_id: int, ts: float, lut: np.ndarray, latency: float = 0.0) -> np.ndarray:
+    # salida del backend -> arreglo det_dtype en pixeles del frame original, solo clases objetivo
+    # unletterbox, recorte y etiquetado en operaciones de numpy, sin bucle por caja
+    if out is None or len(out[0]) == 0:
+        return np.zeros(0, dtype=det_dtype)
+    xyxy, cls, conf = out
+    cls = np.asarray(cls, dtype=np.int64)
+    label = np.where((cls >= 0) & (cls < len(lut)), lut[np.clip(cls, 0, len(lut) - 1)], -1)
+    keep = label >= 0
+    dets = np.empty(int(keep.sum()), dtype=det_dtype)
+    dets["bbox"] = unletterbox(np.asarray(xyxy)[keep], meta)
+    dets["conf"] = np.asarray(conf)[keep]
+    dets["cls"] = cls[keep]
+    dets["label"] = label[keep]
+    dets["frame_id"] = frame_id
+    dets["ts"] = ts
+    dets["latency"] = latency
+    return dets
+
+
+def best_per_label(dets: np.ndarray) -> dict:
+    # indice de la caja de mayor confianza por etiqueta; en empate gana la primera (orden estable)
+    if len(dets) == 0:
+        return {}
+    order = np.lexsort((-dets["conf"], dets["label"]))
+    lab = dets["label"][order]
+    first = np.flatnonzero(np.r_[True, lab[1:] != lab[:-1]])
+    return {target_labels[int(lab[i])]: int(order[i]) for i in first}
+
+
+class detection_state(Mapping):
+    # instantanea inmutable del detector: dets (arreglo de solo lectura) + vista dict compatible
+    # {"tip": item|None, "reel": item|None, "all": [item, ...]}
+    # el hilo del detector arma la siguiente instantanea completa y solo entonces reemplaza la referencia
+    # publicada (una asignacion, atomica en cpython): los lectores nunca ven un tip y reel de resultados
+    # distintos y get_state no copia nada. los items son de solo lectura por convencion
+    _keys = ("reel", "tip", "all")
+
+    def __init__(self, dets: np.ndarray | None = None):
+        if dets is None:
+            dets = np.zeros(0, dtype=det_dtype)
+        dets.flags.writeable = False
+        self.dets = dets
+        self._all = [
+            {
+                "bbox": tuple(r["bbox"].tolist()),
+                "conf": float(r["conf"]),
+                "label": target_labels[r["label"]],
+                "frame_id": int(r["frame_id"]),
+                "ts": float(r["ts"]),
+                "latency": float(r["latency"]),
+            }
+            for r in dets
+        ]
+        best = best_per_label(dets)
+        self._items = {"all": self._all, "tip": None, "reel": None}
+        for k, i in best.items():
+            self._items[k] = self._all[i]
+
+    def __getitem__(self, key):
+        return self._items[key]
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return f"detection_state(n={len(self.dets)}, tip={self._items['tip']}, reel={self._items['reel']})"
+
+
+def build_target_state(
+    out, meta: dict, frame_id: int, ts: float, lut: np.ndarray, latency: float = 0.0, debug: bool = False, id_to_name: dict | None = None
+) -> detection_state:
+    # salida del backend -> instantanea publicable; tip/reel: la caja de mayor confianza por objetivo
+    if debug and out is not None:
+        print("[detector] detecciones crudas:")
+        xyxy, cls, conf = out
+        for i in range(len(xyxy)):
+            cname = (id_to_name or {}).get(int(cls[i]), str(int(cls[i])))
+            print(f"  id={int(cls[i])} name={cname} conf={conf[i]:.3f} bbox={xyxy[i].tolist()}")
+    return detection_state(build_detections(out, meta, frame_id, ts, lut, latency))
+
+
+def merge_roi_outputs(outs, metas, rois, iou_thr: float = 0.45):
+    # salidas por recorte -> una sola salida en pixeles del frame completo
+    # los recortes pueden solaparse: nms por clase sobre la union
+    xs, cs, ps = [], [], []
+    for out, meta, r in zip(outs, metas, rois):
+        if out is None or len(out[0]) == 0:
+            continue
+        b = unletterbox(out[0], meta)
+        b[:, [0, 2]] += r[0]
+        b[:, [1, 3]] += r[1]
+        xs.append(b)
+        cs.append(np.asarray(out[1], dtype=int))
+        ps.append(np.asarray(out[2], dtype=float))
+    if not xs:
+        return None
+    xyxy, cls, conf = np.concatenate(xs), np.concatenate(cs), np.concatenate(ps)
+    if len(xs) > 1:
+        idx = nms(xyxy + cls[:, None] * 4096.0, conf, iou_thr)
+        xyxy, cls, conf = xyxy[idx], cls[idx], conf[idx]
+    return xyxy, cls, conf
 
 
 class yolo_detector:
@@ -18,60 +163,129 @@ class yolo_detector:
         "reel": {"gold_reel"},
     }
 
-    def __init__(self, model_path: str, conf_thr: float = 0.25, imgsz: int = 416, debug: bool = True):
+    def __init__(
+        self,
+        model_path: str = "",
+        conf_thr: float = 0.25,
+        imgsz: int = 416,
+        debug: bool = True,
+        backend: str = "ultralytics",
+        iou_thr: float = 0.45,
+        threads: int = 0,
+        roi_imgsz: int = 256,
+        background: bool = False,
+    ):
         # rutas y parametros
         self.model_path = model_path
         self.conf_thr = conf_thr
-        self.imgsz = imgsz
+        self.iou_thr = iou_thr
         self.debug = debug
+        self._backend_name = backend
+        self._threads = threads
+        # hasta que cargue el modelo: tamanos pedidos; el backend puede fijarlos al cargar
+        self.imgsz = imgsz
+        self.roi_imgsz = roi_imgsz or imgsz
+        self.backend = None
+
+        # colas e hilo
+        # buzon donde el frame mas nuevo reemplaza al pendiente; el letterbox corre en el hilo del detector
+        self._mailbox = frame_mailbox()
+        self._frame_seq = 0
+        self._roi_batch = None
+        self._pending_rois = None
+        self._stop = threading.Event()
+        self._thr: threading.Thread | None = None
 
-        # cargar modelo
-        self.model = YOLO(self.model_path)
+        # estado de detecciones
+        self._state = detection_state()
+        # latencia de inferencia suavizada (s); el planificador la usa para respetar el presupuesto de cpu
+        self.latency = 0.0
+        self._busy = False
+        # tiempo total de inferencia (s) y frames procesados, para medir la utilizacion del hilo
+        self.infer_time = 0.0
+        self.inferences = 0
+
+        # arranque por etapas: con background=True la carga (imports pesados + modelo) y el warm-up
+        # corren en el hilo del detector al llamar start(); la camara y la ui no esperan
+        self._ready = threading.Event()
+        self.load_error = None
+        self.load_time = 0.0
+        self.warmup_time = 0.0
+        if not background:
+            self._load()
+
+    @property
+    def ready(self) -> bool:
+        # modelo cargado y calentado; antes de esto submit no tiene efecto
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        self._ready.wait(timeout)
+        return self.ready
+
+    def _load(self):
+        t0 = time.perf_counter()
+        # cargar modelo con el backend elegido; si el modelo tiene entrada fija manda su tamano
+        self.backend = create_backend(
+            self._backend_name, self.model_path, imgsz=self.imgsz, conf_thr=self.conf_thr, iou_thr=self.iou_thr, threads=self._threads
+        )
+        self.imgsz = self.backend.imgsz
+        self.model_path = self.backend.model_path
 
         # mapa id->nombre del modelo
-        self.class_map = self._load_class_map()
+        self.class_map = self.backend.names
         self.id_to_name = {int(k): str(v).lower() for k, v in self.class_map.items()}
 
         # resolver ids de clases objetivo a partir de nombres reales
         self.target_ids = self._resolve_target_ids()
-
-        # colas e hilo
-        self._in_q: Queue = Queue(maxsize=1)
-        self._stop = threading.Event()
-        self._thr: threading.Thread | None = None
-
-        # estado de detecciones
-        self._state = {"reel": None, "tip": None}
+        self._lut = target_lut(self.id_to_name, self.target_ids)
+
+        self._pre = letterbox_preprocessor(self.imgsz, layout=self.backend.layout)
+        # recortes alrededor de tracks (submit con rois): entrada mas chica si el modelo lo permite
+        self.roi_imgsz = self.imgsz if self.backend.fixed_imgsz else self.roi_imgsz
+        self._roi_pre = letterbox_preprocessor(self.roi_imgsz, layout=self.backend.layout, buffers=1)
+        t1 = time.perf_counter()
+        self.load_time = t1 - t0
+
+        self._warmup()
+        self.warmup_time = time.perf_counter() - t1
+
+        # tramos del hilo de deteccion; sin efecto con las metricas apagadas
+        # despues del warm-up para que la primera inferencia (grafo, asignaciones) no ensucie los histogramas
+        # en onnx/cv_dnn/tflite la decodificacion yolo + nms cae dentro de "infer"
+        stage = "detector_stage_seconds"
+        desc = "tramos del hilo de deteccion"
+        metrics.instrument(self._pre, "process", stage, desc, {"stage": "preprocess"})
+        metrics.instrument(self._roi_pre, "process", stage, desc, {"stage": "roi_preprocess"})
+        metrics.instrument(self.backend, "infer", stage, desc, {"stage": "infer"})
+        metrics.instrument(self.backend, "infer_batch", stage, desc, {"stage": "infer_batch"})
+        if hasattr(self.backend, "infer_frame"):
+            metrics.instrument(self.backend, "infer_frame", stage, desc, {"stage": "infer_frame"})
+        self._build_state = metrics.timed(build_target_state, stage, desc, {"stage": "decode"})
+        metrics.gauge_for("detector_dropped_total", lambda: self.dropped, "frames reemplazados en el buzon antes de llegar al modelo", kind="counter")
+        metrics.gauge_for("detector_inferences_total", lambda: self.inferences, "inferencias completadas", kind="counter")
+        metrics.gauge_for("detector_latency_seconds", lambda: self.latency, "latencia de inferencia suavizada")
 
         if self.debug:
             print("[detector] clases del modelo:", self.id_to_name)
             print("[detector] ids objetivo:", self.target_ids)
-
-    def _load_class_map(self):
-        # intenta leer nombres de clases desde distintos lugares
-        names = {}
-        try:
-            if hasattr(self.model, "names") and isinstance(self.model.names, dict):
-                names = {int(k): str(v) for k, v in self.model.names.items()}
-        except Exception:
-            pass
-        if not names:
-            try:
-                inner = getattr(self.model, "model", None)
-                if inner is not None and hasattr(inner, "names"):
-                    d = inner.names
-                    names = {int(k): str(v) for k, v in d.items()}
-            except Exception:
-                pass
-        return names
+            print("[detector] backend:", self.backend.name, "imgsz:", self.imgsz)
+        self._ready.set()
+
+    def _warmup(self):
+        # inferencia de prueba con los mismos buffers y formas que el camino real:
+        # el primer predict paga construccion de grafo y asignaciones una sola vez, aqui y no con la camara
+        blank = np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)
+        tensor, _ = self._pre.process(blank)
+        self.backend.infer(tensor)
+        if hasattr(self.backend, "infer_frame"):
+            self.backend.infer_frame(blank)
+        if self.roi_imgsz != self.imgsz:
+            tensor, _ = self._roi_pre.process(blank[: self.roi_imgsz, : self.roi_imgsz])
+            self.backend.infer(tensor)
 
     def _resolve_target_ids(self):
-        resolved = {"reel": set(), "tip": set()}
-        for logic, real_names in self._target_names.items():
-            for cid, cname in self.id_to_name.items():
-                if cname.lower() in real_names:
-                    resolved[logic].add(int(cid))
-        return resolved
+        return resolve_target_ids(self.id_to_name, self._target_names)
 
     def start(self):
         if self._thr and self._thr.is_alive():
@@ -84,110 +298,84 @@ class yolo_detector:
         self._stop.set()
         if self._thr:
             self._thr.join(timeout=2.0)
-
-    def submit(self, frame_bgr: np.ndarray):
-        # no bloquear si ya hay un frame pendiente
-        if self._in_q.full():
-            return
-        h, w = frame_bgr.shape[:2]
-        scale = min(self.imgsz / w, self.imgsz / h)
-        nw, nh = int(w * scale), int(h * scale)
-        resized = cv2.resize(frame_bgr, (nw, nh), interpolation=cv2.INTER_AREA)
-        canvas = np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)
-        x0 = (self.imgsz - nw) // 2
-        y0 = (self.imgsz - nh) // 2
-        canvas[y0 : y0 + nh, x0 : x0 + nw] = resized
-        rgb = cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB)
-        meta = {"x0": x0, "y0": y0, "scale": scale, "orig_w": w, "orig_h": h}
-        try:
-            self._in_q.put((rgb, meta), block=False)
-        except Exception:
-            pass
-
-    def get_state(self):
-        # copia ligera del estado
-        return {
-            "reel": self._state["reel"].copy() if self._state["reel"] else None,
-            "tip": self._state["tip"].copy() if self._state["tip"] else None,
-        }
+        self._mailbox.clear()
+
+    def submit(self, frame_bgr: np.ndarray, frame_id: int | None = None, ts: float | None = None, rois=None) -> int:
+        # nunca bloquea: si el detector sigue ocupado el frame pendiente se reemplaza por este
+        # frame_id/ts son los de captura; si no se dan se asignan aqui
+        # rois: recortes (x1, y1, x2, y2) a detectar en vez del frame completo (ver core.detect_scheduler)
+        if frame_id is None:
+            self._frame_seq += 1
+            frame_id = self._frame_seq
+        else:
+            self._frame_seq = max(self._frame_seq, frame_id)
+        if ts is None:
+            ts = time.time()
+        if not self.ready:
+            return frame_id
+        # antes del put: el hilo solo usa las rois si coincide el frame_id
+        self._pending_rois = (frame_id, rois) if rois else None
+        self._mailbox.put(frame_bgr, frame_id, ts)
+        return frame_id
+
+    @property
+    def dropped(self) -> int:
+        # frames enviados que fueron reemplazados antes de llegar al modelo
+        return self._mailbox.dropped
+
+    @property
+    def busy(self) -> bool:
+        # hay un frame pendiente o en inferencia
+        return self._busy or self._mailbox.pending() > 0
+
+    def get_state(self) -> detection_state:
+        # instantanea inmutable: se comparte sin copiar
+        return self._state
 
     def _worker(self):
         # hilo de inferencia no bloqueante con prints de depuracion
-        while not self._stop.is_set():
+        if not self.ready:
             try:
-                rgb, meta = self._in_q.get(timeout=0.1)
-            except Empty:
+                self._load()
+            except Exception as e:
+                # sin modelo el monitor sigue mostrando camara; start() vuelve a intentar
+                self.load_error = e
+                print("[detector] no se pudo cargar el modelo:", e)
+                return
+        while not self._stop.is_set():
+            job = self._mailbox.get(timeout=0.1)
+            if job is None:
                 continue
+            raw, frame_id, ts = job
+            self._busy = True
 
-            ts = time.time()
+            pending = self._pending_rois
+            rois = pending[1] if pending is not None and pending[0] == frame_id else None
+
+            t0 = time.time()
             try:
-                results = self.model.predict(
-                    source=rgb,
-                    imgsz=self.imgsz,
-                    conf=self.conf_thr,
-                    verbose=False,
-                    device="cpu",
-                )
-                if not results:
+                if rois or hasattr(self.backend, "infer_frame"):
+                    # recortes o backend de referencia (ver backends): cajas ya en pixeles del frame
+                    out = self._infer_rois(raw, rois) if rois else self.backend.infer_frame(raw)
+                    h, w = raw.shape[:2]
+                    meta = {"x0": 0, "y0": 0, "scale": 1.0, "orig_w": w, "orig_h": h}
+                else:
+                    tensor, meta = self._pre.process(raw)
+                    out = self.backend.infer(tensor)
+                if out is None:
                     if self.debug:
                         print("[detector] no results")
                     self._update_none()
                     continue
 
-                r = results[0]
-                boxes = getattr(r, "boxes", None)
-                if boxes is None or boxes.xyxy is None or boxes.cls is None or boxes.conf is None:
-                    if self.debug:
-                        print("[detector] no boxes")
-                    self._update_none()
-                    continue
-
-                xyxy = boxes.xyxy.detach().cpu().numpy()
-                cls = boxes.cls.detach().cpu().numpy().astype(int)
-                conf = boxes.conf.detach().cpu().numpy().astype(float)
-
-                if self.debug:
-                    print("[detector] detecciones crudas:")
-                    for i in range(len(xyxy)):
-                        cname = self.id_to_name.get(int(cls[i]), str(int(cls[i])))
-                        print(f"  id={int(cls[i])} name={cname} conf={conf[i]:.3f} bbox={xyxy[i].tolist()}")
-
-                new_state = {"reel": None, "tip": None}
-
-                for i in range(len(xyxy)):
-                    cid = int(cls[i])
-                    cname = self.id_to_name.get(cid, "")
-                    label = None
-                    if cid in self.target_ids.get("reel", set()):
-                        label = "reel"
-                    elif cid in self.target_ids.get("tip", set()):
-                        label = "tip"
-                    else:
-                        if self.debug:
-                            print(f"[detector] clase ignorada: {cname}")
-                        continue
-
-                    x1, y1, x2, y2 = xyxy[i]
-
-                    x1 = (x1 - meta["x0"]) / meta["scale"]
-                    y1 = (y1 - meta["y0"]) / meta["scale"]
-                    x2 = (x2 - meta["x0"]) / meta["scale"]
-                    y2 = (y2 - meta["y0"]) / meta["scale"]
-
-                    x1 = max(0, min(meta["orig_w"] - 1, x1))
-                    y1 = max(0, min(meta["orig_h"] - 1, y1))
-                    x2 = max(0, min(meta["orig_w"] - 1, x2))
-                    y2 = max(0, min(meta["orig_h"] - 1, y2))
-
-                    item = {"bbox": (int(x1), int(y1), int(x2), int(y2)), "conf": float(conf[i]), "ts": ts}
-                    prev = new_state.get(label)
-                    if prev is None or item["conf"] > prev["conf"]:
-                        new_state[label] = item
-                        if self.debug:
-                            print(f"[detector] {cname} -> {label} conf={item['conf']:.3f} bbox={item['bbox']}")
-
-                self._state["reel"] = new_state["reel"]
-                self._state["tip"] = new_state["tip"]
+                # latencia de inferencia (preproceso + modelo) del frame fuente; va dentro de la instantanea
+                latency = time.time() - t0
+                self.latency = latency if self.latency == 0.0 else 0.8 * self.latency + 0.2 * latency
+                new_state = self._build_state(
+                    out, meta, frame_id, ts, self._lut, latency, debug=self.debug, id_to_name=self.id_to_name
+                )
+                # publicacion: la instantanea ya esta completa, se cambia solo la referencia
+                self._state = new_state
 
                 if self.debug:
                     print(f"[detector] estado final: {self._state}")
@@ -196,8 +384,23 @@ class yolo_detector:
                 if self.debug:
                     print("[detector] error en prediccion:", e)
                 self._update_none()
+            finally:
+                self.infer_time += time.time() - t0
+                self.inferences += 1
+                self._busy = False
+
+    def _infer_rois(self, raw: np.ndarray, rois):
+        n = len(rois)
+        if self._roi_batch is None or len(self._roi_batch) < n:
+            self._roi_batch = np.zeros((n,) + self._roi_pre._tensors.shape[2:], dtype=np.float32)
+        batch = self._roi_batch[:n]
+        metas = []
+        for i, (x1, y1, x2, y2) in enumerate(rois):
+            _, meta = self._roi_pre.process(raw[y1:y2, x1:x2], out=batch[i : i + 1])
+            metas.append(meta)
+        outs = self.backend.infer_batch(batch)
+        return merge_roi_outputs(outs, metas, rois, self.iou_thr)
 
     def _update_none(self):
-        self._state["reel"] = None
-        self._state["tip"] = None
+        self._state = detection_state()
 
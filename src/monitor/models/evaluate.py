@@ -0,0 +1,210 @@
+# compara un backend candidato (p.ej. tflite int8) contra el modelo float de referencia
+# sobre un clip etiquetado en formato yolo (imagen + .txt con "cls cx cy w h" normalizados)
+# sale con codigo 1 si la caida de map@0.5 supera --max-drop
+# uso: python -m monitor.models.evaluate --clip data/clip_labelled --cand tflite:best_int8.tflite
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+from .backends import create_backend
+from .preprocess import letterbox_preprocessor, unletterbox
+from .tflite_export import iter_frames
+from .yolo_decode import default_names
+
+
+def _label_path(img_path: str):
+    # admite etiquetas junto a la imagen o en la carpeta hermana labels/
+    stem = os.path.splitext(img_path)[0]
+    p = stem + ".txt"
+    if os.path.isfile(p):
+        return p
+    d, name = os.path.split(stem)
+    p = os.path.join(os.path.dirname(d), "labels", name + ".txt")
+    return p if os.path.isfile(p) else ""
+
+
+def load_labels(img_path: str, w: int, h: int):
+    p = _label_path(img_path)
+    if not p:
+        return np.zeros((0, 4), np.float32), np.zeros((0,), int)
+    rows = np.loadtxt(p, ndmin=2, dtype=np.float32)
+    if rows.size == 0:
+        return np.zeros((0, 4), np.float32), np.zeros((0,), int)
+    cls = rows[:, 0].astype(int)
+    cx, cy, bw, bh = rows[:, 1] * w, rows[:, 2] * h, rows[:, 3] * w, rows[:, 4] * h
+    xyxy = np.stack([cx - bw * 0.5, cy - bh * 0.5, cx + bw * 0.5, cy + bh * 0.5], axis=1)
+    return xyxy, cls
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray):
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), np.float32)
+    xx1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    yy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    xx2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    yy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.maximum(0.0, xx2 - xx1) * np.maximum(0.0, yy2 - yy1)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def detect_frame(backend, frame_bgr: np.ndarray, pre: letterbox_preprocessor):
+    # la referencia ultralytics detecta sobre el frame con su propio preproceso (infer_frame)
+    if hasattr(backend, "infer_frame"):
+        out = backend.infer_frame(frame_bgr)
+        meta = None
+    else:
+        tensor, meta = pre.process(frame_bgr)
+        out = backend.infer(tensor)
+    if out is None:
+        return np.zeros((0, 4), np.float32), np.zeros((0,), int), np.zeros((0,), float)
+    xyxy, cls, conf = out
+    xyxy = np.asarray(xyxy, np.float32) if meta is None else unletterbox(xyxy, meta)
+    return xyxy, np.asarray(cls, int), np.asarray(conf, float)
+
+
+def _match(pred_xyxy, pred_conf, gt_xyxy, iou_thr):
+    # marca cada prediccion como tp/fp en orden de confianza
+    order = np.argsort(-pred_conf)
+    tp = np.zeros(len(order), bool)
+    used = np.zeros(len(gt_xyxy), bool)
+    ious = iou_matrix(pred_xyxy[order], gt_xyxy)
+    for i in range(len(order)):
+        if ious.shape[1] == 0:
+            break
+        cand = np.where(~used, ious[i], -1.0)
+        j = int(np.argmax(cand))
+        if cand[j] >= iou_thr:
+            tp[i] = True
+            used[j] = True
+    return pred_conf[order], tp
+
+
+def average_precision(conf: np.ndarray, tp: np.ndarray, n_gt: int):
+    # ap con interpolacion en todos los puntos (estilo voc/coco)
+    if n_gt == 0:
+        return float("nan")
+    if len(conf) == 0:
+        return 0.0
+    order = np.argsort(-conf)
+    tp = tp[order].astype(np.float64)
+    ctp = np.cumsum(tp)
+    cfp = np.cumsum(1.0 - tp)
+    recall = ctp / n_gt
+    precision = ctp / np.maximum(ctp + cfp, 1e-9)
+    mrec = np.concatenate([[0.0], recall, [1.0]])
+    mpre = np.concatenate([[1.0], precision, [0.0]])
+    mpre = np.flip(np.maximum.accumulate(np.flip(mpre)))
+    idx = np.where(mrec[1:] != mrec[:-1])[0]
+    return float(np.sum((mrec[idx + 1] - mrec[idx]) * mpre[idx + 1]))
+
+
+class _ap_accumulator:
+    def __init__(self, classes):
+        self.classes = list(classes)
+        self.conf = {c: [] for c in self.classes}
+        self.tp = {c: [] for c in self.classes}
+        self.n_gt = {c: 0 for c in self.classes}
+
+    def add(self, pred, gt, iou_thr):
+        p_xyxy, p_cls, p_conf = pred
+        g_xyxy, g_cls = gt
+        for c in self.classes:
+            pm, gm = p_cls == c, g_cls == c
+            self.n_gt[c] += int(gm.sum())
+            conf, tp = _match(p_xyxy[pm], p_conf[pm], g_xyxy[gm], iou_thr)
+            self.conf[c].append(conf)
+            self.tp[c].append(tp)
+
+    def result(self):
+        ap = {}
+        for c in self.classes:
+            conf = np.concatenate(self.conf[c]) if self.conf[c] else np.zeros((0,))
+            tp = np.concatenate(self.tp[c]) if self.tp[c] else np.zeros((0,), bool)
+            ap[c] = average_precision(conf, tp, self.n_gt[c])
+        valid = [v for v in ap.values() if not np.isnan(v)]
+        return ap, float(np.mean(valid)) if valid else float("nan")
+
+
+def _agreement(ref, cand, conf_min, iou_thr):
+    # cuantas cajas de referencia (sobre conf_min) reproduce el candidato y con que iou
+    r_xyxy, r_cls, r_conf = ref
+    c_xyxy, c_cls, c_conf = cand
+    hits, total, ious = 0, 0, []
+    for c in np.unique(r_cls):
+        rm = (r_cls == c) & (r_conf >= conf_min)
+        cm = (c_cls == c) & (c_conf >= conf_min)
+        total += int(rm.sum())
+        m = iou_matrix(r_xyxy[rm], c_xyxy[cm])
+        if m.size:
+            best = m.max(axis=1)
+            hits += int((best >= iou_thr).sum())
+            ious.extend(best.tolist())
+    return hits, total, ious
+
+
+def _parse_spec(spec: str):
+    name, _, path = spec.partition(":")
+    return name, path
+
+
+def evaluate(clip: str, ref_spec: str, cand_spec: str, iou_thr: float = 0.5, conf_min: float = 0.25, limit: int = 0):
+    ref = create_backend(*_parse_spec(ref_spec), conf_thr=0.001)
+    cand = create_backend(*_parse_spec(cand_spec), conf_thr=0.001)
+    pre_ref = letterbox_preprocessor(ref.imgsz, layout=ref.layout)
+    pre_cand = letterbox_preprocessor(cand.imgsz, layout=cand.layout)
+    classes = sorted(default_names)
+
+    acc_ref = _ap_accumulator(classes)
+    acc_cand = _ap_accumulator(classes)
+    hits, total, ious, frames = 0, 0, [], 0
+
+    for path, img in iter_frames(clip, limit=limit):
+        h, w = img.shape[:2]
+        gt = load_labels(path, w, h)
+        r = detect_frame(ref, img, pre_ref)
+        c = detect_frame(cand, img, pre_cand)
+        acc_ref.add(r, gt, iou_thr)
+        acc_cand.add(c, gt, iou_thr)
+        fh, ft, fi = _agreement(r, c, conf_min, iou_thr)
+        hits, total = hits + fh, total + ft
+        ious.extend(fi)
+        frames += 1
+
+    ap_ref, map_ref = acc_ref.result()
+    ap_cand, map_cand = acc_cand.result()
+    return {
+        "frames": frames,
+        "ref": {"backend": ref_spec, "map50": map_ref, "ap50": {default_names[c]: ap_ref[c] for c in classes}},
+        "cand": {"backend": cand_spec, "map50": map_cand, "ap50": {default_names[c]: ap_cand[c] for c in classes}},
+        "map50_drop": map_ref - map_cand,
+        "agreement": hits / total if total else float("nan"),
+        "mean_iou_vs_ref": float(np.mean(ious)) if ious else float("nan"),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="monitor.models.evaluate", description="gate de precision para modelos cuantizados")
+    ap.add_argument("--clip", required=True, help="carpeta de imagenes etiquetadas (yolo txt)")
+    ap.add_argument("--ref", default="tflite:y8n_640_ep80/weights/best_float32.tflite", help="backend:modelo float")
+    ap.add_argument("--cand", default="tflite:y8n_640_ep80/weights/best_int8.tflite", help="backend:modelo a validar")
+    ap.add_argument("--iou", type=float, default=0.5)
+    ap.add_argument("--conf", type=float, default=0.25, help="umbral para medir coincidencia con la referencia")
+    ap.add_argument("--max-drop", type=float, default=0.02, help="caida maxima de map@0.5 permitida")
+    ap.add_argument("--limit", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    res = evaluate(args.clip, args.ref, args.cand, iou_thr=args.iou, conf_min=args.conf, limit=args.limit)
+    res["max_drop"] = args.max_drop
+    res["pass"] = bool(res["map50_drop"] <= args.max_drop)
+    print(json.dumps(res, indent=2))
+    return 0 if res["pass"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+# letterbox compartido entre el detector, la exportacion tflite y la evaluacion
+# meta guarda lo necesario para regresar cajas al frame original
+
+import cv2
+import numpy as np
+
+
+def unletterbox(xyxy: np.ndarray, meta: dict):
+    # cajas del letterbox -> pixeles del frame original, recortadas al frame
+    b = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4).copy()
+    b[:, [0, 2]] = (b[:, [0, 2]] - meta["x0"]) / meta["scale"]
+    b[:, [1, 3]] = (b[:, [1, 3]] - meta["y0"]) / meta["scale"]
+    b[:, [0, 2]] = np.clip(b[:, [0, 2]], 0, meta["orig_w"] - 1)
+    b[:, [1, 3]] = np.clip(b[:, [1, 3]], 0, meta["orig_h"] - 1)
+    return b
+
+
+class letterbox_preprocessor:
+    # letterbox sin asignaciones por frame para el hilo del detector
+    # - lienzo uint8 y tensores de entrada preasignados con doble buffer
+    # - resize directo sobre la region util del lienzo (el padding se limpia solo al cambiar resolucion)
+    # - bgr->rgb, hwc->nchw y uint8->float32 en una sola pasada de numpy
+    # - meta del padding cacheada por resolucion de entrada
+    def __init__(self, imgsz: int, layout: str = "nchw", buffers: int = 2):
+        self.imgsz = imgsz
+        self.layout = layout
+        self._canvas = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+        if layout == "nchw":
+            shape = (buffers, 1, 3, imgsz, imgsz)
+        else:
+            shape = (buffers, 1, imgsz, imgsz, 3)
+        self._tensors = np.zeros(shape, dtype=np.float32)
+        self._next = 0
+        self._metas = {}
+        self._last_key = None
+
+    def _geometry(self, w: int, h: int):
+        key = (w, h)
+        g = self._metas.get(key)
+        if g is None:
+            scale = min(self.imgsz / w, self.imgsz / h)
+            nw, nh = int(w * scale), int(h * scale)
+            x0 = (self.imgsz - nw) // 2
+            y0 = (self.imgsz - nh) // 2
+            meta = {"x0": x0, "y0": y0, "scale": scale, "orig_w": w, "orig_h": h}
+            g = (nw, nh, x0, y0, meta)
+            self._metas[key] = g
+        if key != self._last_key:
+            # cambio de resolucion: el padding anterior puede tener pixeles viejos
+            self._canvas.fill(0)
+            self._last_key = key
+        return g
+
+    def process(self, frame_bgr: np.ndarray, out: np.ndarray | None = None):
+        # regresa una vista del tensor listo para el backend y la meta (no modificar la meta)
+        # con out (1, ...) se escribe ahi, p.ej. una fila del lote del servidor de deteccion
+        h, w = frame_bgr.shape[:2]
+        nw, nh, x0, y0, meta = self._geometry(w, h)
+        region = self._canvas[y0 : y0 + nh, x0 : x0 + nw]
+        resized = cv2.resize(frame_bgr, (nw, nh), dst=region, interpolation=cv2.INTER_AREA)
+        if resized is not region:
+            region[...] = resized
+
+        if out is not None:
+            tensor = out
+        else:
+            tensor = self._tensors[self._next]
+            self._next = (self._next + 1) % len(self._tensors)
+        src = self._canvas[:, :, ::-1]
+        if self.layout == "nchw":
+            src = src.transpose(2, 0, 1)
+        np.multiply(src, np.float32(1.0 / 255.0), out=tensor[0], casting="unsafe")
+        return tensor, meta
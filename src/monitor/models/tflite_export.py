@@ -0,0 +1,123 @@
+# convierte y8n_640_ep80/weights/best_saved_model a tflite int8 completo
+# la calibracion usa frames grabados en linea (carpeta de imagenes o video)
+# uso: python -m monitor.models.tflite_export --calib data/calib [--float-out ...]
+
+import argparse
+import glob
+import os
+import sys
+
+import cv2
+
+from .preprocess import letterbox_preprocessor
+
+_image_exts = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def iter_frames(source: str, limit: int = 0, stride: int = 1):
+    # recorre una carpeta de imagenes (orden alfabetico) o un video, en bgr
+    count = 0
+    if os.path.isdir(source):
+        paths = sorted(p for p in glob.glob(os.path.join(source, "*")) if p.lower().endswith(_image_exts))
+        for p in paths[::max(1, stride)]:
+            img = cv2.imread(p)
+            if img is None:
+                continue
+            yield p, img
+            count += 1
+            if limit and count >= limit:
+                return
+        return
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"no se pudo abrir la fuente de frames: {source}")
+    idx = 0
+    try:
+        while 1:
+            ok, img = cap.read()
+            if not ok:
+                return
+            if idx % max(1, stride) == 0:
+                yield f"{source}#{idx}", img
+                count += 1
+                if limit and count >= limit:
+                    return
+            idx += 1
+    finally:
+        cap.release()
+
+
+def representative_dataset(source: str, imgsz: int, limit: int = 200, stride: int = 1):
+    # mismo letterbox que el detector para que los rangos de activacion coincidan
+    def gen():
+        pre = letterbox_preprocessor(imgsz, layout="nhwc")
+        n = 0
+        for _, img in iter_frames(source, limit=limit, stride=stride):
+            tensor, _ = pre.process(img)
+            n += 1
+            yield [tensor.copy()]
+        if n == 0:
+            raise RuntimeError(f"sin frames de calibracion en {source}")
+
+    return gen
+
+
+def convert(saved_model: str, out_path: str, calib: str, imgsz: int = 640, limit: int = 200, stride: int = 1, io_int8: bool = True):
+    import tensorflow as tf
+
+    conv = tf.lite.TFLiteConverter.from_saved_model(saved_model)
+    conv.optimizations = [tf.lite.Optimize.DEFAULT]
+    conv.representative_dataset = representative_dataset(calib, imgsz, limit=limit, stride=stride)
+    conv.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    if io_int8:
+        conv.inference_input_type = tf.int8
+        conv.inference_output_type = tf.int8
+    data = conv.convert()
+    with open(out_path, "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+def convert_float(saved_model: str, out_path: str):
+    # referencia float32 del mismo grafo, usada por monitor.models.evaluate
+    import tensorflow as tf
+
+    conv = tf.lite.TFLiteConverter.from_saved_model(saved_model)
+    data = conv.convert()
+    with open(out_path, "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="monitor.models.tflite_export", description="exporta el modelo a tflite int8")
+    ap.add_argument("--saved-model", default="y8n_640_ep80/weights/best_saved_model")
+    ap.add_argument("--calib", required=True, help="carpeta de imagenes o video grabado en la linea")
+    ap.add_argument("--out", default="y8n_640_ep80/weights/best_int8.tflite")
+    ap.add_argument("--float-out", default="", help="si se da, tambien exporta la referencia float32")
+    ap.add_argument("--imgsz", type=int, default=640, help="debe coincidir con la entrada del saved_model")
+    ap.add_argument("--num", type=int, default=200, help="frames de calibracion")
+    ap.add_argument("--stride", type=int, default=1, help="toma uno de cada n frames")
+    ap.add_argument("--float-io", action="store_true", help="mantiene entrada/salida en float32")
+    args = ap.parse_args(argv)
+
+    size = convert(
+        args.saved_model,
+        args.out,
+        args.calib,
+        imgsz=args.imgsz,
+        limit=args.num,
+        stride=args.stride,
+        io_int8=not args.float_io,
+    )
+    print(f"[tflite_export] int8 -> {args.out} ({size / 1e6:.1f} MB)")
+
+    if args.float_out:
+        size = convert_float(args.saved_model, args.float_out)
+        print(f"[tflite_export] float32 -> {args.float_out} ({size / 1e6:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+# decodificacion de salidas crudas yolov8 y nms en numpy
+# usado por los backends que no pasan por ultralytics (onnx, cv_dnn)
+
+import ast
+import os
+
+import numpy as np
+
+# nombres del modelo entrenado (ver y8n_640_ep80/.../metadata.yaml)
+default_names = {0: "bonder_tip", 1: "gold_reel"}
+
+
+def _names_from_yaml(path: str):
+    try:
+        import yaml
+
+        with open(path, "r") as f:
+            meta = yaml.safe_load(f) or {}
+        names = meta.get("names") or {}
+        return {int(k): str(v) for k, v in names.items()}
+    except Exception:
+        pass
+
+    # lector minimo si no hay pyyaml: busca el bloque "names:" con lineas "  id: nombre"
+    names = {}
+    try:
+        with open(path, "r") as f:
+            in_names = False
+            for line in f:
+                if line.startswith("names:"):
+                    in_names = True
+                    continue
+                if in_names:
+                    if not line.startswith(" "):
+                        break
+                    k, _, v = line.strip().partition(":")
+                    names[int(k)] = v.strip().strip("'\"")
+    except Exception:
+        return {}
+    return names
+
+
+def parse_names(raw):
+    # acepta dict o el str que ultralytics guarda en la metadata de onnx
+    if isinstance(raw, str):
+        try:
+            raw = ast.literal_eval(raw)
+        except Exception:
+            return {}
+    if isinstance(raw, dict):
+        return {int(k): str(v) for k, v in raw.items()}
+    if isinstance(raw, (list, tuple)):
+        return {i: str(v) for i, v in enumerate(raw)}
+    return {}
+
+
+def _metadata_paths(model_path: str):
+    # metadata.yaml junto al modelo o en el saved_model hermano
+    base = os.path.dirname(os.path.abspath(model_path))
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    candidates = [
+        os.path.join(base, "metadata.yaml"),
+        os.path.join(base, f"{stem}_saved_model", "metadata.yaml"),
+        os.path.join(base, "best_saved_model", "metadata.yaml"),
+    ]
+    return [p for p in candidates if os.path.isfile(p)]
+
+
+def _imgsz_from_yaml(path: str) -> int:
+    try:
+        import yaml
+
+        with open(path, "r") as f:
+            meta = yaml.safe_load(f) or {}
+        v = meta.get("imgsz")
+        return int(v[0] if isinstance(v, (list, tuple)) else v or 0)
+    except ImportError:
+        pass
+    except Exception:
+        return 0
+
+    # sin pyyaml: "imgsz: 640" o el bloque "imgsz:" con lineas "- 640"
+    try:
+        with open(path, "r") as f:
+            lines = iter(f.readlines())
+        for line in lines:
+            if line.startswith("imgsz:"):
+                v = line.partition(":")[2].strip()
+                if not v:
+                    v = next(lines, "").strip().lstrip("-").strip()
+                return int(v.strip("[]").split(",")[0])
+    except Exception:
+        pass
+    return 0
+
+
+def load_imgsz(model_path: str) -> int:
+    # tamano de entrada con el que se exporto el modelo; 0 si no hay metadata
+    for p in _metadata_paths(model_path):
+        imgsz = _imgsz_from_yaml(p)
+        if imgsz > 0:
+            return imgsz
+    return 0
+
+
+def load_names(model_path: str):
+    # busca metadata.yaml junto al modelo o en el saved_model hermano
+    for p in _metadata_paths(model_path):
+        names = _names_from_yaml(p)
+        if names:
+            return names
+    return dict(default_names)
+
+
+def nms(xyxy: np.ndarray, conf: np.ndarray, iou_thr: float = 0.45, max_det: int = 100):
+    # nms voraz clasico; regresa indices ordenados por confianza
+    if len(xyxy) == 0:
+        return np.zeros((0,), dtype=np.int64)
+    x1, y1, x2, y2 = xyxy[:, 0], xyxy[:, 1], xyxy[:, 2], xyxy[:, 3]
+    areas = np.maximum(0.0, x2 - x1) * np.maximum(0.0, y2 - y1)
+    order = np.argsort(-conf)
+    keep = []
+    while order.size > 0 and len(keep) < max_det:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        xx1 = np.maximum(x1[i], x1[rest])
+        yy1 = np.maximum(y1[i], y1[rest])
+        xx2 = np.minimum(x2[i], x2[rest])
+        yy2 = np.minimum(y2[i], y2[rest])
+        inter = np.maximum(0.0, xx2 - xx1) * np.maximum(0.0, yy2 - yy1)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_thr]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def decode_yolov8(out, conf_thr: float = 0.25, iou_thr: float = 0.45, max_det: int = 100, imgsz: int = 0):
+    # salida cruda (1, 4+nc, n) o (1, n, 4+nc) con cx, cy, w, h y scores por clase
+    # regresa xyxy (k,4) float32, cls (k,) int, conf (k,) float
+    p = np.asarray(out, dtype=np.float32)
+    if p.ndim == 3:
+        p = p[0]
+    if p.shape[0] < p.shape[1]:
+        p = p.T
+
+    scores = p[:, 4:]
+    cls = scores.argmax(axis=1)
+    conf = scores[np.arange(len(scores)), cls]
+    keep = conf >= conf_thr
+    if not np.any(keep):
+        return np.zeros((0, 4), np.float32), np.zeros((0,), int), np.zeros((0,), float)
+
+    b = p[keep, :4]
+    cls = cls[keep]
+    conf = conf[keep]
+
+    # algunos exports (tflite) dan coordenadas normalizadas
+    if imgsz and float(b.max()) <= 1.5:
+        b = b * float(imgsz)
+
+    xyxy = np.empty_like(b)
+    xyxy[:, 0] = b[:, 0] - b[:, 2] * 0.5
+    xyxy[:, 1] = b[:, 1] - b[:, 3] * 0.5
+    xyxy[:, 2] = b[:, 0] + b[:, 2] * 0.5
+    xyxy[:, 3] = b[:, 1] + b[:, 3] * 0.5
+
+    # nms por clase desplazando cajas de cada clase a una region propia
+    offs = cls.astype(np.float32)[:, None] * 4096.0
+    idx = nms(xyxy + offs, conf, iou_thr=iou_thr, max_det=max_det)
+    return xyxy[idx], cls[idx].astype(int), conf[idx].astype(float)
@@ -0,0 +1,165 @@
+# replay offline y benchmark: python -m monitor --mode replay --source clip.mp4 [--realtime]
+# mismo camino que el preview (frame_pipeline + frame_processor + overlays) alimentado desde un video o carpeta
+# - por defecto lo mas rapido posible; --realtime respeta los fps de la fuente
+# - ts de captura: con --realtime la linea de tiempo del video (frame / fps); rapido, el reloj de pared desde el
+#   inicio, el mismo del hilo del detector, asi edad de detecciones y latencia / presupuesto se comparan en un solo
+#   reloj (como una camara que entregara frames a ese ritmo); duraciones de actividad quedan en tiempo de proceso
+# salida json: percentiles por etapa, fps de punta a punta, utilizacion del detector y rss pico
+
+import json
+import os
+import resource
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from monitor.core.frame_pipeline import frame_pipeline
+from monitor.core.frame_processor import build_detector, frame_processor, stage_names
+from monitor.models.tflite_export import iter_frames
+from monitor.utils import metrics
+
+replay_stages = ("read", "analysis") + stage_names + ("overlay", "total")
+
+
+def _source_fps(source: str, default: float) -> float:
+    cap = cv2.VideoCapture(source)
+    fps = cap.get(cv2.CAP_PROP_FPS) if cap.isOpened() else 0.0
+    cap.release()
+    return fps if fps and fps > 1.0 else default
+
+
+def _percentiles(samples: np.ndarray) -> dict:
+    # nan = etapa que no corrio en ese frame (overlay con --display-fps)
+    samples = samples[~np.isnan(samples)]
+    if len(samples) == 0:
+        return {"n": 0}
+    ms = samples * 1000.0
+    p50, p90, p99 = np.percentile(ms, (50, 90, 99))
+    return {
+        "n": int(len(ms)),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p90_ms": round(float(p90), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss: kb en linux, bytes en macos
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024.0 * 1024.0) if sys.platform == "darwin" else rss / 1024.0
+
+
+def run_replay(args) -> int:
+    source = args.source
+    if not source or not os.path.exists(source):
+        print(f"[replay] no existe la fuente: {source}", file=sys.stderr)
+        return 2
+    fps = args.replay_fps if os.path.isdir(source) else _source_fps(source, args.replay_fps)
+
+    # carga sincrona: la carga y el warm-up no cuentan en los tiempos por frame
+    detector = build_detector(args, background=False)
+    proc = frame_processor(args, detector)
+    pipeline = frame_pipeline(analysis_width=args.analysis_width)
+    detector.start()
+
+    limit = args.max_frames
+    samples = np.zeros((limit or 1 << 16, len(replay_stages)))
+    col = {name: i for i, name in enumerate(replay_stages)}
+    transitions = []
+    clips = []
+    n = 0
+    idle_frames = 0
+    # overlays al ritmo de --display-fps sobre el reloj de replay (ts), como en el preview
+    draw_every = 1.0 / args.display_fps if args.display_fps > 0 else 0.0
+    next_draw = 0.0
+
+    frames = iter_frames(source, limit=limit)
+    t_start = time.perf_counter()
+    try:
+        while 1:
+            t0 = time.perf_counter()
+            item = next(frames, None)
+            if item is None:
+                break
+            raw = item[1]
+            ts = n / fps if args.realtime else t0 - t_start
+            if args.realtime:
+                # ritmo de camara: espera hasta la hora del frame en la linea de tiempo del video
+                delay = t_start + ts - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                t0 = time.perf_counter()
+            t1 = time.perf_counter()
+            analysis = pipeline.analysis(raw)
+            t2 = time.perf_counter()
+            if not proc.process(analysis, n + 1, ts):
+                idle_frames += 1
+            t3 = time.perf_counter()
+            drawn = ts >= next_draw
+            if drawn:
+                next_draw = ts + draw_every
+                display = pipeline.display(raw)
+                proc.draw(display, pipeline)
+            t4 = time.perf_counter()
+
+            if n == len(samples):
+                samples = np.concatenate([samples, np.zeros_like(samples)])
+            row = samples[n]
+            row[col["read"]] = t1 - t0 if not args.realtime else 0.0
+            row[col["analysis"]] = t2 - t1
+            for name in stage_names:
+                row[col[name]] = proc.last_timings[name]
+            row[col["overlay"]] = t4 - t3 if drawn else np.nan
+            row[col["total"]] = t4 - t0 if not args.realtime else t4 - t1
+            if proc.transition is not None:
+                transitions.append(proc.transition)
+            clips.extend(proc.clip_events)
+            n += 1
+    except KeyboardInterrupt:
+        pass
+    wall = time.perf_counter() - t_start
+    detector.stop()
+    proc.close()
+    metrics.close()
+    if proc.recorder is not None:
+        # los clips que terminaron de codificarse durante el cierre
+        clips.extend(proc.recorder.poll())
+
+    samples = samples[:n]
+    report = {
+        "source": source,
+        "mode": "realtime" if args.realtime else "fast",
+        "clock": "video" if args.realtime else "wall",
+        "backend": detector.backend.name,
+        "imgsz": detector.imgsz,
+        "load_s": round(detector.load_time, 3),
+        "warmup_s": round(detector.warmup_time, 3),
+        "analysis_width": args.analysis_width,
+        "frames": n,
+        "source_fps": fps,
+        "wall_s": round(wall, 3),
+        "fps": round(n / wall, 2) if wall > 0 else 0.0,
+        "idle_frames": idle_frames,
+        "stages": {name: _percentiles(samples[:, i]) for i, name in enumerate(replay_stages)},
+        "detector": {
+            "submitted": proc.submitted,
+            "inferences": detector.inferences,
+            "dropped": detector.dropped,
+            "utilisation": round(detector.infer_time / wall, 4) if wall > 0 else 0.0,
+            "mean_latency_ms": round(1000.0 * detector.infer_time / detector.inferences, 3) if detector.inferences else None,
+        },
+        "tracking": proc.mtt.stats(),
+        "activity": {"transitions": len(transitions), "final": proc.engine.state},
+        "clips": [c["path"] for c in clips],
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+    text = json.dumps(report, indent=2)
+    if args.bench_out:
+        with open(args.bench_out, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    return 0
@@ -0,0 +1,255 @@
+# modo servicio sin gui: python -m monitor --mode headless
+# deteccion y tracking sobre el frame de analisis (nativo o --analysis-width), sin resize de pantalla ni dibujo
+# el estado y los eventos salen como json lines (stdout, archivo o socket unix)
+# las transiciones de actividad (tracking.activity) salen como registros type=activity
+# vista previa mjpeg opcional a baja tasa (--preview-port)
+# en reposo (--idle-after) se emiten scene_idle/scene_active y el estado queda congelado
+# cada --stats-every segundos un event=capture_stats con fps de captura, frames leidos, saltados y descartados
+# clips por evento (--clips) salen como event=clip_saved cuando terminan de codificarse
+# hitos de arranque (primer frame, modelo listo con tiempos de carga y warm-up, primera deteccion) salen como event=boot
+# varias camaras (--camera a --camera b ...): un hilo por camara y un solo modelo en models.detection_server
+# que junta los frames en lotes; cada registro lleva "camera" y telemetria/clips van a una subcarpeta por camara
+
+import argparse
+import functools
+import os
+import sys
+import threading
+import time
+
+from monitor.core.frame_pipeline import frame_pipeline
+from monitor.core.frame_processor import build_detector, frame_processor
+from monitor.devices.camera import open_camera
+from monitor.devices.capture import camera_capture
+from monitor.devices.discovery import find_camera, reopen_camera, save_last_device
+from monitor.io.events import open_sink
+from monitor.utils import metrics
+
+
+def _bbox(b):
+    return list(b) if b else None
+
+
+def _state_record(frame_id, ts, det_state, trk_state, tracks=(), idle=False, activity=None, reel_change=0.0):
+    # reel_change: entrada del motor de actividad que sale de pixeles; con ella el log se puede re-evaluar offline
+    rec = {"type": "state", "ts": ts, "frame_id": frame_id, "idle": idle, "activity": activity}
+    rec["reel_change"] = round(reel_change, 6)
+    for k, t in trk_state.items():
+        d = det_state.get(k)
+        rec[k] = {
+            "bbox": _bbox(t.get("bbox")),
+            "ok": bool(t.get("ok")),
+            "missed": int(t.get("missed", 0)),
+            "reinit": int(t.get("reinit", 0)),
+            "det_conf": d["conf"] if d else None,
+            "det_frame_id": d.get("frame_id") if d else None,
+        }
+    # todas las instancias con id persistente
+    rec["tracks"] = [{"id": t["id"], "label": t["label"], "bbox": _bbox(t["bbox"]), "conf": t["conf"]} for t in tracks]
+    return rec
+
+
+class _camera_sink:
+    # agrega el id de camara a cada registro; el sink real es compartido por los hilos
+    def __init__(self, sink, cam_id: str):
+        self.sink = sink
+        self.cam_id = cam_id
+
+    def emit(self, record: dict):
+        self.sink.emit(dict(record, camera=self.cam_id))
+
+
+def _open_path(path: str, profile):
+    # solo esa camara: con varias, un corte no debe caer en el dispositivo de otra linea
+    return open_camera(os.path.realpath(path) if os.path.exists(path) else path, profile=profile)
+
+
+def _open_capture(args, sink, stop, path: str = "", cam_id: str = ""):
+    # espera la camara sin limite (o hasta stop); en servicio no hay a quien preguntar
+    # path vacio: la mejor camara disponible (ultima buena primero)
+    announced = False
+    while not stop.is_set():
+        if path:
+            cap, device = _open_path(path, args.profile), path
+            reopen = functools.partial(_open_path, path, args.profile)
+        else:
+            dev = find_camera(max_index=5)
+            cap = open_camera(dev.path, profile=args.profile) if dev is not None else None
+            if cap is not None:
+                save_last_device(dev)
+                device = dev.stable_path
+                reopen = functools.partial(reopen_camera, dev.stable_path, profile=args.profile, identity=dev)
+        if cap is not None:
+            sink.emit({"type": "event", "event": "camera_opened", "ts": time.time(), "device": device})
+            return camera_capture(cap, retrieve_every=args.retrieve_every, reopen=reopen, name=cam_id).start()
+        if not announced:
+            sink.emit({"type": "event", "event": "camera_missing", "ts": time.time()})
+            announced = True
+        stop.wait(1.0)
+    return None
+
+
+def _parse_cameras(values):
+    # "linea1=/dev/v4l/by-id/..." o solo la ruta/indice (id cam0, cam1, ...)
+    cams = []
+    for i, v in enumerate(values or ()):
+        cam_id, sep, path = v.partition("=")
+        cams.append((cam_id, path) if sep else (f"cam{i}", v))
+    return cams
+
+
+def run_headless(args):
+    cams = _parse_cameras(args.camera)
+    if len(cams) > 1:
+        return _run_multi(args, cams)
+
+    sink = open_sink(args.events)
+    preview = None
+    if args.preview_port:
+        from monitor.io.preview_stream import mjpeg_preview
+
+        preview = mjpeg_preview(port=args.preview_port, fps=args.preview_fps)
+
+    detector = build_detector(args)
+    detector.start()
+    try:
+        _run_camera(args, detector, sink, threading.Event(), path=cams[0][1] if cams else "", preview=preview)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        detector.stop()
+        if preview is not None:
+            preview.close()
+        metrics.close()
+        sink.close()
+    return 0
+
+
+def _run_multi(args, cams):
+    from monitor.models.detection_server import detection_server
+
+    if args.roi_full_every > 0:
+        # el servidor arma lotes de frames completos a un solo tamano de entrada
+        print("[servicio] --roi-full-every no esta soportado con varias camaras", file=sys.stderr)
+        return 2
+    if len({cid for cid, _ in cams}) != len(cams):
+        print("[servicio] ids de camara repetidos", file=sys.stderr)
+        return 2
+
+    sink = open_sink(args.events)
+    # un solo modelo; carga sincrona antes de abrir las camaras
+    server = detection_server(
+        model_path=args.model,
+        backend=args.backend,
+        imgsz=args.imgsz,
+        threads=args.threads,
+        max_batch=args.server_batch or len(cams),
+        max_wait=args.server_wait,
+    )
+    stop = threading.Event()
+    threads = []
+    for cam_id, path in cams:
+        # telemetria y clips por camara en su subcarpeta
+        cam_args = argparse.Namespace(**vars(args))
+        cam_args.telemetry = os.path.join(args.telemetry, cam_id) if args.telemetry else ""
+        cam_args.clips = os.path.join(args.clips, cam_id) if args.clips else ""
+        thr = threading.Thread(
+            target=_run_camera,
+            args=(cam_args, server.client(cam_id), _camera_sink(sink, cam_id), stop),
+            kwargs={"path": path, "cam_id": cam_id},
+            daemon=True,
+        )
+        threads.append(thr)
+    server.start()
+    for thr in threads:
+        thr.start()
+    try:
+        while any(thr.is_alive() for thr in threads):
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        for thr in threads:
+            thr.join(timeout=5.0)
+        server.stop()
+        sink.emit({"type": "event", "event": "server_stats", "ts": time.time(), **server.stats()})
+        metrics.close()
+        sink.close()
+    return 0
+
+
+def _run_camera(args, detector, sink, stop, path: str = "", preview=None, cam_id: str = ""):
+    # bucle de una camara hasta stop (o ctrl+c en el hilo principal)
+    # con varias camaras sus metricas llevan label camera (una serie e histograma por hilo)
+    proc = frame_processor(args, detector, boot_ts=getattr(args, "boot_ts", None), metric_labels={"camera": cam_id} if cam_id else None)
+    idle = False
+    pipeline = frame_pipeline(analysis_width=args.analysis_width)
+    capture = _open_capture(args, sink, stop, path, cam_id)
+    prev_ok = {}
+    connected = True
+    next_stats = time.monotonic() + args.stats_every
+    try:
+        while capture is not None and not stop.is_set():
+            if args.stats_every > 0 and time.monotonic() >= next_stats:
+                next_stats += args.stats_every
+                sink.emit({"type": "event", "event": "capture_stats", "ts": time.time(), **capture.stats()})
+            ok, raw, frame_id, ts = capture.read_meta(timeout=1.0)
+            if not ok:
+                if capture.failed.is_set():
+                    sink.emit({"type": "event", "event": "camera_failed", "ts": time.time()})
+                    capture.release()
+                    capture = _open_capture(args, sink, stop, path, cam_id)
+                elif connected and capture.reconnecting:
+                    connected = False
+                    sink.emit({"type": "event", "event": "camera_lost", "ts": time.time()})
+                continue
+            if not connected:
+                connected = True
+                sink.emit({"type": "event", "event": "camera_reconnected", "ts": ts})
+            frame = pipeline.analysis(raw)
+
+            # reposo: sin movimiento en tip/reel no se corre detector ni trackers; el estado se congela
+            proc.process(frame, frame_id, ts)
+            # hitos de arranque (primer frame, modelo listo, primera deteccion) para seguir el tiempo de boot
+            for ev in proc.boot_events:
+                sink.emit(dict(ev, ts=ts, frame_id=frame_id))
+            det_state, trk_state = proc.det_state, proc.trk_state
+            if proc.idle != idle:
+                idle = proc.idle
+                sink.emit({"type": "event", "event": "scene_idle" if idle else "scene_active", "ts": ts, "frame_id": frame_id})
+
+            tr = proc.transition
+            if tr is not None:
+                tr["frame_id"] = frame_id
+                sink.emit(tr)
+            for ev in proc.clip_events:
+                sink.emit(ev)
+
+            # eventos de adquisicion/perdida por objetivo
+            for k, t in trk_state.items():
+                if prev_ok.get(k) is not None and prev_ok[k] != t["ok"]:
+                    ev = "track_acquired" if t["ok"] else "track_lost"
+                    sink.emit({"type": "event", "event": ev, "target": k, "ts": ts, "frame_id": frame_id})
+                prev_ok[k] = t["ok"]
+
+            if args.state_every > 0 and frame_id % args.state_every == 0:
+                sink.emit(
+                    _state_record(
+                        frame_id, ts, det_state, trk_state, proc.mtt.tracks(), idle, proc.engine.state, proc.engine.reel_change
+                    )
+                )
+
+            if preview is not None and preview.wants_frame():
+                from monitor.ui.startup_screen import draw_detection_overlay, draw_instance_overlay, draw_tracking_overlay
+
+                img = frame.copy()
+                draw_detection_overlay(img, det_state, conf_min=0.25)
+                draw_tracking_overlay(img, trk_state)
+                draw_instance_overlay(img, proc.mtt.tracks())
+                preview.publish(img)
+    finally:
+        if capture is not None:
+            capture.release()
+        proc.close()
+
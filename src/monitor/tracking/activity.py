@@ -0,0 +1,243 @@
+# motor de estado de actividad de la wire bonder sobre las trayectorias de tip/reel
+# por frame: energia de movimiento del tip, frecuencia de oscilacion vertical del tip y cambio de imagen del reel
+# ventanas rodantes de tamano fijo (o(1) por frame, memoria constante) + histeresis y tiempo de permanencia
+# estados: ACTIVE, IDLE y FAULT (el tip no se ve durante fault_after segundos)
+#
+# offline sobre un log jsonl del modo headless (con --state-every 1: las ventanas cuentan frames):
+#   python -m monitor.tracking.activity estados.jsonl
+# el cambio del reel necesita pixeles; headless lo guarda en cada registro state (reel_change) y el offline lo reusa
+
+import cv2
+import numpy as np
+
+state_active = "ACTIVE"
+state_idle = "IDLE"
+state_fault = "FAULT"
+
+
+class rolling_window:
+    # suma y suma de cuadrados sobre un anillo fijo; cada vuelta completa se recalculan
+    # desde el anillo para que el error de punto flotante no se acumule en corridas de semanas
+    def __init__(self, size: int):
+        self.size = size
+        self.buf = [0.0] * size
+        self.i = 0
+        self.n = 0
+        self.s = 0.0
+        self.s2 = 0.0
+
+    def push(self, v: float):
+        old = self.buf[self.i] if self.n == self.size else 0.0
+        self.buf[self.i] = v
+        self.s += v - old
+        self.s2 += v * v - old * old
+        self.i += 1
+        if self.n < self.size:
+            self.n += 1
+        if self.i == self.size:
+            self.i = 0
+            self.s = sum(self.buf)
+            self.s2 = sum(x * x for x in self.buf)
+
+    @property
+    def mean(self) -> float:
+        return self.s / self.n if self.n else 0.0
+
+    @property
+    def var(self) -> float:
+        if self.n < 2:
+            return 0.0
+        m = self.s / self.n
+        return max(0.0, self.s2 / self.n - m * m)
+
+
+def _center_size(b):
+    x1, y1, x2, y2 = b
+    return (x1 + x2) * 0.5, (y1 + y2) * 0.5, max(1.0, float(max(x2 - x1, y2 - y1)))
+
+
+class activity_engine:
+    # umbrales en unidades normalizadas:
+    # - energia: (velocidad del tip / tamano del tip)^2 en (tamanos/s)^2
+    # - oscilacion: cruces de signo de la velocidad vertical del tip, en hz
+    # - reel: diferencia media absoluta (0..1) de una miniatura 16x16 del reel entre frames
+    def __init__(
+        self,
+        window: float = 2.0,
+        fps: float = 30.0,
+        energy_on: float = 0.05,
+        energy_off: float = 0.01,
+        osc_min_hz: float = 0.5,
+        reel_on: float = 0.02,
+        reel_off: float = 0.008,
+        dwell: float = 1.0,
+        fault_after: float = 10.0,
+        deadband: float = 0.05,
+    ):
+        n = max(2, int(round(window * fps)))
+        self.energy = rolling_window(n)
+        self.crossings = rolling_window(n)
+        self.dts = rolling_window(n)
+        self.reel = rolling_window(n)
+        self.energy_on = energy_on
+        self.energy_off = energy_off
+        self.osc_min_hz = osc_min_hz
+        self.reel_on = reel_on
+        self.reel_off = reel_off
+        self.dwell = dwell
+        self.fault_after = fault_after
+        self.deadband = deadband
+
+        self.state = state_idle
+        self.since = None
+        self.transitions = 0
+        self._candidate = None
+        self._candidate_since = None
+        self._last_ts = None
+        self._tip_prev = None
+        self._vy_sign = 0
+        self._tip_seen = None
+        self._reel_prev = None
+        # ultimo valor del cambio del reel (lo que entra a la ventana); va en el registro state de headless
+        self.reel_change = 0.0
+        self._reel_thumb = np.empty((16, 16), dtype=np.uint8)
+        self._reel_diff = np.empty((16, 16), dtype=np.uint8)
+
+    def _tip(self, item, dt: float):
+        b = item.get("bbox") if item and item.get("ok") else None
+        if b is None:
+            self._tip_prev = None
+            self.energy.push(0.0)
+            self.crossings.push(0.0)
+            return False
+        cx, cy, size = _center_size(b)
+        if self._tip_prev is None or dt <= 0.0:
+            self._tip_prev = (cx, cy)
+            self.energy.push(0.0)
+            self.crossings.push(0.0)
+            return True
+        vx = (cx - self._tip_prev[0]) / (dt * size)
+        vy = (cy - self._tip_prev[1]) / (dt * size)
+        self._tip_prev = (cx, cy)
+        self.energy.push(vx * vx + vy * vy)
+        sign = 0 if abs(vy) < self.deadband else (1 if vy > 0 else -1)
+        crossed = sign != 0 and self._vy_sign != 0 and sign != self._vy_sign
+        if sign != 0:
+            self._vy_sign = sign
+        self.crossings.push(1.0 if crossed else 0.0)
+        return True
+
+    def _reel(self, item, ctx) -> float:
+        # miniatura de tamano fijo: el cuadro del reel puede variar un pixel entre frames
+        b = item.get("bbox") if item and item.get("ok") else None
+        if b is None or ctx is None:
+            self._reel_prev = None
+            return 0.0
+        g = ctx.level(2)
+        x1, y1, x2, y2 = (int(v) >> 2 for v in b)
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(g.shape[1], x2), min(g.shape[0], y2)
+        if x2 - x1 < 2 or y2 - y1 < 2:
+            self._reel_prev = None
+            return 0.0
+        thumb = cv2.resize(g[y1:y2, x1:x2], (16, 16), dst=self._reel_thumb, interpolation=cv2.INTER_AREA)
+        if self._reel_prev is None:
+            self._reel_prev = thumb.copy()
+            return 0.0
+        cv2.absdiff(thumb, self._reel_prev, dst=self._reel_diff)
+        self._reel_prev[...] = thumb
+        return float(self._reel_diff.mean()) / 255.0
+
+    def features(self) -> dict:
+        span = self.dts.s
+        return {
+            "energy": self.energy.mean,
+            "osc_hz": self.crossings.s / (2.0 * span) if span > 0 else 0.0,
+            "reel": self.reel.mean,
+        }
+
+    def _target(self, ts: float, tip_ok: bool):
+        if tip_ok:
+            self._tip_seen = ts
+        elif self._tip_seen is None:
+            self._tip_seen = ts
+        if self.fault_after > 0 and ts - self._tip_seen >= self.fault_after:
+            return state_fault
+        f = self.features()
+        if self.state == state_active:
+            # histeresis: se sale con umbrales mas bajos que los de entrada
+            if f["energy"] < self.energy_off and f["reel"] < self.reel_off:
+                return state_idle
+            return state_active
+        on = f["energy"] >= self.energy_on and f["osc_hz"] >= self.osc_min_hz
+        if on or f["reel"] >= self.reel_on:
+            return state_active
+        return state_idle
+
+    def update(self, ts: float, trk_state: dict, ctx=None, reel_change: float | None = None):
+        # trk_state: salida de multi_target_tracking.step; ctx (frame_context) habilita el proxy del reel
+        # reel_change: valor ya medido (offline desde el log); si se da, no se usa ctx
+        # regresa un dict de transicion cuando el estado cambia, si no None
+        dt = ts - self._last_ts if self._last_ts is not None else 0.0
+        self._last_ts = ts
+        if self.since is None:
+            self.since = ts
+        if dt < 0.0 or dt > 1.0:
+            dt = 0.0
+        self.dts.push(dt)
+        tip_ok = self._tip(trk_state.get("tip"), dt)
+        if reel_change is None:
+            reel_change = self._reel(trk_state.get("reel"), ctx)
+        self.reel_change = reel_change
+        self.reel.push(reel_change)
+
+        target = self._target(ts, tip_ok)
+        if target == self.state:
+            self._candidate = None
+            return None
+        if target != self._candidate:
+            self._candidate, self._candidate_since = target, ts
+        # fault entra sin permanencia extra: fault_after ya es su espera
+        if target != state_fault and ts - self._candidate_since < self.dwell:
+            return None
+
+        prev, self.state = self.state, target
+        duration = ts - self.since
+        self.since = ts
+        self._candidate = None
+        self.transitions += 1
+        return {
+            "type": "activity",
+            "state": target,
+            "prev": prev,
+            "ts": ts,
+            "prev_duration": duration,
+            "features": {k: round(v, 4) for k, v in self.features().items()},
+        }
+
+
+def _replay_jsonl(path: str, **kwargs):
+    import json
+
+    eng = activity_engine(**kwargs)
+    with open(path) as f:
+        for line in f:
+            rec = json.loads(line)
+            if rec.get("type") != "state":
+                continue
+            # logs viejos sin reel_change: el reel cuenta como quieto
+            tr = eng.update(rec["ts"], rec, reel_change=rec.get("reel_change") or 0.0)
+            if tr is not None:
+                print(json.dumps(tr))
+    return eng
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="estados de actividad offline sobre un log jsonl del modo headless")
+    ap.add_argument("log", help="archivo jsonl con registros type=state")
+    ap.add_argument("--fps", type=float, default=30.0)
+    ap.add_argument("--window", type=float, default=2.0)
+    a = ap.parse_args()
+    _replay_jsonl(a.log, fps=a.fps, window=a.window)
@@ -0,0 +1,41 @@
+# contexto por frame compartido por todos los trackers
+# gris y niveles reducidos se calculan una sola vez por frame y solo si alguien los pide
+# nota: el binding de python de calcOpticalFlowPyrLK no acepta piramides precalculadas,
+# asi que lo que se comparte es el gris; el del frame anterior lo guarda flow_refiner, porque sus puntos
+# son del ultimo frame en que corrio (no siempre el capturado justo antes)
+
+import cv2
+
+
+class frame_context:
+    def __init__(self, frame, frame_id: int = 0, ts: float = 0.0):
+        self.frame = frame
+        self.frame_id = frame_id
+        self.ts = ts
+        self._gray = None
+        self._levels = None
+
+    @property
+    def gray(self):
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    def level(self, n: int):
+        # gris reducido 2^n veces (pyrDown); nivel 0 = gris completo
+        if self._levels is None:
+            self._levels = [self.gray]
+        while len(self._levels) <= n:
+            self._levels.append(cv2.pyrDown(self._levels[-1]))
+        return self._levels[n]
+
+
+class frame_context_builder:
+    # crea el contexto del frame actual
+    def __init__(self):
+        self.current: frame_context | None = None
+
+    # los buffers de analisis se reutilizan, asi que no se compara por identidad: un build por frame capturado
+    def build(self, frame, frame_id: int = 0, ts: float = 0.0) -> frame_context:
+        self.current = frame_context(frame, frame_id=frame_id, ts=ts)
+        return self.current
@@ -1,5 +1,7 @@
 # filtro kalman simple para bbox con modelo de velocidad constante
 # estado: [cx, cy, w, h, vx, vy, vw, vh]
+# bbox_kalman: un objeto; batch_kalman: n tracks en arreglos contiguos (n,8) / (n,8,8)
+# ambos aceptan dt por paso (timestamps de captura); q escala con dt respecto al dt nominal
 
 import numpy as np
 
@@ -26,6 +28,7 @@ class bbox_kalman:
         self.r = np.eye(4, dtype=np.float32) * meas_var
 
         self.p = np.eye(8, dtype=np.float32)
+        self._i = np.eye(8, dtype=np.float32)
 
         self.inited = False
 
@@ -39,14 +42,22 @@ class bbox_kalman:
         self.x[1, 0] = cy
         self.x[2, 0] = w
         self.x[3, 0] = h
-        self.p = np.eye(8, dtype=np.float32)
+        self.p = self._i.copy()
         self.inited = True
 
-    def predict(self):
+    def predict(self, dt: float = None):
         if not self.inited:
             return None
+        q = self.q
+        if dt is not None and dt > 0 and dt != self.dt:
+            for i in range(4):
+                self.f[i, i + 4] = dt
+            q = self.q * (dt / self.dt)
         self.x = self.f @ self.x
-        self.p = self.f @ self.p @ self.f.T + self.q
+        self.p = self.f @ self.p @ self.f.T + q
+        if q is not self.q:
+            for i in range(4):
+                self.f[i, i + 4] = self.dt
         return self.get_bbox()
 
     def update(self, x1: int, y1: int, x2: int, y2: int):
@@ -59,12 +70,12 @@ class bbox_kalman:
         z[2, 0] = max(1.0, float(x2 - x1))
         z[3, 0] = max(1.0, float(y2 - y1))
 
-        s = self.h @ self.p @ self.h.T + self.r
-        k = self.p @ self.h.T @ np.linalg.inv(s)
-        y = z - (self.h @ self.x)
+        # h = [i 0]: s = p[:4,:4] + r; k = p h^t s^-1 se obtiene con solve (s simetrica)
+        s = self.p[:4, :4] + self.r
+        k = np.linalg.solve(s, self.p[:4, :]).T
+        y = z - self.x[:4]
         self.x = self.x + k @ y
-        i = np.eye(8, dtype=np.float32)
-        self.p = (i - k @ self.h) @ self.p
+        self.p = self.p - k @ self.p[:4, :]
         return self.get_bbox()
 
     def get_bbox(self):
@@ -77,3 +88,95 @@ class bbox_kalman:
         y2 = int(cy + h * 0.5)
         return x1, y1, x2, y2
 
+
+def _xyxy_to_z(b):
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 4)
+    z = np.empty_like(b)
+    z[:, 0] = (b[:, 0] + b[:, 2]) * 0.5
+    z[:, 1] = (b[:, 1] + b[:, 3]) * 0.5
+    z[:, 2] = np.maximum(1.0, b[:, 2] - b[:, 0])
+    z[:, 3] = np.maximum(1.0, b[:, 3] - b[:, 1])
+    return z
+
+
+class batch_kalman:
+    # n tracks con el mismo modelo que bbox_kalman, en float64
+    # los slots se reutilizan; active marca cuales estan vivos
+    def __init__(self, capacity: int = 16, dt: float = 1 / 30.0, process_var: float = 1e-2, meas_var: float = 1e-1):
+        self.dt = dt
+        q = np.full(8, process_var)
+        q[4:] *= 10.0
+        self.q_diag = q
+        self.r = np.eye(4) * meas_var
+        self._alloc(capacity)
+
+    def _alloc(self, n: int):
+        self.x = np.zeros((n, 8))
+        self.p = np.zeros((n, 8, 8))
+        self.active = np.zeros(n, dtype=bool)
+        self._f = np.tile(np.eye(8), (n, 1, 1))
+
+    def _grow(self):
+        n = len(self.active)
+        x, p, active = self.x, self.p, self.active
+        self._alloc(n * 2)
+        self.x[:n], self.p[:n], self.active[:n] = x, p, active
+
+    def __len__(self):
+        return int(self.active.sum())
+
+    def add(self, bbox) -> int:
+        free = np.flatnonzero(~self.active)
+        if len(free) == 0:
+            self._grow()
+            free = np.flatnonzero(~self.active)
+        i = int(free[0])
+        self.x[i] = 0.0
+        self.x[i, :4] = _xyxy_to_z(bbox)[0]
+        self.p[i] = np.eye(8)
+        self.active[i] = True
+        return i
+
+    def remove(self, i: int):
+        self.active[i] = False
+
+    def predict(self, dt=None):
+        # dt escalar o por track (n,); se aplica a todos los slots activos en una sola llamada
+        idx = np.flatnonzero(self.active)
+        if len(idx) == 0:
+            return
+        dt = self.dt if dt is None else dt
+        dt = np.broadcast_to(np.asarray(dt, dtype=np.float64), (len(self.active),))[idx]
+        f = self._f[idx]
+        for j in range(4):
+            f[:, j, j + 4] = dt
+        self.x[idx, :4] += self.x[idx, 4:] * dt[:, None]
+        p = f @ self.p[idx] @ f.transpose(0, 2, 1)
+        d = np.arange(8)
+        p[:, d, d] += self.q_diag * (dt / self.dt)[:, None]
+        self.p[idx] = p
+
+    def update(self, idx, bboxes):
+        # idx: indices o mascara booleana de los tracks con medicion; el resto solo queda predicho
+        idx = np.asarray(idx)
+        if idx.dtype == bool:
+            idx = np.flatnonzero(idx)
+        if len(idx) == 0:
+            return
+        z = _xyxy_to_z(bboxes)
+        p = self.p[idx]
+        s = p[:, :4, :4] + self.r
+        k = np.linalg.solve(s, p[:, :4, :]).transpose(0, 2, 1)
+        y = z - self.x[idx, :4]
+        self.x[idx] += (k @ y[:, :, None])[:, :, 0]
+        self.p[idx] = p - k @ p[:, :4, :]
+
+    def bboxes(self, idx=None):
+        # (m,4) xyxy en float; idx=None regresa todos los slots
+        x = self.x if idx is None else self.x[idx]
+        out = np.empty((len(x), 4))
+        out[:, 0] = x[:, 0] - x[:, 2] * 0.5
+        out[:, 1] = x[:, 1] - x[:, 3] * 0.5
+        out[:, 2] = x[:, 0] + x[:, 2] * 0.5
+        out[:, 3] = x[:, 1] + x[:, 3] * 0.5
+        return out
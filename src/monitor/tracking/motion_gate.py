@@ -0,0 +1,68 @@
+# compuerta de movimiento para el modo reposo
+# diferencia entre frames sobre el gris reducido del frame_context (nivel 2 = 1/4 por lado)
+# con regiones (cajas de tip/reel) solo se mira ahi; sin regiones se mira el frame completo
+# tras idle_after segundos sin movimiento la compuerta se cierra: ni detector ni trackers hasta que algo se mueva
+
+import cv2
+
+from .frame_context import frame_context
+
+
+class motion_gate:
+    def __init__(self, idle_after: float = 5.0, level: int = 2, thresh: int = 12, min_fraction: float = 0.002, pad: float = 0.5):
+        self.idle_after = idle_after
+        self.level = level
+        self.thresh = thresh
+        self.min_fraction = min_fraction
+        self.pad = pad
+        self.prev = None
+        self.last_motion = None
+        self.idle = False
+        self.motion = 0.0
+        self._diff = None
+        self._mask = None
+
+    def _regions(self, shape, boxes):
+        # cajas en pixeles de analisis -> rebanadas en el nivel reducido, con margen
+        h, w = shape[:2]
+        k = 1.0 / (1 << self.level)
+        out = []
+        for x1, y1, x2, y2 in boxes:
+            px, py = (x2 - x1) * self.pad, (y2 - y1) * self.pad
+            rx1, ry1 = max(0, int((x1 - px) * k)), max(0, int((y1 - py) * k))
+            rx2, ry2 = min(w, int((x2 + px) * k) + 1), min(h, int((y2 + py) * k) + 1)
+            if rx2 > rx1 and ry2 > ry1:
+                out.append((slice(ry1, ry2), slice(rx1, rx2)))
+        return out
+
+    def update(self, ctx: frame_context, boxes=(), ts: float | None = None) -> bool:
+        # True si hay que correr deteccion/tracking en este frame
+        ts = ctx.ts if ts is None else ts
+        g = ctx.level(self.level)
+        prev, self.prev = self.prev, g
+        if prev is None or prev.shape != g.shape:
+            self.last_motion = ts
+            self.idle = False
+            return True
+
+        if self._diff is None or self._diff.shape != g.shape:
+            self._diff = g.copy()
+            self._mask = g.copy()
+        cv2.absdiff(g, prev, dst=self._diff)
+        cv2.threshold(self._diff, self.thresh, 255, cv2.THRESH_BINARY, dst=self._mask)
+
+        regions = self._regions(g.shape, boxes) if boxes else []
+        if regions:
+            moving = sum(cv2.countNonZero(self._mask[r]) for r in regions)
+            area = sum(self._mask[r].size for r in regions)
+        else:
+            moving = cv2.countNonZero(self._mask)
+            area = self._mask.size
+        self.motion = moving / max(1, area)
+
+        if self.motion >= self.min_fraction:
+            self.last_motion = ts
+            self.idle = False
+        elif self.idle_after > 0 and ts - self.last_motion >= self.idle_after:
+            self.idle = True
+        return not self.idle
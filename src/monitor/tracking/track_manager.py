@@ -0,0 +1,194 @@
+# seguimiento multi instancia: ids persistentes, nacimiento/muerte y asociacion vectorizada
+# cada track vive en un slot de batch_kalman; los atributos por track van en arreglos paralelos
+# costo = (1 - iou) + center_weight * distancia de centros / lado mayor; etiquetas distintas = sin asociacion
+# hungaro con scipy si esta instalado, si no greedy sobre el costo ordenado
+
+import numpy as np
+
+from ..utils import metrics
+from .kalman import batch_kalman
+
+_inf_cost = 1e6
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # a (t,4), b (d,4) xyxy -> (t,d)
+    ix = np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0])
+    iy = np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1])
+    inter = np.clip(ix, 0, None) * np.clip(iy, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return inter / np.maximum(union, 1e-6)
+
+
+def association_cost(tracks: np.ndarray, dets: np.ndarray, center_weight: float = 0.5) -> np.ndarray:
+    cost = 1.0 - iou_matrix(tracks, dets)
+    ct = (tracks[:, :2] + tracks[:, 2:]) * 0.5
+    cd = (dets[:, :2] + dets[:, 2:]) * 0.5
+    size = np.maximum(dets[:, 2] - dets[:, 0], dets[:, 3] - dets[:, 1])
+    dist = np.linalg.norm(ct[:, None, :] - cd[None, :, :], axis=2) / np.maximum(size, 1.0)[None, :]
+    return cost + center_weight * dist
+
+
+def _greedy(cost: np.ndarray, max_cost: float):
+    order = np.argsort(cost, axis=None)
+    rows, cols = np.unravel_index(order, cost.shape)
+    used_r = np.zeros(cost.shape[0], dtype=bool)
+    used_c = np.zeros(cost.shape[1], dtype=bool)
+    out_r, out_c = [], []
+    limit = min(cost.shape)
+    for r, c in zip(rows, cols):
+        if cost[r, c] > max_cost:
+            break
+        if used_r[r] or used_c[c]:
+            continue
+        used_r[r] = used_c[c] = True
+        out_r.append(r)
+        out_c.append(c)
+        if len(out_r) == limit:
+            break
+    return np.array(out_r, dtype=np.intp), np.array(out_c, dtype=np.intp)
+
+
+def match(cost: np.ndarray, max_cost: float):
+    # regresa (filas, columnas) asociadas con costo <= max_cost
+    if cost.size == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    try:
+        from scipy.optimize import linear_sum_assignment
+    except ImportError:
+        return _greedy(cost, max_cost)
+    r, c = linear_sum_assignment(np.minimum(cost, _inf_cost))
+    keep = cost[r, c] <= max_cost
+    return r[keep], c[keep]
+
+
+class track_manager:
+    # min_hits: asociaciones para confirmar un track; max_age: segundos sin deteccion antes de borrarlo
+    def __init__(
+        self,
+        labels=("tip", "reel"),
+        min_hits: int = 2,
+        max_age: float = 1.0,
+        max_cost: float = 1.5,
+        center_weight: float = 0.5,
+        capacity: int = 16,
+        metric_labels: dict | None = None,
+    ):
+        self.labels = tuple(labels)
+        self.min_hits = min_hits
+        self.max_age = max_age
+        self.max_cost = max_cost
+        self.center_weight = center_weight
+        self.kf = batch_kalman(capacity=capacity)
+        self._next_id = 1
+        self.last_ts = None
+        self.births = 0
+        self.deaths = 0
+        self._alloc(capacity)
+
+        # metric_labels: labels extra de sus metricas (p.ej. {"camera": ...})
+        labels = {**(metric_labels or {}), "target": "instances"}
+        metrics.instrument(self.kf, "predict", "kalman_seconds", "predict/update de kalman", {**labels, "op": "predict"})
+        metrics.instrument(self.kf, "update", "kalman_seconds", "predict/update de kalman", {**labels, "op": "update"})
+        metrics.gauge_for("instance_tracks_total", lambda: self.births, "tracks de instancia creados", metric_labels, kind="counter")
+
+    def _alloc(self, n: int):
+        self.ids = np.zeros(n, dtype=np.int64)
+        self.label = np.zeros(n, dtype=np.int16)
+        self.hits = np.zeros(n, dtype=np.int32)
+        self.conf = np.zeros(n, dtype=np.float32)
+        self.last_seen = np.zeros(n)
+
+    def _sync_capacity(self):
+        # batch_kalman crece solo; los arreglos paralelos lo siguen
+        n = len(self.kf.active)
+        if len(self.ids) == n:
+            return
+        old = (self.ids, self.label, self.hits, self.conf, self.last_seen)
+        m = len(old[0])
+        self._alloc(n)
+        for dst, src in zip((self.ids, self.label, self.hits, self.conf, self.last_seen), old):
+            dst[:m] = src
+
+    def predict(self, ts: float):
+        # avanza todos los tracks al ts de captura en una sola llamada
+        if self.last_ts is not None:
+            dt = ts - self.last_ts
+            if 0.0 < dt < 1.0:
+                self.kf.predict(dt)
+        self.last_ts = ts
+        # muerte: sin deteccion por mas de max_age
+        live = np.flatnonzero(self.kf.active)
+        dead = live[ts - self.last_seen[live] > self.max_age]
+        for i in dead:
+            self.kf.remove(int(i))
+        self.deaths += len(dead)
+
+    def update(self, detections, ts: float):
+        # detections: items del detector (bbox, conf, label); se asocian por etiqueta
+        dets = [d for d in detections if d.get("label") in self.labels]
+        if dets:
+            boxes = np.array([d["bbox"] for d in dets], dtype=np.float64)
+            dlab = np.array([self.labels.index(d["label"]) for d in dets], dtype=np.int16)
+            dconf = np.array([d.get("conf", 0.0) for d in dets], dtype=np.float32)
+        else:
+            boxes = np.empty((0, 4))
+            dlab = np.empty(0, dtype=np.int16)
+            dconf = np.empty(0, dtype=np.float32)
+        self.update_arrays(boxes, dlab, dconf, ts)
+
+    def update_arrays(self, boxes: np.ndarray, dlab: np.ndarray, dconf: np.ndarray, ts: float):
+        # misma asociacion sin pasar por dicts: boxes (d,4), dlab indice en self.labels, dconf (d,)
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        dlab = np.asarray(dlab, dtype=np.int16)
+        dconf = np.asarray(dconf, dtype=np.float32)
+        self.predict(ts)
+        live = np.flatnonzero(self.kf.active)
+
+        rows = cols = np.empty(0, dtype=np.intp)
+        if len(live) and len(boxes):
+            cost = association_cost(self.kf.bboxes(live), boxes, self.center_weight)
+            cost[self.label[live][:, None] != dlab[None, :]] = _inf_cost
+            rows, cols = match(cost, self.max_cost)
+
+        if len(rows):
+            slots = live[rows]
+            self.kf.update(slots, boxes[cols])
+            self.hits[slots] += 1
+            self.conf[slots] = dconf[cols]
+            self.last_seen[slots] = ts
+
+        # nacimiento: detecciones sin track
+        free = np.ones(len(boxes), dtype=bool)
+        free[cols] = False
+        for j in np.flatnonzero(free):
+            i = self.kf.add(boxes[j])
+            self._sync_capacity()
+            self.ids[i] = self._next_id
+            self._next_id += 1
+            self.label[i] = dlab[j]
+            self.hits[i] = 1
+            self.conf[i] = dconf[j]
+            self.last_seen[i] = ts
+            self.births += 1
+
+    def tracks(self, confirmed_only: bool = True):
+        live = np.flatnonzero(self.kf.active)
+        if confirmed_only:
+            live = live[self.hits[live] >= self.min_hits]
+        boxes = self.kf.bboxes(live).astype(np.int32)
+        out = []
+        for n, i in enumerate(live):
+            out.append(
+                {
+                    "id": int(self.ids[i]),
+                    "label": self.labels[self.label[i]],
+                    "bbox": tuple(boxes[n].tolist()),
+                    "conf": float(self.conf[i]),
+                    "hits": int(self.hits[i]),
+                    "age": (self.last_ts or 0.0) - float(self.last_seen[i]),
+                }
+            )
+        return out
@@ -2,11 +2,18 @@
 # tip: csrt + flujo optico lk
 # reel: kcf o mosse
 # kalman para suavizar y predecir cortos lapsos
+# el gris sale de un frame_context compartido, calculado una vez por frame
+# instancias multiples (varias maquinas o dos reels) van aparte en track_manager, solo con kalman
+
+import time
 
 import cv2
 import numpy as np
 from typing import Optional, Tuple, Dict
+from ..utils import metrics
+from .frame_context import frame_context, frame_context_builder
 from .kalman import bbox_kalman
+from .track_manager import track_manager
 
 
 def _create_tracker_csrt():
@@ -56,8 +63,27 @@ def _bbox_from_rect(r):
     return (x, y, x + w, y + h)
 
 
+def _iou(a, b) -> float:
+    ix = min(a[2], b[2]) - max(a[0], b[0])
+    iy = min(a[3], b[3]) - max(a[1], b[1])
+    if ix <= 0 or iy <= 0:
+        return 0.0
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _center_drift(a, b) -> float:
+    # distancia entre centros relativa al lado mayor de b
+    dx = (a[0] + a[2] - b[0] - b[2]) * 0.5
+    dy = (a[1] + a[3] - b[1] - b[3]) * 0.5
+    size = max(1, b[2] - b[0], b[3] - b[1])
+    return (dx * dx + dy * dy) ** 0.5 / size
+
+
 class flow_refiner:
     # refinamiento con lk dentro de la bbox para tip
+    # con ctx se reutiliza el gris ya calculado del frame en vez de convertir otra vez
     def __init__(self, max_corners=40):
         self.prev_gray = None
         self.prev_pts = None
@@ -67,7 +93,7 @@ class flow_refiner:
         self.prev_gray = None
         self.prev_pts = None
 
-    def update(self, frame, bbox: Tuple[int, int, int, int]):
+    def update(self, frame, bbox: Tuple[int, int, int, int], ctx: Optional[frame_context] = None):
         x1, y1, x2, y2 = bbox
         x1, y1 = max(0, x1), max(0, y1)
         x2, y2 = min(frame.shape[1] - 1, x2), min(frame.shape[0] - 1, y2)
@@ -75,7 +101,9 @@ class flow_refiner:
             self.reset()
             return bbox
 
-        gray = cv2.cvtColor(frame, 6)  # 6 = cv2.COLOR_BGR2GRAY
+        if ctx is None:
+            ctx = frame_context(frame)
+        gray = ctx.gray
 
         if self.prev_gray is None or self.prev_pts is None or len(self.prev_pts) < 6:
             roi = gray[y1:y2, x1:x2]
@@ -89,7 +117,6 @@ class flow_refiner:
 
         next_pts, st, err = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, self.prev_pts, None, winSize=(15, 15), maxLevel=2)
         good_new = next_pts[st == 1] if next_pts is not None else None
-        good_old = self.prev_pts[st == 1] if self.prev_pts is not None else None
 
         self.prev_gray = gray
         self.prev_pts = good_new.reshape(-1, 1, 2) if good_new is not None and len(good_new) > 0 else None
@@ -110,77 +137,287 @@ class flow_refiner:
 
 class target_tracker:
     # gestor de seguimiento por objetivo
-    def __init__(self, kind: str):
+    # fuse=True: la deteccion entra a kalman como medicion y el tracker opencv solo se recrea si
+    # se desvio (iou < min_iou o centro > max_drift), si ya fallo max_missed frames seguidos o si la
+    # confianza de la deteccion se desploma (< conf_collapse * su promedio reciente): el objetivo cambio de aspecto
+    # metric_labels: labels extra de sus metricas (p.ej. {"camera": ...} con varias camaras en un proceso)
+    def __init__(
+        self,
+        kind: str,
+        fuse: bool = True,
+        min_iou: float = 0.3,
+        max_drift: float = 0.5,
+        max_missed: int = 2,
+        conf_collapse: float = 0.5,
+        metric_labels: dict | None = None,
+    ):
         self.kind = kind  # "tip" o "reel"
+        self.fuse = fuse
+        self.min_iou = min_iou
+        self.max_drift = max_drift
+        self.max_missed = max_missed
+        self.conf_collapse = conf_collapse
         self.tracker = None
         self.kalman = bbox_kalman(dt=1/30.0)
         self.flow = flow_refiner(max_corners=40) if kind == "tip" else None
+        # mosse trabaja en gris; csrt y kcf necesitan bgr
+        self.gray_input = False
         self.bbox = None
+        # ultima caja cruda del tracker opencv (antes de kalman) para medir la deriva
+        self.raw_bbox = None
         self.ok_frames = 0
         self.missed = 0
-
-    def init(self, frame, bbox):
+        self.reinit_count = 0
+        self.reinit_time = 0.0
+        self.fused_count = 0
+        # promedio movil de la confianza de las detecciones fusionadas (0 = sin dato)
+        self.det_conf = 0.0
+        # ts de captura del ultimo predict; el dt real sale de aqui en vez de 1/30 fijo
+        self.last_ts = None
+        # ts del primer frame fallido de la racha actual (incertidumbre de un objetivo que no vuelve)
+        self.lost_ts = None
+
+        # sin efecto con las metricas apagadas
+        labels = {**(metric_labels or {}), "target": kind}
+        metrics.instrument(self, "update", "tracker_update_seconds", "update completo por objetivo (tracker + flujo + kalman)", labels)
+        metrics.instrument(self.flow, "update", "flow_refine_seconds", "refinamiento lk del tip", labels)
+        metrics.instrument(self.kalman, "predict", "kalman_seconds", "predict/update de kalman", {**labels, "op": "predict"})
+        metrics.instrument(self.kalman, "update", "kalman_seconds", "predict/update de kalman", {**labels, "op": "update"})
+        metrics.gauge_for("tracker_reinit_total", lambda: self.reinit_count, "trackers opencv recreados", labels, kind="counter")
+
+    def _input(self, frame, ctx: Optional[frame_context]):
+        if self.gray_input:
+            return ctx.gray if ctx is not None else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return frame
+
+    def init(self, frame, bbox, ctx: Optional[frame_context] = None, conf: Optional[float] = None):
+        t0 = time.perf_counter()
         self.kalman.init_from_bbox(*bbox)
         self.bbox = bbox
+        self.raw_bbox = bbox
+        self.det_conf = conf or 0.0
         self.missed = 0
+        self.lost_ts = None
         self.ok_frames = 0
         self.flow.reset() if self.flow else None
+        self.gray_input = False
         if self.kind == "tip":
             self.tracker = _create_tracker_csrt()
         else:
-            self.tracker = _create_tracker_kcf() or _create_tracker_mosse()
+            self.tracker = _create_tracker_kcf()
+            if self.tracker is None:
+                self.tracker = _create_tracker_mosse()
+                self.gray_input = self.tracker is not None
         if self.tracker is not None:
-            self.tracker.init(frame, _rect_from_bbox(bbox))
-
-    def update_with_det(self, frame, bbox):
-        self.init(frame, bbox)
-
-    def update(self, frame):
-        pred = self.kalman.predict()
+            self.tracker.init(self._input(frame, ctx), _rect_from_bbox(bbox))
+        self.reinit_count += 1
+        self.reinit_time += time.perf_counter() - t0
+
+    def needs_reinit(self, bbox, conf: Optional[float] = None) -> bool:
+        if self.tracker is None or self.raw_bbox is None or not self.kalman.inited:
+            return True
+        if self.missed >= self.max_missed:
+            return True
+        if conf is not None and self.det_conf > 0.0 and conf < self.conf_collapse * self.det_conf:
+            return True
+        return _iou(self.raw_bbox, bbox) < self.min_iou or _center_drift(self.raw_bbox, bbox) > self.max_drift
+
+    def update_with_det(self, frame, bbox, ctx: Optional[frame_context] = None, conf: Optional[float] = None):
+        if not self.fuse or self.needs_reinit(bbox, conf):
+            self.init(frame, bbox, ctx, conf)
+            return True
+        smoothed = self.kalman.update(*bbox)
+        self.bbox = smoothed if smoothed is not None else bbox
+        self.fused_count += 1
+        if conf is not None:
+            self.det_conf = conf if self.det_conf == 0.0 else 0.8 * self.det_conf + 0.2 * conf
+        return False
+
+    def fast_forward(self, bbox, age: float):
+        # desplaza una deteccion vieja con la velocidad estimada por kalman (px/s)
+        if not self.kalman.inited or age <= 0.0:
+            return bbox
+        vx = float(self.kalman.x[4, 0]) * age
+        vy = float(self.kalman.x[5, 0]) * age
+        x1, y1, x2, y2 = bbox
+        return (int(x1 + vx), int(y1 + vy), int(x2 + vx), int(y2 + vy))
+
+    @property
+    def acquired(self) -> bool:
+        # hubo al menos una deteccion de este objetivo
+        return self.bbox is not None
+
+    def uncertainty(self, stable_frames: int = 15, lost_decay: float = 5.0) -> float:
+        # 0..1: 1 sin tracker o recien perdido; baja con frames buenos y con la covarianza de posicion de kalman
+        # perdido: baja de 1 a 0 en lost_decay segundos para no detectar al maximo por algo que ya no esta
+        if self.tracker is None or self.bbox is None:
+            return 1.0
+        if self.missed > 0:
+            if self.lost_ts is None or self.last_ts is None or lost_decay <= 0:
+                return 1.0
+            return max(0.0, 1.0 - (self.last_ts - self.lost_ts) / lost_decay)
+        warmup = max(0.0, 1.0 - self.ok_frames / stable_frames)
+        sigma = float(self.kalman.p[0, 0] + self.kalman.p[1, 1]) ** 0.5
+        size = max(1, self.bbox[2] - self.bbox[0], self.bbox[3] - self.bbox[1])
+        return max(warmup, min(1.0, sigma / (0.25 * size)))
+
+    def _dt(self, ctx: Optional[frame_context]):
+        if ctx is None or not ctx.ts:
+            return None
+        dt = ctx.ts - self.last_ts if self.last_ts is not None else None
+        self.last_ts = ctx.ts
+        return dt if dt is not None and 0.0 < dt < 1.0 else None
+
+    def update(self, frame, ctx: Optional[frame_context] = None):
+        pred = self.kalman.predict(self._dt(ctx))
         if self.tracker is None:
             if pred is not None:
                 self.bbox = pred
             self.missed += 1
             return self.bbox, False
 
-        ok, rect = self.tracker.update(frame)
+        ok, rect = self.tracker.update(self._input(frame, ctx))
         if not ok:
+            if self.missed == 0:
+                self.lost_ts = self.last_ts
             self.missed += 1
             if pred is not None:
                 self.bbox = pred
             return self.bbox, False
 
         bbox = _bbox_from_rect(rect)
+        self.raw_bbox = bbox
 
         if self.flow is not None:
-            bbox = self.flow.update(frame, bbox)
+            bbox = self.flow.update(frame, bbox, ctx)
 
         smoothed = self.kalman.update(*bbox)
         self.bbox = smoothed if smoothed is not None else bbox
         self.ok_frames += 1
         self.missed = 0
+        self.lost_ts = None
         return self.bbox, True
 
 
 class multi_target_tracking:
     # administra trackers para tip y reel y fusion con detecciones
-    def __init__(self):
+    def __init__(
+        self,
+        max_det_age: float = 0.5,
+        fast_forward: bool = True,
+        fuse: bool = True,
+        instance_max_age: float = 1.0,
+        metric_labels: dict | None = None,
+    ):
         self.trackers: Dict[str, target_tracker] = {
-            "tip": target_tracker("tip"),
-            "reel": target_tracker("reel"),
+            "tip": target_tracker("tip", fuse=fuse, metric_labels=metric_labels),
+            "reel": target_tracker("reel", fuse=fuse, metric_labels=metric_labels),
         }
-
-    def update_from_detections(self, frame, state: dict):
+        # detecciones mas viejas que max_det_age (s) se ignoran; las recientes se adelantan con kalman
+        self.max_det_age = max_det_age
+        self.fast_forward = fast_forward
+        self._last_det_frame: Dict[str, int] = {}
+        self.skipped_stale = 0
+        # un contexto por frame para todos los trackers
+        self.contexts = frame_context_builder()
+        # todas las cajas del detector con ids persistentes; instance_max_age debe cubrir la cadencia del detector
+        self.instances = track_manager(labels=tuple(self.trackers), max_age=instance_max_age, metric_labels=metric_labels)
+        self._last_all_frame = None
+        # se activa cuando un objetivo seguido se pierde; lo consume el planificador de deteccion
+        self._lost = False
+        self._deaths_seen = 0
+
+    def context(self, frame, frame_id: int = 0, ts: float = 0.0) -> frame_context:
+        return self.contexts.build(frame, frame_id=frame_id, ts=ts)
+
+    def update_from_detections(self, frame, state: dict, now: Optional[float] = None, ctx: Optional[frame_context] = None):
+        if now is None:
+            now = time.time()
+        if ctx is None:
+            ctx = self.context(frame)
+        self._update_instances(state.get("all"), now, getattr(state, "dets", None))
         for k in ("tip", "reel"):
             item = state.get(k)
             if item is None:
                 continue
-            self.trackers[k].update_with_det(frame, item["bbox"])
+            # el estado del detector persiste entre frames; cada resultado se aplica una sola vez
+            frame_id = item.get("frame_id")
+            if frame_id is not None and self._last_det_frame.get(k) == frame_id:
+                continue
+            self._last_det_frame[k] = frame_id
+
+            bbox = item["bbox"]
+            ts = item.get("ts")
+            if ts is not None:
+                age = now - ts
+                if self.max_det_age > 0 and age > self.max_det_age:
+                    self.skipped_stale += 1
+                    continue
+                if self.fast_forward:
+                    bbox = self.trackers[k].fast_forward(bbox, age)
+            self.trackers[k].update_with_det(frame, bbox, ctx, item.get("conf"))
+
+    def _update_instances(self, items, now: float, dets: Optional[np.ndarray] = None):
+        if not items:
+            return
+        frame_id = items[0].get("frame_id")
+        if frame_id is not None and frame_id == self._last_all_frame:
+            return
+        self._last_all_frame = frame_id
+        ts = items[0].get("ts")
+        if ts is not None and self.max_det_age > 0 and now - ts > self.max_det_age:
+            return
+        if dets is not None and self.instances.labels == ("tip", "reel"):
+            # arreglo estructurado del detector: etiquetas ya indexadas en el mismo orden (tip, reel)
+            self.instances.update_arrays(dets["bbox"], dets["label"], dets["conf"], now)
+        else:
+            self.instances.update(items, now)
+
+    def tracks(self):
+        # tracks confirmados de todas las instancias: [{id, label, bbox, conf, hits, age}]
+        return self.instances.tracks()
 
-    def step(self, frame):
+    def step(self, frame, ctx: Optional[frame_context] = None):
+        if ctx is None:
+            ctx = self.context(frame)
+        if ctx.ts:
+            self.instances.predict(ctx.ts)
         out = {}
         for k, t in self.trackers.items():
-            bbox, ok = t.update(frame)
-            out[k] = {"bbox": bbox, "ok": ok, "missed": t.missed}
+            was_ok = t.tracker is not None and t.missed == 0
+            bbox, ok = t.update(frame, ctx)
+            if was_ok and not ok:
+                self._lost = True
+            out[k] = {"bbox": bbox, "ok": ok, "missed": t.missed, "reinit": t.reinit_count}
         return out
 
+    def uncertainty(self) -> float:
+        # la del objetivo peor seguido entre los adquiridos; la usa el planificador para decidir cuando detectar
+        # un objetivo que nunca aparecio no cuenta: sin nada adquirido es 1 y solo el presupuesto de cpu limita
+        acquired = [t.uncertainty() for t in self.trackers.values() if t.acquired]
+        return max(acquired) if acquired else 1.0
+
+    def roi_boxes(self):
+        # cajas alrededor de las cuales detectar: trackers activos e instancias confirmadas
+        boxes = [t.bbox for t in self.trackers.values() if t.bbox is not None and t.tracker is not None and t.missed == 0]
+        boxes += [tr["bbox"] for tr in self.tracks()]
+        return boxes
+
+    def take_lost(self) -> bool:
+        # True una sola vez tras perder un objetivo (tracker o instancia)
+        if self.instances.deaths != self._deaths_seen:
+            self._deaths_seen = self.instances.deaths
+            self._lost = True
+        lost, self._lost = self._lost, False
+        return lost
+
+    def stats(self) -> dict:
+        out = {"skipped_stale": self.skipped_stale}
+        out["instances"] = {"births": self.instances.births, "deaths": self.instances.deaths, "live": len(self.instances.kf)}
+        for k, t in self.trackers.items():
+            out[k] = {
+                "reinit": t.reinit_count,
+                "reinit_ms": round(t.reinit_time * 1000.0, 2),
+                "fused": t.fused_count,
+            }
+        return out
@@ -1,18 +1,34 @@
 # pantallas basadas en opencv y pillow estilo minimalista
 # soporta overlay opcional para dibujar detecciones y badges de estado
+# compositor con cache: fuentes, pantallas de texto y sprites de badges/pills/etiquetas se generan una vez
+# por (texto, estado) y luego solo se copian al frame; por frame solo se dibujan las cajas
+# show_camera_preview puede dibujar a display_fps, independiente del ritmo de analisis
+
+import functools
+import sys
+import time
+import traceback
 
 import cv2
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 
 window_name = "wirebonder monitor"
+_font_path = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+
+
+@functools.lru_cache(maxsize=8)
+def _font(size: int):
+    return ImageFont.truetype(_font_path, size)
 
 
+@functools.lru_cache(maxsize=16)
 def _render_text_canvas(title: str, subtitle: str = "", w: int = 960, h: int = 540):
+    # cacheado por argumentos: el arreglo se comparte y es de solo lectura (copiar antes de dibujar encima)
     img = Image.new("RGB", (w, h), (245, 246, 248))
     draw = ImageDraw.Draw(img)
-    font_title = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 36)
-    font_sub = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 24)
+    font_title = _font(36)
+    font_sub = _font(24)
 
     tw, th = draw.textbbox((0, 0), title, font=font_title)[2:]
     draw.text(((w - tw) // 2, h // 2 - 40), title, font=font_title, fill=(30, 30, 30))
@@ -21,26 +37,113 @@ def _render_text_canvas(title: str, subtitle: str = "", w: int = 960, h: int = 5
         sw, sh = draw.textbbox((0, 0), subtitle, font=font_sub)[2:]
         draw.text(((w - sw) // 2, h // 2 + 10), subtitle, font=font_sub, fill=(90, 90, 90))
 
-    return cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
+    canvas = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
+    canvas.flags.writeable = False
+    return canvas
+
+
+# sprites: imagen + mascara con margen para bordes gruesos; se pegan con cv2.copyTo(mascara)
+# y quedan identicos a dibujar directo porque texto y borde caen sobre el relleno opaco del propio sprite
+_margin = 2
+
+
+def _new_sprite(box_w: int, box_h: int):
+    size = (box_h + 1 + 2 * _margin, box_w + 1 + 2 * _margin)
+    return np.zeros(size + (3,), dtype=np.uint8), np.zeros(size, dtype=np.uint8)
+
+
+def _finish_sprite(img, mask):
+    img.flags.writeable = False
+    mask.flags.writeable = False
+    return img, mask
+
+
+def _blit(frame, sprite, x: int, y: int):
+    # (x, y): esquina superior izquierda de la caja; recorta contra los bordes del frame
+    img, mask = sprite
+    x0, y0 = x - _margin, y - _margin
+    h, w = img.shape[:2]
+    fx0, fy0 = max(0, x0), max(0, y0)
+    fx1, fy1 = min(frame.shape[1], x0 + w), min(frame.shape[0], y0 + h)
+    if fx1 <= fx0 or fy1 <= fy0:
+        return
+    sx, sy = fx0 - x0, fy0 - y0
+    sl = (slice(sy, sy + fy1 - fy0), slice(sx, sx + fx1 - fx0))
+    # copyTo escribe en la vista del frame; np.copyto con mascara difundida es ~100x mas lento
+    cv2.copyTo(img[sl], mask[sl], frame[fy0:fy1, fx0:fx1])
+
+
+@functools.lru_cache(maxsize=64)
+def _status_sprite(text: str):
+    (tw, th), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_DUPLEX, 0.8, 2)
+    box_w, box_h = tw + 24, th + 20
+    img, mask = _new_sprite(box_w, box_h)
+    m = _margin
+    for dst, fill, border, color in ((img, (255, 255, 255), (225, 227, 230), (60, 65, 70)), (mask, 255, 255, None)):
+        cv2.rectangle(dst, (m, m), (m + box_w, m + box_h), fill, -1)
+        cv2.rectangle(dst, (m, m), (m + box_w, m + box_h), border, 2)
+        if color is not None:
+            cv2.putText(dst, text, (m + 12, m + box_h - 10), cv2.FONT_HERSHEY_DUPLEX, 0.8, color, 2, 16)
+    return _finish_sprite(img, mask), box_h
+
+
+@functools.lru_cache(maxsize=512)
+def _label_sprite(text: str):
+    # etiqueta de deteccion "tip 0.87": a lo mas ~100 valores de confianza por objetivo
+    (tw, th), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_DUPLEX, 0.6, 2)
+    box_w, box_h = tw + 12, th + 10
+    img, mask = _new_sprite(box_w, box_h)
+    m = _margin
+    for dst, fill, border, color in ((img, (255, 255, 255), (225, 227, 230), (50, 50, 50)), (mask, 255, 255, None)):
+        cv2.rectangle(dst, (m, m), (m + box_w, m + box_h), fill, -1)
+        cv2.rectangle(dst, (m, m), (m + box_w, m + box_h), border, 1)
+        if color is not None:
+            cv2.putText(dst, text, (m + 6, m + box_h - 6), cv2.FONT_HERSHEY_DUPLEX, 0.6, color, 1, 16)
+    return _finish_sprite(img, mask), box_h
+
+
+@functools.lru_cache(maxsize=16)
+def _pill_sprite(text: str, ok: bool):
+    bg = (235, 245, 238) if ok else (245, 236, 236)
+    bd = (180, 230, 190) if ok else (232, 196, 196)
+    fg = (40, 120, 60) if ok else (140, 70, 70)
+    (tw, th), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_DUPLEX, 0.6, 2)
+    box_w, box_h = tw + 24, th + 14
+    img, mask = _new_sprite(box_w, box_h)
+    m = _margin
+    for dst, fill, border, color in ((img, bg, bd, fg), (mask, 255, 255, None)):
+        cv2.rectangle(dst, (m, m), (m + box_w, m + box_h), fill, -1)
+        cv2.rectangle(dst, (m, m), (m + box_w, m + box_h), border, 2)
+        if color is not None:
+            cv2.putText(dst, text, (m + 12, m + th + 2), cv2.FONT_HERSHEY_DUPLEX, 0.6, color, 1, 16)
+    return _finish_sprite(img, mask)
 
 
-def show_waiting_for_camera():
-    canvas = _render_text_canvas(
-        title="buscando camara usb...",
-        subtitle="conecta una camara; si se detecta, esta pantalla cambiara sola"
-    )
+def close_windows():
+    # cierra las ventanas de este proceso; el waitKey procesa el cierre (si no, highgui deja la ventana congelada)
+    cv2.destroyAllWindows()
+    cv2.waitKey(1)
+
+
+def show_waiting_for_camera(
+    title: str = "buscando camara usb...",
+    subtitle: str = "conecta una camara; si se detecta, esta pantalla cambiara sola",
+    wait_ms: int = 250,
+):
+    canvas = _render_text_canvas(title=title, subtitle=subtitle)
     cv2.imshow(window_name, canvas)
-    cv2.waitKey(250)
+    return cv2.waitKey(wait_ms) & 0xff
 
 
 def show_error_retry(error_text: str, instructions: str = "pulsa r para reintentar, q para salir"):
+    # la pantalla no cambia mientras se espera la tecla: se arma una sola vez
     action_text = instructions
+    canvas = _render_text_canvas(title="error", subtitle=error_text).copy()
+    (tw, th), _ = cv2.getTextSize(action_text, cv2.FONT_HERSHEY_DUPLEX, 0.9, 2)
+    ax = (canvas.shape[1] - tw) // 2
+    ay = (canvas.shape[0] // 2) + 80
+    cv2.putText(canvas, action_text, (ax, ay), cv2.FONT_HERSHEY_DUPLEX, 0.9, (20, 120, 255), 2, 16)
     while 1:
-        canvas = _render_text_canvas(title="error", subtitle=error_text)
-        (tw, th), _ = cv2.getTextSize(action_text, cv2.FONT_HERSHEY_DUPLEX, 0.9, 2)
-        ax = (canvas.shape[1] - tw) // 2
-        ay = (canvas.shape[0] // 2) + 80
-        cv2.putText(canvas, action_text, (ax, ay), cv2.FONT_HERSHEY_DUPLEX, 0.9, (20, 120, 255), 2, 16)
         cv2.imshow(window_name, canvas)
         k = cv2.waitKey(120) & 0xff
         if k in (ord("r"),):
@@ -49,33 +152,78 @@ def show_error_retry(error_text: str, instructions: str = "pulsa r para reintent
             return "quit"
 
 
-def show_camera_preview(cap, overlay_text: str = "esperando objetivo... (q para salir)", overlay_fn=None):
-    badge_bg = (255, 255, 255)
-    badge_border = (225, 227, 230)
-    badge_text = (60, 65, 70)
+def draw_status_badge(frame, text: str, bottom: bool = False):
+    pad = 16
+    sprite, box_h = _status_sprite(text)
+    y = frame.shape[0] - pad - box_h if bottom else pad
+    _blit(frame, sprite, pad, y)
+
+
+_reported = set()
+
 
+def _report_error(stage: str):
+    # el preview no se cae por un frame malo, pero cada error se imprime una vez con su traceback;
+    # la llave es el tipo y la linea donde ocurrio, no el mensaje (que puede cambiar en cada frame)
+    etype, _, tb = sys.exc_info()
+    last = traceback.extract_tb(tb)[-1] if tb is not None else None
+    key = (stage, etype, last.filename if last else "", last.lineno if last else 0)
+    if key in _reported:
+        return
+    _reported.add(key)
+    print(f"[preview] error en {stage} (se omiten repeticiones):", file=sys.stderr)
+    traceback.print_exc()
+
+
+def show_camera_preview(
+    cap,
+    overlay_text: str = "esperando objetivo... (q para salir)",
+    overlay_fn=None,
+    pipeline=None,
+    analyze_fn=None,
+    display_fps: float = 0.0,
+):
+    # con pipeline (core.frame_pipeline) overlay_fn recibe (frame_pantalla, frame_analisis);
+    # el de analisis queda sin badge ni padding para detector y trackers
+    # overlay_text puede ser una funcion sin argumentos para un badge que cambia (p. ej. mientras carga el modelo)
+    # analyze_fn(frame_analisis) corre en cada frame; el frame de pantalla, overlay_fn e imshow solo
+    # cada 1/display_fps segundos (0 = cada frame), asi el dibujo no le quita cpu al tracking
+    interval = 1.0 / display_fps if display_fps > 0 else 0.0
+    next_render = 0.0
     while 1:
-        ok, frame = cap.read()
+        ok, raw = cap.read()
         if not ok:
             return "back"
 
-        frame = _resize_keep_ratio(frame, target_w=960, target_h=540)
+        analysis = pipeline.analysis(raw) if pipeline is not None else None
+        if analyze_fn is not None:
+            try:
+                analyze_fn(analysis)
+            except Exception:
+                _report_error("analisis")
+        if interval:
+            now = time.monotonic()
+            if now < next_render:
+                continue
+            next_render = now + interval
+
+        if pipeline is not None:
+            frame = pipeline.display(raw)
+        else:
+            frame = _resize_keep_ratio(raw, target_w=960, target_h=540)
 
         # badge superior
-        pad = 16
-        (tw, th), _ = cv2.getTextSize(overlay_text, cv2.FONT_HERSHEY_DUPLEX, 0.8, 2)
-        box_w = tw + 24
-        box_h = th + 20
-        cv2.rectangle(frame, (pad, pad), (pad + box_w, pad + box_h), badge_bg, -1)
-        cv2.rectangle(frame, (pad, pad), (pad + box_w, pad + box_h), badge_border, 2)
-        cv2.putText(frame, overlay_text, (pad + 12, pad + box_h - 10), cv2.FONT_HERSHEY_DUPLEX, 0.8, badge_text, 2, 16)
+        draw_status_badge(frame, overlay_text() if callable(overlay_text) else overlay_text)
 
         # overlay de deteccion (opcional)
         if overlay_fn is not None:
             try:
-                overlay_fn(frame)
+                if pipeline is not None:
+                    overlay_fn(frame, analysis)
+                else:
+                    overlay_fn(frame)
             except Exception:
-                pass
+                _report_error("overlay")
 
         cv2.imshow(window_name, frame)
         k = cv2.waitKey(1) & 0xff
@@ -98,11 +246,8 @@ def draw_detection_overlay(frame, state: dict, conf_min: float = 0.25):
         x2 = max(0, min(w - 1, x2))
         y2 = max(0, min(h - 1, y2))
         cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-        txt = f"{label} {item['conf']:.2f}"
-        (tw, th), _ = cv2.getTextSize(txt, cv2.FONT_HERSHEY_DUPLEX, 0.6, 2)
-        cv2.rectangle(frame, (x1, max(0, y1 - th - 10)), (x1 + tw + 12, y1), (255, 255, 255), -1)
-        cv2.rectangle(frame, (x1, max(0, y1 - th - 10)), (x1 + tw + 12, y1), (225, 227, 230), 1)
-        cv2.putText(frame, txt, (x1 + 6, y1 - 6), cv2.FONT_HERSHEY_DUPLEX, 0.6, (50, 50, 50), 1, 16)
+        sprite, box_h = _label_sprite(f"{label} {item['conf']:.2f}")
+        _blit(frame, sprite, x1, y1 - box_h)
 
     _box(state.get("reel"), (80, 200, 120), "reel")
     _box(state.get("tip"), (80, 120, 220), "tip")
@@ -112,17 +257,8 @@ def draw_detection_overlay(frame, state: dict, conf_min: float = 0.25):
     reel_ok = state.get("reel") is not None and state["reel"]["conf"] >= conf_min
     tip_ok = state.get("tip") is not None and state["tip"]["conf"] >= conf_min
 
-    def _pill(y, txt, ok):
-        bg = (235, 245, 238) if ok else (245, 236, 236)
-        bd = (180, 230, 190) if ok else (232, 196, 196)
-        fg = (40, 120, 60) if ok else (140, 70, 70)
-        (tw, th), _ = cv2.getTextSize(txt, cv2.FONT_HERSHEY_DUPLEX, 0.6, 2)
-        cv2.rectangle(frame, (x0, y), (x0 + tw + 24, y + th + 14), bg, -1)
-        cv2.rectangle(frame, (x0, y), (x0 + tw + 24, y + th + 14), bd, 2)
-        cv2.putText(frame, txt, (x0 + 12, y + th + 2), cv2.FONT_HERSHEY_DUPLEX, 0.6, fg, 1, 16)
-
-    _pill(y0, "reel", reel_ok)
-    _pill(y0 + 40, "tip", tip_ok)
+    _blit(frame, _pill_sprite("reel", reel_ok), x0, y0)
+    _blit(frame, _pill_sprite("tip", tip_ok), x0, y0 + 40)
 
 
 def _resize_keep_ratio(img, target_w=960, target_h=540):
@@ -153,10 +289,24 @@ def draw_tracking_overlay(frame, tracking_state: dict):
         x2 = max(0, min(w - 1, x2))
         y2 = max(0, min(h - 1, y2))
         cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-        (tw, th), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_DUPLEX, 0.6, 1)
         cv2.putText(frame, label, (x1, max(0, y1 - 6)), cv2.FONT_HERSHEY_DUPLEX, 0.6, color, 1, 16)
 
     tip = tracking_state.get("tip", {})
     reel = tracking_state.get("reel", {})
     _draw(tip.get("bbox"), color_tip, "tip")
     _draw(reel.get("bbox"), color_reel, "reel")
+
+
+def draw_instance_overlay(frame, tracks):
+    # tracks del track_manager: caja delgada con su id persistente
+    colors = {"tip": (60, 200, 255), "reel": (120, 220, 120)}
+    h, w = frame.shape[:2]
+    for t in tracks:
+        x1, y1, x2, y2 = t["bbox"]
+        x1 = max(0, min(w - 1, x1))
+        y1 = max(0, min(h - 1, y1))
+        x2 = max(0, min(w - 1, x2))
+        y2 = max(0, min(h - 1, y2))
+        color = colors.get(t["label"], (200, 200, 200))
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 1)
+        cv2.putText(frame, f"#{t['id']}", (x1 + 4, min(h - 4, y2 + 16)), cv2.FONT_HERSHEY_DUPLEX, 0.5, color, 1, 16)
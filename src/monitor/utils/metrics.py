@@ -0,0 +1,275 @@
+# metricas del camino caliente: tramos con reloj monotono en histogramas de cubetas fijas y contadores
+# apagado (por defecto) cuesta cero: timed()/instrument() dejan la funcion original sin envoltura
+# y histogram_for() regresa None, asi que el codigo instrumentado solo compara con None
+# encendido: dos perf_counter y un bisect por tramo
+# exposicion: /metrics en texto prometheus (--metrics-port) y una linea de resumen periodica en stderr (--metrics-log)
+#
+#   metrics.enable(port=9100, log_every=30.0)     # antes de crear detector y trackers
+#   metrics.instrument(obj, "update", "tracker_update_seconds", labels={"target": "tip"})
+#   metrics.gauge_for("detector_dropped_total", lambda: det.dropped, kind="counter")
+
+import bisect
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# segundos; de 100us a 1s cubre desde un kalman hasta una inferencia lenta en la pi
+default_buckets = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+_registry = None
+
+
+def _quote(v) -> str:
+    return '"%s"' % v
+
+
+def _label_text(labels: dict, extra: str = "") -> str:
+    parts = [f"{k}={_quote(v)}" for k, v in labels.items()]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class histogram:
+    # cubetas fijas (limite superior inclusivo, como "le" de prometheus) + una de desborde
+    # un solo hilo escribe cada histograma; el lector tolera una cuenta desfasada por uno
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str = "", labels: dict | None = None, buckets=default_buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float):
+        self.counts[bisect.bisect_left(self.buckets, v)] += 1
+        self.sum += v
+        self.count += 1
+
+    def quantile(self, q: float, counts=None) -> float:
+        # aproximado al limite superior de la cubeta; suficiente para ver colas
+        counts = self.counts if counts is None else counts
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = q * total
+        acc = 0
+        for i, c in enumerate(counts):
+            acc += c
+            if acc >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def render(self):
+        acc = 0
+        for le, c in zip(self.buckets, self.counts):
+            acc += c
+            yield f"{self.name}_bucket{_label_text(self.labels, 'le=%s' % _quote(le))} {acc}"
+        yield f"{self.name}_bucket{_label_text(self.labels, 'le=%s' % _quote('+Inf'))} {self.count}"
+        yield f"{self.name}_sum{_label_text(self.labels)} {self.sum:.6f}"
+        yield f"{self.name}_count{_label_text(self.labels)} {self.count}"
+
+
+class counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str = "", labels: dict | None = None):
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.value = 0
+
+    def inc(self, n: int = 1):
+        self.value += n
+
+    def read(self):
+        return self.value
+
+    def render(self):
+        yield f"{self.name}{_label_text(self.labels)} {self.read()}"
+
+
+class gauge(counter):
+    # valor leido con una funcion al exportar; sin costo en el bucle
+    # kind="counter" para contadores que ya existen en otros objetos (drops, re-inits)
+    def __init__(self, name: str, fn, help: str = "", labels: dict | None = None, kind: str = "gauge"):
+        super().__init__(name, help, labels)
+        self.fn = fn
+        self.kind = kind
+
+    def read(self):
+        try:
+            return self.fn()
+        except Exception:
+            return float("nan")
+
+
+class registry:
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+        self._last = {}
+        self._last_t = time.monotonic()
+
+    def _get(self, cls, name, labels, *args, **kwargs):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            m = self.metrics.get(key)
+            if m is None:
+                m = self.metrics[key] = cls(name, *args, labels=labels, **kwargs)
+        return m
+
+    def render(self) -> str:
+        # texto de exposicion prometheus 0.0.4; HELP/TYPE una vez por nombre
+        with self._lock:
+            items = sorted(self.metrics.values(), key=lambda m: m.name)
+        lines = []
+        seen = set()
+        for m in items:
+            if m.name not in seen:
+                seen.add(m.name)
+                if m.help:
+                    lines.append(f"# HELP {m.name} {m.help}")
+                lines.append(f"# TYPE {m.name} {m.kind}")
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        # una linea con lo ocurrido desde la linea anterior: n, p50 y p99 (ms) por tramo y deltas de contadores
+        now = time.monotonic()
+        span, self._last_t = now - self._last_t, now
+        with self._lock:
+            items = list(self.metrics.items())
+        parts = []
+        for key, m in items:
+            name = m.name + _label_text(m.labels).replace('"', "")
+            if isinstance(m, histogram):
+                counts = list(m.counts)
+                prev = self._last.get(key) or [0] * len(counts)
+                self._last[key] = counts
+                delta = [a - b for a, b in zip(counts, prev)]
+                n = sum(delta)
+                if n:
+                    parts.append(f"{name} n={n} p50={m.quantile(0.5, delta) * 1e3:g}ms p99={m.quantile(0.99, delta) * 1e3:g}ms")
+            else:
+                v = m.read()
+                prev = self._last.get(key, 0)
+                self._last[key] = v
+                if m.kind == "counter" and v != prev:
+                    parts.append(f"{name} +{v - prev}")
+        return f"[metrics] {span:.0f}s " + (" | ".join(parts) if parts else "sin actividad")
+
+
+class _server:
+    def __init__(self, reg: registry, port: int, host: str = "127.0.0.1"):
+        class _handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = reg.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._srv = ThreadingHTTPServer((host, port), _handler)
+        self._srv.daemon_threads = True
+        self._thr = threading.Thread(target=self._srv.serve_forever, daemon=True)
+        self._thr.start()
+
+    def close(self):
+        self._srv.shutdown()
+        self._srv.server_close()
+
+
+class _reporter:
+    def __init__(self, reg: registry, every: float):
+        self._stop = threading.Event()
+        self._thr = threading.Thread(target=self._run, args=(reg, every), daemon=True)
+        self._thr.start()
+
+    def _run(self, reg, every):
+        while not self._stop.wait(every):
+            print(reg.summary(), file=sys.stderr, flush=True)
+
+    def close(self):
+        self._stop.set()
+
+
+_services = []
+
+
+def enable(port: int = 0, log_every: float = 0.0, host: str = "127.0.0.1") -> registry:
+    # debe llamarse antes de crear los objetos instrumentados: deciden envolver o no al construirse
+    global _registry
+    if _registry is None:
+        _registry = registry()
+    if port:
+        _services.append(_server(_registry, port, host))
+    if log_every > 0:
+        _services.append(_reporter(_registry, log_every))
+    return _registry
+
+
+def close():
+    while _services:
+        _services.pop().close()
+
+
+def enabled() -> bool:
+    return _registry is not None
+
+
+def histogram_for(name: str, help: str = "", labels: dict | None = None, buckets=default_buckets):
+    if _registry is None:
+        return None
+    return _registry._get(histogram, name, labels, help, buckets=buckets)
+
+
+def counter_for(name: str, help: str = "", labels: dict | None = None):
+    if _registry is None:
+        return None
+    return _registry._get(counter, name, labels, help)
+
+
+def gauge_for(name: str, fn, help: str = "", labels: dict | None = None, kind: str = "gauge"):
+    # con el mismo nombre y labels gana la ultima funcion (p.ej. la captura nueva tras reabrir la camara)
+    if _registry is None:
+        return None
+    g = _registry._get(gauge, name, labels, fn, help, kind=kind)
+    g.fn = fn
+    return g
+
+
+def timed(fn, name: str, help: str = "", labels: dict | None = None):
+    # regresa fn tal cual si las metricas estan apagadas
+    h = histogram_for(name, help, labels)
+    if h is None:
+        return fn
+    clock = time.perf_counter
+
+    def wrapper(*args, **kwargs):
+        t0 = clock()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            h.observe(clock() - t0)
+
+    wrapper.__wrapped__ = fn
+    return wrapper
+
+
+def instrument(obj, attr: str, name: str, help: str = "", labels: dict | None = None):
+    # reemplaza el metodo en la instancia (no en la clase) por su version medida
+    if _registry is not None and obj is not None:
+        setattr(obj, attr, timed(getattr(obj, attr), name, help, labels))
+    return obj
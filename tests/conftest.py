@@ -0,0 +1,6 @@
+# los modulos viven en src/ (como PYTHONPATH=src en scripts/run.sh)
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
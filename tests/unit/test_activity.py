@@ -0,0 +1,108 @@
+# activity_engine: transiciones IDLE/ACTIVE/FAULT con histeresis y permanencia
+
+import math
+
+import numpy as np
+
+from monitor.tracking.activity import activity_engine, rolling_window, state_active, state_fault, state_idle
+from monitor.tracking.frame_context import frame_context
+
+fps = 30.0
+
+
+def _tip(y, ok=True):
+    return {"tip": {"bbox": (100, y, 140, y + 40), "ok": ok}, "reel": None}
+
+
+def _feed(eng, seconds, y_of, t0=0.0, ok=True):
+    out = []
+    for k in range(int(seconds * fps)):
+        ts = t0 + k / fps
+        tr = eng.update(ts, _tip(y_of(ts), ok))
+        if tr is not None:
+            out.append(tr)
+    return out
+
+
+def _bonding(ts):
+    # tip subiendo y bajando 20 px a 2 hz
+    return int(round(200 + 20 * math.sin(2 * math.pi * 2.0 * ts)))
+
+
+def _still(ts):
+    return 200
+
+
+def test_rolling_window_stats():
+    w = rolling_window(4)
+    for v in (1.0, 2.0, 3.0, 4.0, 5.0, 6.0):
+        w.push(v)
+    assert w.n == 4 and w.mean == 4.5
+    assert abs(w.var - 1.25) < 1e-12
+
+
+def test_idle_to_active_and_back():
+    eng = activity_engine(fps=fps)
+    assert _feed(eng, 5.0, _still) == []
+    assert eng.state == state_idle
+
+    (on,) = _feed(eng, 5.0, _bonding, t0=5.0)
+    assert (on["prev"], on["state"]) == (state_idle, state_active)
+    assert on["features"]["osc_hz"] > eng.osc_min_hz
+    # la permanencia retrasa la entrada al menos dwell segundos desde que se cumplen los umbrales
+    assert on["ts"] >= 5.0 + eng.dwell
+
+    (off,) = _feed(eng, 6.0, _still, t0=10.0)
+    assert (off["prev"], off["state"]) == (state_active, state_idle)
+    assert off["prev_duration"] == off["ts"] - on["ts"]
+    assert eng.transitions == 2
+
+
+def _drift(ts):
+    # 1 px cada medio segundo en un solo sentido: energia entre energy_off y energy_on, sin oscilacion
+    return 200 + int(ts * 2.0)
+
+
+def test_hysteresis_keeps_active_on_slow_drift():
+    idle = activity_engine(fps=fps)
+    assert _feed(idle, 6.0, _drift) == []
+    assert idle.energy_off < idle.features()["energy"] < idle.energy_on
+
+    eng = activity_engine(fps=fps)
+    _feed(eng, 5.0, _bonding)
+    assert eng.state == state_active
+    # el mismo movimiento que no basta para entrar no basta para salir
+    assert _feed(eng, 6.0, _drift, t0=5.0) == []
+    assert eng.state == state_active
+
+
+def test_fault_when_tip_missing():
+    eng = activity_engine(fps=fps, fault_after=2.0)
+    _feed(eng, 1.0, _still)
+    (tr,) = _feed(eng, 3.0, _still, t0=1.0, ok=False)
+    assert tr["state"] == state_fault
+    # fault entra en cuanto vence fault_after, sin permanencia extra
+    assert abs(tr["ts"] - (1.0 - 1 / fps + 2.0)) < 1.5 / fps
+    (back,) = _feed(eng, 3.0, _still, t0=4.0)
+    assert (back["prev"], back["state"]) == (state_fault, state_idle)
+
+
+def test_logged_reel_change_reproduces_live():
+    rng = np.random.default_rng(1)
+    live, offline = activity_engine(fps=fps), activity_engine(fps=fps)
+    trk = {"tip": _tip(200)["tip"], "reel": {"bbox": (200, 40, 280, 120), "ok": True}}
+    got, want = [], []
+    for k in range(int(8 * fps)):
+        ts = k / fps
+        img = np.full((240, 320, 3), 60, dtype=np.uint8)
+        # el reel cambia de imagen solo en la segunda mitad
+        if ts >= 4.0:
+            img[40:120, 200:280] = rng.integers(0, 256, 3, dtype=np.uint8)
+        tr = live.update(ts, trk, frame_context(img, ts=ts))
+        if tr is not None:
+            want.append(tr)
+        tr = offline.update(ts, trk, reel_change=live.reel_change)
+        if tr is not None:
+            got.append(tr)
+    assert [t["state"] for t in want] == [state_active]
+    assert got == want
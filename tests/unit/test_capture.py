@@ -0,0 +1,63 @@
+# camera_capture: un fallo de grab o de retrieve pasa por reopen en vez de terminar la captura
+
+import numpy as np
+
+from monitor.devices.capture import camera_capture
+
+
+class _fake_cap:
+    # fail_grab / fail_retrieve: numero de lectura (desde 1) que falla
+    def __init__(self, value=1, fail_grab=0, fail_retrieve=0):
+        self.value = value
+        self.fail_grab = fail_grab
+        self.fail_retrieve = fail_retrieve
+        self.n = 0
+        self.released = False
+
+    def grab(self):
+        self.n += 1
+        return self.n != self.fail_grab
+
+    def retrieve(self, buf=None):
+        if self.n == self.fail_retrieve:
+            return False, None
+        img = np.full((4, 6, 3), self.value, dtype=np.uint8)
+        if buf is not None:
+            np.copyto(buf, img)
+            return True, buf
+        return True, img
+
+    def isOpened(self):
+        return True
+
+    def release(self):
+        self.released = True
+
+
+def _read_value(cap, want):
+    for _ in range(50):
+        ok, frame = cap.read(timeout=0.1)
+        if ok and frame[0, 0, 0] == want:
+            return True
+    return False
+
+
+def test_retrieve_failure_reconnects():
+    for kwargs in ({"fail_retrieve": 1}, {"fail_retrieve": 3}, {"fail_grab": 3}):
+        first = _fake_cap(value=1, **kwargs)
+        cap = camera_capture(first, reopen=lambda: _fake_cap(value=2)).start()
+        try:
+            assert _read_value(cap, 2), kwargs
+            assert cap.reconnects == 1 and first.released
+            assert not cap.failed.is_set()
+        finally:
+            cap.release()
+
+
+def test_retrieve_failure_without_reopen_fails():
+    cap = camera_capture(_fake_cap(fail_retrieve=3)).start()
+    try:
+        assert cap.failed.wait(2.0)
+        assert cap.reconnects == 0
+    finally:
+        cap.release()
@@ -0,0 +1,75 @@
+# clip_recorder: el clip lleva pre_roll segundos del anillo antes del trigger y post_roll despues
+
+import json
+
+import numpy as np
+
+from monitor.io.clip_recorder import clip_recorder
+
+
+def _push(rec, t0, t1, fps=30.0):
+    img = np.zeros((120, 160, 3), dtype=np.uint8)
+    k = 0
+    while t0 + k / fps < t1 - 1e-9:
+        ts = t0 + k / fps
+        img[...] = int(ts * 10) % 256
+        rec.push(img, ts)
+        k += 1
+
+
+def test_pre_roll_and_post_roll(tmp_path):
+    rec = clip_recorder(str(tmp_path), fps=10.0, pre_roll=1.0, post_roll=1.0, min_gap=0.0)
+    _push(rec, 0.0, 5.0)
+    assert rec.trigger("tip_lost", 5.0)
+    assert rec.recording
+    _push(rec, 5.0, 8.0)
+    assert not rec.recording
+    rec.close()
+    (clip,) = rec.poll()
+    assert clip["reasons"] == ["tip_lost"]
+    # 10 frames del anillo antes del trigger + 1 s despues
+    assert abs(clip["ts"] - 4.0) < 0.11
+    assert abs(clip["end_ts"] - 6.0) < 0.11
+    assert 19 <= clip["frames"] <= 21 and clip["dropped"] == 0
+    with open(clip["path"].rsplit(".", 1)[0] + ".json") as f:
+        assert json.load(f)["frames"] == clip["frames"]
+
+
+def test_ring_is_bounded_by_memory(tmp_path):
+    rec = clip_recorder(str(tmp_path), fps=10.0, pre_roll=30.0, post_roll=5.0, max_mb=0.5)
+    _push(rec, 0.0, 1.0)
+    per_frame = 120 * 160 * 3
+    assert rec._ring.shape[0] == (1 << 19) // per_frame
+    assert rec._pre_n == rec._ring.shape[0] - 1
+    rec.close()
+
+
+def test_trigger_extends_and_min_gap_suppresses(tmp_path):
+    rec = clip_recorder(str(tmp_path), fps=10.0, pre_roll=0.5, post_roll=1.0, min_gap=5.0)
+    # sin frames todavia no hay anillo
+    assert not rec.trigger("early", 0.0)
+    _push(rec, 0.0, 2.0)
+    assert rec.trigger("tip_lost", 2.0)
+    _push(rec, 2.0, 2.5)
+    assert rec.trigger("fault", 2.5)
+    assert rec._active.end_ts == 3.5
+    _push(rec, 2.5, 4.0)
+    assert not rec.recording
+    # dentro de min_gap desde el fin del clip anterior
+    assert not rec.trigger("tip_lost", 4.0)
+    assert rec.suppressed == 1
+    rec.close()
+    (clip,) = rec.poll()
+    # el clip extendido ya no cabe en el anillo: lo que el codificador no alcanzo se descarta, no se espera
+    assert clip["reasons"] == ["tip_lost", "fault"]
+    assert clip["frames"] + clip["dropped"] >= 20
+
+
+def test_wide_frames_are_scaled_into_ring(tmp_path):
+    rec = clip_recorder(str(tmp_path), width=80)
+    _push(rec, 0.0, 0.2)
+    assert rec._ring.shape[1:] == (60, 80, 3)
+    assert rec.scale == 0.5
+    state = {"tip": {"bbox": (100, 50, 120, 70), "ok": True}, "reel": None}
+    assert rec._scaled(state)["tip"]["bbox"] == (50, 25, 60, 35)
+    rec.close()
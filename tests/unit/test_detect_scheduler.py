@@ -0,0 +1,69 @@
+# detect_scheduler: intervalo segun incertidumbre, piso por presupuesto de cpu y detector ocupado
+
+import pytest
+
+from monitor.core.detect_scheduler import detect_scheduler, roi_planner
+
+
+def _count(s, uncertainty, seconds=10.0, fps=30.0, latency=0.0):
+    # detecciones en seconds de video; el intervalo se redondea al frame, de ahi los rangos en las pruebas
+    n = 0
+    for k in range(int(seconds * fps)):
+        n += s.should_detect(k / fps, uncertainty, latency=latency)
+    return n
+
+
+def test_interval_interpolates_with_uncertainty():
+    s = detect_scheduler(min_interval=0.1, max_interval=1.0, cpu_budget=0.0)
+    for u, want in ((1.0, 0.1), (0.0, 1.0), (0.5, 0.55), (2.0, 0.1), (-1.0, 1.0)):
+        s.should_detect(0.0, u)
+        assert s.interval == pytest.approx(want)
+
+
+def test_rate_follows_interval():
+    assert 75 <= _count(detect_scheduler(min_interval=0.1, max_interval=1.0, cpu_budget=0.0), 1.0) <= 100
+    assert 9 <= _count(detect_scheduler(min_interval=0.1, max_interval=1.0, cpu_budget=0.0), 0.0) <= 10
+
+
+def test_cpu_budget_floors_interval():
+    s = detect_scheduler(min_interval=0.05, max_interval=1.0, cpu_budget=0.5)
+    # 100 ms de inferencia con medio nucleo: como mucho una cada 200 ms aunque todo este perdido
+    s.should_detect(0.0, 1.0, latency=0.1)
+    assert s.interval == pytest.approx(0.2)
+    assert _count(detect_scheduler(min_interval=0.05, max_interval=1.0, cpu_budget=0.5), 1.0, latency=0.1) in range(42, 51)
+    # el piso no baja un intervalo que ya es mayor
+    s.should_detect(1.0, 0.0, latency=0.1)
+    assert s.interval == pytest.approx(1.0)
+
+
+def test_busy_detector_defers():
+    s = detect_scheduler(min_interval=0.1, max_interval=1.0, cpu_budget=0.0)
+    assert not s.should_detect(0.0, 1.0, busy=True)
+    assert s.triggers == 0
+    assert s.should_detect(0.01, 1.0)
+    assert not s.should_detect(0.05, 1.0)
+    assert s.should_detect(0.11, 1.0)
+    assert s.triggers == 2
+
+
+def test_clock_jump_back_does_not_stall():
+    s = detect_scheduler(min_interval=0.1, max_interval=1.0, cpu_budget=0.0)
+    assert s.should_detect(100.0, 0.0)
+    # ts hacia atras (reinicio de la camara): se detecta de inmediato en vez de esperar 100 s
+    assert s.should_detect(1.0, 0.0)
+
+
+def test_roi_planner_sweeps():
+    p = roi_planner(full_every=1.0, pad=0.5, min_size=64, quant=32)
+    shape = (480, 640)
+    box = (300, 200, 340, 240)
+    assert p.plan(shape, [box], 0.0) is None
+    (roi,) = p.plan(shape, [box], 0.1)
+    assert roi[2] - roi[0] == roi[3] - roi[1] == 96
+    assert roi[0] <= box[0] and roi[1] <= box[1] and roi[2] >= box[2] and roi[3] >= box[3]
+    # perder un track o vencer full_every fuerza barrido completo
+    assert p.plan(shape, [box], 0.2, lost=True) is None
+    assert p.plan(shape, [box], 0.5) is not None
+    assert p.plan(shape, [box], 1.2) is None
+    assert p.plan(shape, [], 1.3) is None
+    assert (p.full_sweeps, p.roi_sweeps) == (4, 2)
@@ -0,0 +1,114 @@
+# build_detections / best_per_label contra el bucle por caja que reemplazaron
+
+import numpy as np
+import pytest
+
+from monitor.models.detector_yolo import (
+    best_per_label,
+    build_detections,
+    build_target_state,
+    det_dtype,
+    detection_state,
+    target_lut,
+)
+
+id_to_name = {0: "bonder_tip", 1: "gold_reel", 2: "other"}
+target_ids = {"tip": {0}, "reel": {1}}
+
+
+def _reference_state(out, meta, frame_id, ts, target_ids):
+    # bucle original de build_target_state: una caja a la vez, reel gana si la clase cae en ambos
+    state = {"reel": None, "tip": None, "all": []}
+    if out is None:
+        return state
+    xyxy, cls, conf = out
+    for i in range(len(xyxy)):
+        cid = int(cls[i])
+        if cid in target_ids.get("reel", set()):
+            label = "reel"
+        elif cid in target_ids.get("tip", set()):
+            label = "tip"
+        else:
+            continue
+        x1, y1, x2, y2 = xyxy[i]
+        x1 = (x1 - meta["x0"]) / meta["scale"]
+        y1 = (y1 - meta["y0"]) / meta["scale"]
+        x2 = (x2 - meta["x0"]) / meta["scale"]
+        y2 = (y2 - meta["y0"]) / meta["scale"]
+        x1 = max(0, min(meta["orig_w"] - 1, x1))
+        y1 = max(0, min(meta["orig_h"] - 1, y1))
+        x2 = max(0, min(meta["orig_w"] - 1, x2))
+        y2 = max(0, min(meta["orig_h"] - 1, y2))
+        item = {"bbox": (int(x1), int(y1), int(x2), int(y2)), "conf": float(conf[i]), "label": label}
+        state["all"].append(item)
+        prev = state[label]
+        if prev is None or item["conf"] > prev["conf"]:
+            state[label] = item
+    return state
+
+
+def _random_case(rng):
+    n = int(rng.integers(0, 12))
+    orig_w, orig_h = int(rng.choice([640, 1280])), int(rng.choice([480, 720]))
+    imgsz = 416
+    scale = min(imgsz / orig_w, imgsz / orig_h)
+    meta = {
+        "x0": (imgsz - int(orig_w * scale)) // 2,
+        "y0": (imgsz - int(orig_h * scale)) // 2,
+        "scale": scale,
+        "orig_w": orig_w,
+        "orig_h": orig_h,
+    }
+    # cajas que a veces se salen del letterbox para ejercitar el recorte
+    xy = rng.uniform(-20, imgsz, (n, 2)).astype(np.float32)
+    wh = rng.uniform(1, 120, (n, 2)).astype(np.float32)
+    xyxy = np.hstack([xy, xy + wh])
+    cls = rng.integers(0, 3, n)
+    # confianzas redondeadas: empates frecuentes, gana la primera como en el bucle
+    conf = rng.uniform(0.2, 1.0, n).round(1).astype(np.float32)
+    return (xyxy, cls, conf), meta
+
+
+def _items(state):
+    return {k: state[k] and (state[k]["bbox"], state[k]["conf"], state[k]["label"]) for k in ("tip", "reel")}
+
+
+def test_matches_per_box_loop():
+    rng = np.random.default_rng(22)
+    lut = target_lut(id_to_name, target_ids)
+    for _ in range(500):
+        out, meta = _random_case(rng)
+        ref = _reference_state(out, meta, 7, 1.5, target_ids)
+        dets = build_detections(out, meta, 7, 1.5, lut)
+        assert [tuple(b) for b in dets["bbox"].tolist()] == [it["bbox"] for it in ref["all"]]
+        np.testing.assert_array_equal(dets["conf"], [it["conf"] for it in ref["all"]])
+
+        st = detection_state(dets)
+        assert _items(st) == _items(ref)
+        assert [it["label"] for it in st["all"]] == [it["label"] for it in ref["all"]]
+
+
+def test_reel_wins_when_class_is_in_both():
+    lut = target_lut(id_to_name, {"tip": {0, 1}, "reel": {1}})
+    assert lut.tolist() == [0, 1, -1]
+
+
+def test_empty_and_unknown_classes():
+    lut = target_lut(id_to_name, target_ids)
+    meta = {"x0": 0, "y0": 0, "scale": 1.0, "orig_w": 640, "orig_h": 480}
+    assert len(build_detections(None, meta, 1, 0.0, lut)) == 0
+    out = (np.array([[0, 0, 10, 10], [5, 5, 20, 20]], np.float32), np.array([2, 9]), np.array([0.9, 0.8], np.float32))
+    assert len(build_detections(out, meta, 1, 0.0, lut)) == 0
+    assert best_per_label(np.zeros(0, dtype=det_dtype)) == {}
+
+
+def test_state_is_read_only_snapshot():
+    lut = target_lut(id_to_name, target_ids)
+    meta = {"x0": 0, "y0": 0, "scale": 1.0, "orig_w": 640, "orig_h": 480}
+    out = (np.array([[10, 10, 50, 50], [100, 100, 150, 150]], np.float32), np.array([0, 1]), np.array([0.6, 0.7], np.float32))
+    st = build_target_state(out, meta, 3, 2.0, lut, latency=0.01)
+    assert st["tip"]["frame_id"] == 3 and st["reel"]["ts"] == 2.0
+    assert st["reel"]["latency"] == pytest.approx(0.01)
+    assert set(st) == {"reel", "tip", "all"}
+    with pytest.raises(ValueError):
+        st.dets["conf"][0] = 0.0
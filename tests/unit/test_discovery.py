@@ -0,0 +1,50 @@
+# reconexion: reopen_camera solo vuelve a la misma camara, nunca a otra que este conectada
+
+import sys
+
+import pytest
+
+from monitor.devices import camera, discovery
+from monitor.devices.discovery import camera_device, reopen_camera, same_device
+
+linux_only = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="v4l2")
+
+
+def _dev(index, name="HD USB Camera", serial="", bus="usb-0000:00:14.0-2"):
+    return camera_device(path=f"/dev/video{index}", index=index, name=name, bus_info=bus, serial=serial)
+
+
+def test_same_device():
+    assert same_device(_dev(0, serial="A1"), _dev(4, serial="A1", bus="usb-0000:00:14.0-3"))
+    assert not same_device(_dev(0, serial="A1"), _dev(0, serial="B2"))
+    # sin serial decide el puerto
+    assert same_device(_dev(0), _dev(2))
+    assert not same_device(_dev(0), _dev(2, bus="usb-0000:00:14.0-3"))
+    assert not same_device(_dev(0), _dev(2, name="Otra camara"))
+    assert not same_device(_dev(0, bus=""), _dev(2, bus=""))
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    calls = []
+    monkeypatch.setattr(camera, "open_camera", lambda path, profile="default": calls.append(path) or path)
+    return calls
+
+
+@linux_only
+def test_reopen_only_same_identity(monkeypatch, opened):
+    lost = _dev(0, serial="A1")
+    # otra camara de la misma marca en otro puerto: no se toma
+    monkeypatch.setattr(discovery, "list_video_devices", lambda: [_dev(2, serial="B2", bus="usb-0000:00:14.0-3")])
+    assert reopen_camera("/dev/v4l/by-id/no-existe", identity=lost) is None
+    assert opened == []
+    # la misma camara volvio con otro indice
+    monkeypatch.setattr(discovery, "list_video_devices", lambda: [_dev(2, serial="B2", bus="x"), _dev(6, serial="A1", bus="y")])
+    assert reopen_camera("/dev/v4l/by-id/no-existe", identity=lost) == "/dev/video6"
+
+
+@linux_only
+def test_reopen_without_identity_does_not_substitute(monkeypatch, opened):
+    monkeypatch.setattr(discovery, "list_video_devices", lambda: [_dev(0)])
+    assert reopen_camera("/dev/v4l/by-id/no-existe") is None
+    assert opened == []
@@ -0,0 +1,40 @@
+# evaluate.detect_frame: la referencia con infer_frame recibe el frame bgr tal cual; el resto pasa por el letterbox
+
+import numpy as np
+
+from monitor.models.evaluate import detect_frame
+from monitor.models.preprocess import letterbox_preprocessor
+
+
+class _tensor_backend:
+    layout = "nchw"
+    imgsz = 320
+
+    def infer(self, tensor):
+        self.shape = tensor.shape
+        # caja en coordenadas del letterbox: 640x480 -> escala 0.5, padding vertical de 40
+        return np.array([[50, 90, 100, 140]], np.float32), np.array([0]), np.array([0.9])
+
+
+class _frame_backend(_tensor_backend):
+    def infer_frame(self, frame_bgr):
+        self.frame = frame_bgr
+        return np.array([[100, 100, 200, 200]], np.float32), np.array([1]), np.array([0.8])
+
+
+def test_letterbox_path_maps_back_to_frame():
+    b = _tensor_backend()
+    frame = np.zeros((480, 640, 3), np.uint8)
+    xyxy, cls, conf = detect_frame(b, frame, letterbox_preprocessor(b.imgsz, layout=b.layout))
+    assert b.shape == (1, 3, 320, 320)
+    np.testing.assert_allclose(xyxy, [[100, 100, 200, 200]])
+    assert cls.tolist() == [0]
+
+
+def test_reference_path_uses_raw_frame():
+    b = _frame_backend()
+    frame = np.zeros((480, 640, 3), np.uint8)
+    xyxy, cls, conf = detect_frame(b, frame, letterbox_preprocessor(b.imgsz, layout=b.layout))
+    assert b.frame is frame and not hasattr(b, "shape")
+    np.testing.assert_allclose(xyxy, [[100, 100, 200, 200]])
+    assert cls.tolist() == [1] and conf.tolist() == [0.8]
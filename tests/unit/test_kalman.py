@@ -0,0 +1,84 @@
+# batch_kalman debe dar lo mismo que n bbox_kalman independientes (mismo modelo, float64 vs float32)
+
+import numpy as np
+
+from monitor.tracking.kalman import batch_kalman, bbox_kalman
+
+dt0 = 1 / 30.0
+
+
+def _random_boxes(rng, n):
+    xy = rng.uniform(0, 500, (n, 2))
+    wh = rng.uniform(10, 120, (n, 2))
+    return np.hstack([xy, xy + wh]).round()
+
+
+def _state(k: bbox_kalman):
+    return k.x[:, 0].astype(np.float64), k.p.astype(np.float64)
+
+
+def test_single_track_matches_bbox_kalman():
+    rng = np.random.default_rng(0)
+    box = _random_boxes(rng, 1)[0]
+    ref = bbox_kalman(dt=dt0)
+    ref.init_from_bbox(*box)
+    kf = batch_kalman(capacity=4, dt=dt0)
+    i = kf.add(box)
+
+    for step in range(60):
+        dt = rng.uniform(0.5, 2.0) * dt0
+        ref.predict(dt)
+        kf.predict(dt)
+        if step % 3 != 2:
+            box = box + rng.normal(0, 2, 4)
+            ref.update(*box)
+            kf.update([i], box[None])
+        x, p = _state(ref)
+        np.testing.assert_allclose(kf.x[i], x, rtol=1e-4, atol=1e-3)
+        np.testing.assert_allclose(kf.p[i], p, rtol=1e-4, atol=1e-5)
+
+
+def test_per_track_dt_and_partial_updates():
+    rng = np.random.default_rng(1)
+    boxes = _random_boxes(rng, 5)
+    refs = []
+    kf = batch_kalman(capacity=2, dt=dt0)  # crece al agregar el tercero
+    for b in boxes:
+        k = bbox_kalman(dt=dt0)
+        k.init_from_bbox(*b)
+        refs.append(k)
+        kf.add(b)
+    assert len(kf) == 5
+
+    for _ in range(40):
+        dts = rng.uniform(0.5, 2.0, len(kf.active)) * dt0
+        for i, k in enumerate(refs):
+            k.predict(dts[i])
+        kf.predict(dts)
+
+        mask = rng.random(5) < 0.6
+        meas = boxes[mask] + rng.normal(0, 3, (int(mask.sum()), 4))
+        for i, b in zip(np.flatnonzero(mask), meas):
+            refs[i].update(*b)
+        full = np.zeros(len(kf.active), dtype=bool)
+        full[:5] = mask
+        kf.update(full, meas)
+
+    for i, k in enumerate(refs):
+        x, p = _state(k)
+        np.testing.assert_allclose(kf.x[i], x, rtol=1e-4, atol=1e-2)
+        np.testing.assert_allclose(kf.p[i], p, rtol=1e-3, atol=1e-5)
+        np.testing.assert_allclose(kf.bboxes([i])[0], k.get_bbox(), atol=1.0)
+
+
+def test_removed_slot_is_reused_and_skipped_by_predict():
+    kf = batch_kalman(capacity=2)
+    a = kf.add((0, 0, 10, 10))
+    b = kf.add((100, 100, 120, 120))
+    kf.x[a, 4] = 30.0
+    kf.remove(a)
+    frozen = kf.x[a].copy()
+    kf.predict()
+    np.testing.assert_array_equal(kf.x[a], frozen)
+    assert kf.add((50, 50, 60, 60)) == a
+    assert len(kf) == 2 and kf.active[b]
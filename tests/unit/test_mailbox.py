@@ -0,0 +1,66 @@
+# frame_mailbox: el frame mas nuevo gana, los reemplazados cuentan como descartados y el productor no espera
+
+import threading
+
+import numpy as np
+
+from monitor.core.mailbox import frame_mailbox
+
+
+def _img(v):
+    return np.full((4, 6, 3), v, dtype=np.uint8)
+
+
+def test_latest_wins_and_counts_drops():
+    mb = frame_mailbox()
+    for k in range(5):
+        mb.put(_img(k), frame_id=k, ts=k * 0.1)
+    assert mb.pending() == 1
+    frame, frame_id, ts = mb.get()
+    assert frame_id == 4 and ts == 0.4 and frame[0, 0, 0] == 4
+    assert (mb.submitted, mb.dropped) == (5, 4)
+    assert mb.pending() == 0
+    assert mb.get(timeout=0.01) is None
+
+
+def test_consumer_slot_is_not_overwritten():
+    mb = frame_mailbox()
+    mb.put(_img(1), 1, 0.0)
+    held, _, _ = mb.get()
+    # el productor sigue escribiendo mientras el consumidor usa su frame
+    for k in range(2, 10):
+        mb.put(_img(k), k, 0.0)
+    assert held[0, 0, 0] == 1
+    frame, frame_id, _ = mb.get()
+    assert frame_id == 9 and frame[0, 0, 0] == 9
+    assert frame is not held
+
+
+def test_reserve_publish_in_place():
+    mb = frame_mailbox()
+    i, buf = mb.reserve((4, 6, 3))
+    buf[...] = 7
+    mb.publish(i, 3, 1.5)
+    frame, frame_id, ts = mb.get()
+    assert frame is buf and (frame_id, ts) == (3, 1.5)
+    # cambiar de tamano realoja solo ese slot
+    j, buf2 = mb.reserve((8, 6, 3))
+    assert j != i and buf2.shape == (8, 6, 3)
+
+
+def test_get_wakes_on_put():
+    mb = frame_mailbox()
+    got = []
+    t = threading.Thread(target=lambda: got.append(mb.get(timeout=2.0)))
+    t.start()
+    mb.put(_img(5), 5, 0.0)
+    t.join(1.0)
+    assert got and got[0][1] == 5
+
+
+def test_clear_discards_pending():
+    mb = frame_mailbox()
+    mb.put(_img(1), 1, 0.0)
+    mb.clear()
+    assert mb.pending() == 0
+    assert mb.get(timeout=0.01) is None
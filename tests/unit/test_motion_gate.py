@@ -0,0 +1,53 @@
+# motion_gate: se cierra tras idle_after sin movimiento y se abre con el primer frame que se mueve
+
+import numpy as np
+
+from monitor.tracking.frame_context import frame_context
+from monitor.tracking.motion_gate import motion_gate
+
+
+def _frame(dots=()):
+    img = np.full((240, 320, 3), 90, dtype=np.uint8)
+    for x, y in dots:
+        img[y : y + 24, x : x + 24] = 250
+    return img
+
+
+def _run(gate, frames, t0=0.0, fps=10.0, boxes=()):
+    return [gate.update(frame_context(f, ts=t0 + k / fps), boxes) for k, f in enumerate(frames)]
+
+
+def test_closes_after_idle_and_reopens_on_motion():
+    gate = motion_gate(idle_after=1.0)
+    still = _run(gate, [_frame()] * 20)
+    # abierto durante idle_after, cerrado despues
+    assert all(still[:10]) and not any(still[11:])
+    assert gate.idle
+    assert _run(gate, [_frame([(100, 100)])], t0=2.0) == [True]
+    assert not gate.idle and gate.motion > gate.min_fraction
+    # la quietud vuelve a contar desde el ultimo movimiento
+    again = _run(gate, [_frame([(100, 100)])] * 15, t0=2.1)
+    assert all(again[:9]) and not again[-1]
+
+
+def test_regions_ignore_motion_elsewhere():
+    gate = motion_gate(idle_after=0.5)
+    box = [(200, 40, 240, 80)]
+    frames = [_frame([(20 + 8 * (k % 2), 150)]) for k in range(20)]
+    # algo se mueve fuera de la caja: la compuerta se cierra igual
+    assert not _run(gate, frames, boxes=box)[-1]
+    # sin regiones el mismo movimiento la mantiene abierta
+    assert all(_run(motion_gate(idle_after=0.5), frames))
+
+
+def test_small_flicker_is_not_motion():
+    gate = motion_gate(idle_after=0.5, thresh=12)
+    rng = np.random.default_rng(0)
+    base = _frame()
+    frames = [np.clip(base.astype(np.int16) + rng.integers(-4, 5, base.shape), 0, 255).astype(np.uint8) for _ in range(12)]
+    assert not _run(gate, frames)[-1]
+
+
+def test_disabled_never_closes():
+    gate = motion_gate(idle_after=0.0)
+    assert all(_run(gate, [_frame()] * 50))
@@ -0,0 +1,96 @@
+# telemetria: lo escrito por telemetry_writer se lee igual con read_telemetry / load_range
+
+import numpy as np
+import pytest
+
+from monitor.io.telemetry import header_size, load_range, open_logs, read_telemetry, record_dtype, telemetry_writer
+
+
+def _frame(i):
+    trk = {
+        "tip": {"bbox": (i, i + 1, i + 40, i + 41), "ok": i % 3 != 0, "missed": i % 3},
+        "reel": {"bbox": None, "ok": False, "missed": 70000},
+    }
+    det = {"tip": {"bbox": (i, i, i + 40, i + 40), "conf": 0.5 + (i % 5) * 0.1}, "reel": None}
+    return det, trk
+
+
+def _write(directory, n, **kwargs):
+    # el escritor descarta en vez de bloquear si se queda sin lotes; con un lote por cada batch registros
+    # (volcado solo por tamano) la prueba no depende de que el hilo alcance al bucle
+    kwargs.setdefault("flush_every", 1e9)
+    kwargs.setdefault("buffers", -(-n // kwargs.get("batch", 256)) + 1)
+    w = telemetry_writer(str(directory), **kwargs)
+    for i in range(n):
+        det, trk = _frame(i)
+        w.append(i + 1, 100.0 + i * 0.04, det, trk, activity="ACTIVE" if i % 2 else "FAULT", idle=i % 7 == 0)
+    w.close()
+    return w
+
+
+def test_round_trip(tmp_path):
+    w = _write(tmp_path, 600, batch=64)
+    assert w.records == 600 and w.dropped == 0
+    (log,) = open_logs(str(tmp_path))
+    assert isinstance(log, np.memmap)
+    assert log.dtype == record_dtype and len(log) == 600
+
+    np.testing.assert_array_equal(log["frame_id"], np.arange(1, 601))
+    np.testing.assert_allclose(log["ts"], 100.0 + np.arange(600) * 0.04)
+    r = log[10]
+    assert tuple(r["tip_bbox"]) == (10, 11, 50, 51) and r["tip_bbox_ok"] == 1
+    assert r["tip_ok"] == 1 and r["tip_missed"] == 1
+    assert tuple(r["tip_det_bbox"]) == (10, 10, 50, 50) and r["tip_det_ok"] == 1
+    assert r["tip_det_conf"] == pytest.approx(0.5)
+    # sin caja = flag en 0; missed satura en u2
+    assert r["reel_bbox_ok"] == 0 and r["reel_det_ok"] == 0
+    assert log["reel_bbox_ok"].sum() == 0
+    assert r["reel_missed"] == 65535
+    assert r["activity"] == 2 and log[11]["activity"] == 1
+    assert log["idle"].sum() == len(range(0, 600, 7))
+
+
+def test_off_frame_boxes(tmp_path):
+    # objetivo perdido: kalman lo sigue extrapolando mucho mas alla del frame
+    w = telemetry_writer(str(tmp_path))
+    trk = {"tip": {"bbox": (40000.0, -70000.4, 40040, -1), "ok": False, "missed": 900}, "reel": {"bbox": (-5, -5, 30, 30)}}
+    det = {"tip": {"bbox": (1e12, 0, 2e12, 10), "conf": 0.3}, "reel": None}
+    w.append(1, 0.0, det, trk)
+    w.close()
+    (log,) = open_logs(str(tmp_path))
+    r = log[0]
+    assert tuple(r["tip_bbox"]) == (40000, -70000, 40040, -1) and r["tip_bbox_ok"] == 1
+    assert tuple(r["reel_bbox"]) == (-5, -5, 30, 30) and r["reel_bbox_ok"] == 1
+    assert tuple(r["tip_det_bbox"]) == (2**31 - 1, 0, 2**31 - 1, 10)
+    assert r["reel_det_ok"] == 0
+
+
+def test_rotation_and_load_range(tmp_path):
+    per_file = 100
+    w = _write(tmp_path, 450, batch=50, max_bytes=header_size + per_file * record_dtype.itemsize)
+    assert w.dropped == 0
+    logs = open_logs(str(tmp_path))
+    assert w.files == len(logs) > 1
+    assert sum(len(m) for m in logs) == 450
+
+    day = load_range(str(tmp_path))
+    np.testing.assert_array_equal(day["frame_id"], np.arange(1, 451))
+    part = load_range(str(tmp_path), t0=104.0, t1=110.0)
+    assert part["ts"].min() >= 104.0 - 1e-9 and part["ts"].max() < 110.0
+    assert len(part) == 150
+    assert len(load_range(str(tmp_path), t0=1e9)) == 0
+
+
+def test_truncated_record_is_dropped(tmp_path):
+    _write(tmp_path, 10)
+    (path,) = tmp_path.glob("*.tlm")
+    with open(path, "ab") as f:
+        f.write(b"\0" * (record_dtype.itemsize // 2))
+    assert len(read_telemetry(str(path))) == 10
+
+
+def test_rejects_foreign_file(tmp_path):
+    path = tmp_path / "track_x.tlm"
+    path.write_bytes(b"\0" * (header_size + 10))
+    with pytest.raises(ValueError):
+        read_telemetry(str(path))
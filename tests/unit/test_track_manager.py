@@ -0,0 +1,139 @@
+# track_manager: nacimiento, confirmacion por min_hits, asociacion por etiqueta, muerte por max_age
+
+import numpy as np
+
+from monitor.core.detect_scheduler import detect_scheduler
+from monitor.tracking.track_manager import _greedy, association_cost, iou_matrix, match, track_manager
+
+
+def _det(label, bbox, conf=0.9):
+    return {"label": label, "bbox": bbox, "conf": conf}
+
+
+def test_birth_and_confirmation():
+    tm = track_manager(min_hits=2)
+    tm.update([_det("tip", (10, 10, 50, 50)), _det("reel", (200, 200, 300, 300))], ts=0.0)
+    assert tm.births == 2
+    assert tm.tracks() == []
+    assert len(tm.tracks(confirmed_only=False)) == 2
+
+    tm.update([_det("tip", (12, 11, 52, 51)), _det("reel", (201, 200, 301, 300))], ts=0.033)
+    tracks = tm.tracks()
+    assert sorted(t["label"] for t in tracks) == ["reel", "tip"]
+    assert sorted(t["id"] for t in tracks) == [1, 2]
+    assert tm.births == 2
+
+
+def test_ids_persist_while_moving():
+    tm = track_manager()
+    box = np.array([100, 100, 140, 140])
+    tm.update([_det("tip", tuple(box))], ts=0.0)
+    (first,) = tm.tracks(confirmed_only=False)
+    for k in range(1, 30):
+        box = box + (3, 1, 3, 1)
+        tm.update([_det("tip", tuple(box))], ts=k / 30.0)
+    (last,) = tm.tracks()
+    assert last["id"] == first["id"]
+    assert last["hits"] == 30
+    assert np.abs(np.subtract(last["bbox"], box)).max() <= 3
+
+
+def test_labels_never_associate():
+    tm = track_manager()
+    tm.update([_det("tip", (10, 10, 50, 50))], ts=0.0)
+    # misma caja con otra etiqueta: nace un track nuevo en vez de asociarse
+    tm.update([_det("reel", (10, 10, 50, 50))], ts=0.033)
+    tracks = tm.tracks(confirmed_only=False)
+    assert tm.births == 2
+    assert {t["label"]: t["hits"] for t in tracks} == {"tip": 1, "reel": 1}
+
+
+def test_unknown_labels_are_ignored():
+    tm = track_manager()
+    tm.update([_det("other", (10, 10, 50, 50))], ts=0.0)
+    assert tm.births == 0
+
+
+def test_death_after_max_age():
+    tm = track_manager(max_age=0.5)
+    tm.update([_det("tip", (10, 10, 50, 50)), _det("reel", (200, 200, 300, 300))], ts=0.0)
+    tm.update([_det("reel", (200, 200, 300, 300))], ts=0.3)
+    tm.update([_det("reel", (200, 200, 300, 300))], ts=0.6)
+    assert tm.deaths == 1
+    assert [t["label"] for t in tm.tracks(confirmed_only=False)] == ["reel"]
+    tm.update([], ts=1.2)
+    assert tm.deaths == 2
+    assert len(tm.kf) == 0
+
+
+def _stable_run(tm, interval, latency, skip=()):
+    # tracks estables: un resultado cada interval, latency despues del frame enviado; los de skip se pierden
+    box = (100, 100, 140, 140)
+    arrivals = {round((i * interval + latency) * 30) for i in range(10) if i not in skip}
+    for k in range(int(10 * interval * 30)):
+        ts = k / 30.0
+        tm.predict(ts)
+        if k in arrivals:
+            tm.update([_det("tip", box)], ts)
+
+
+def test_tracks_survive_max_interval():
+    sched = detect_scheduler(max_interval=1.0, cpu_budget=0.5)
+    latency = 0.08
+    tm = track_manager(max_age=sched.track_max_age(latency))
+    _stable_run(tm, sched.max_interval, latency, skip=(4,))
+    assert (tm.births, tm.deaths) == (1, 0)
+    (t,) = tm.tracks()
+    assert t["id"] == 1
+
+    # el presupuesto de cpu alarga el intervalo real y con el la edad maxima
+    assert sched.track_max_age(0.8) == 2 * 1.6 + 0.8
+    # con max_age igual al intervalo (el default anterior) el track muere entre detecciones y el id cambia
+    churn = track_manager(max_age=sched.max_interval)
+    _stable_run(churn, sched.max_interval, latency, skip=(4,))
+    assert churn.births > 1 and churn.deaths >= 1
+
+
+def test_capacity_growth_keeps_tracks():
+    tm = track_manager(capacity=2)
+    boxes = [(i * 60, 0, i * 60 + 40, 40) for i in range(7)]
+    tm.update([_det("tip", b) for b in boxes], ts=0.0)
+    tm.update([_det("tip", b) for b in boxes], ts=0.033)
+    tracks = tm.tracks()
+    assert len(tracks) == 7
+    assert sorted(t["id"] for t in tracks) == list(range(1, 8))
+
+
+def test_update_arrays_matches_update():
+    rng = np.random.default_rng(3)
+    a, b = track_manager(), track_manager()
+    base = rng.uniform(0, 400, (4, 2))
+    for k in range(20):
+        xy = base + rng.normal(0, 2, base.shape) + k
+        boxes = np.hstack([xy, xy + 30]).round()
+        labels = np.array([0, 0, 1, 1], dtype=np.int16)
+        conf = rng.uniform(0.3, 1.0, 4).astype(np.float32)
+        keep = rng.random(4) < 0.8
+        ts = k / 30.0
+        a.update([_det(a.labels[l], tuple(bx), float(c)) for bx, l, c in zip(boxes[keep], labels[keep], conf[keep])], ts)
+        b.update_arrays(boxes[keep], labels[keep], conf[keep], ts)
+    assert a.tracks() == b.tracks()
+
+
+def test_iou_and_cost():
+    a = np.array([[0, 0, 10, 10]], dtype=float)
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]], dtype=float)
+    np.testing.assert_allclose(iou_matrix(a, b), [[1.0, 50 / 150, 0.0]])
+    cost = association_cost(a, b)
+    assert cost[0, 0] == 0.0
+    assert cost[0, 0] < cost[0, 1] < cost[0, 2]
+
+
+def test_greedy_matches_optimal_on_separable_costs():
+    cost = np.array([[0.1, 0.9, 2.0], [0.8, 0.2, 2.0], [2.0, 2.0, 2.0]])
+    r, c = _greedy(cost, max_cost=1.5)
+    assert list(zip(r, c)) == [(0, 0), (1, 1)]
+    r2, c2 = match(cost, max_cost=1.5)
+    assert sorted(zip(r2.tolist(), c2.tolist())) == [(0, 0), (1, 1)]
+    r3, c3 = match(np.empty((0, 3)), max_cost=1.5)
+    assert len(r3) == len(c3) == 0
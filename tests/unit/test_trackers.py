@@ -0,0 +1,49 @@
+# target_tracker en modo fusion: la deteccion entra a kalman y el tracker opencv solo se recrea por deriva
+
+import numpy as np
+
+from monitor.tracking.trackers import target_tracker
+
+
+def _scene(x, y):
+    rng = np.random.default_rng(7)
+    img = np.full((240, 320, 3), 80, dtype=np.uint8)
+    img[y : y + 40, x : x + 40] = rng.integers(0, 256, (40, 40, 3), dtype=np.uint8)
+    return img
+
+
+def _tracked(conf=0.9):
+    t = target_tracker("reel")
+    box = (100, 100, 140, 140)
+    t.update_with_det(_scene(100, 100), box, conf=conf)
+    t.update(_scene(100, 100))
+    return t, box
+
+
+def test_consistent_detection_is_fused():
+    t, box = _tracked()
+    assert t.reinit_count == 1
+    for _ in range(5):
+        assert not t.update_with_det(_scene(100, 100), box, conf=0.85)
+        t.update(_scene(100, 100))
+    assert t.reinit_count == 1 and t.fused_count == 5
+    assert 0.85 < t.det_conf < 0.9
+
+
+def test_drift_reinits():
+    t, _ = _tracked()
+    # la deteccion se fue lejos de donde cree el tracker
+    assert t.update_with_det(_scene(200, 150), (200, 150, 240, 190), conf=0.9)
+    assert t.reinit_count == 2
+
+
+def test_confidence_collapse_reinits():
+    t, box = _tracked(conf=0.9)
+    # misma caja pero confianza desplomada: el aspecto cambio y la plantilla del tracker ya no sirve
+    assert t.update_with_det(_scene(100, 100), box, conf=0.3)
+    assert t.reinit_count == 2 and t.det_conf == 0.3
+    # una baja moderada solo se fusiona
+    t.update(_scene(100, 100))
+    assert not t.update_with_det(_scene(100, 100), box, conf=0.2)
+    # sin confianza (p.ej. deteccion de otra fuente) decide solo la geometria
+    assert not t.update_with_det(_scene(100, 100), box)